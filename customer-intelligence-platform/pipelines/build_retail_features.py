@@ -24,6 +24,10 @@ Expected input:
 Default output:
     data/processed/retail_training_snapshots.csv
 
+Cleaned transactions are cached as month-partitioned Parquet under
+data/cache/transactions (see transaction_store.py) and reused until the raw
+file changes; --no-cache parses the CSV as before.
+
 Run from the project root:
     python3 pipelines/build_retail_features.py
 """
@@ -32,13 +36,19 @@ from __future__ import annotations
 
 import argparse
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import transaction_store
+
 DEFAULT_INPUT = Path("data/raw/online_retail_II.csv")
 DEFAULT_OUTPUT = Path("data/processed/retail_training_snapshots.csv")
+DEFAULT_CACHE_DIR = Path("data/cache/transactions")
 
 LOOKBACK_WINDOW_DAYS = 90
 LABEL_HORIZON_DAYS = 180
@@ -56,9 +66,13 @@ RETAIL_FEATURES = [
 TARGET = "churn_label_180d"
 PROPENSITY_TARGET = "propensity_label_30d"
 TARGET_COLUMNS = [TARGET, PROPENSITY_TARGET]
+# Transaction columns build_snapshot and SnapshotEngine read.
+SNAPSHOT_COLUMNS = [
+    "customer_id", "invoice", "stock_code", "invoice_date", "is_return", "line_revenue",
+]
 
 
-def load_transactions(path: Path) -> pd.DataFrame:
+def load_transactions(path: Path, compact: bool = True) -> pd.DataFrame:
     """Load and clean raw Online Retail II transactions.
 
     Cleaning decisions:
@@ -66,6 +80,9 @@ def load_transactions(path: Path) -> pd.DataFrame:
       - Invoices starting with 'C' are cancellations -> kept, flagged as returns
         (they carry real signal: returns predict churn).
       - Non-positive unit prices are data errors -> dropped.
+
+    Returned in the compact representation (compact_transactions) unless
+    compact=False.
     """
     df = pd.read_csv(path, parse_dates=["InvoiceDate"], low_memory=False)
 
@@ -83,7 +100,116 @@ def load_transactions(path: Path) -> pd.DataFrame:
     df["is_return"] = df["invoice"].astype(str).str.startswith("C")
     df = df[df["unit_price"] > 0]
     df["line_revenue"] = df["quantity"] * df["unit_price"]
-    return df
+    return compact_transactions(df) if compact else df
+
+
+def compact_transactions(txns: pd.DataFrame) -> pd.DataFrame:
+    """The same transactions in a fraction of the memory.
+
+    customer_id becomes a categorical: small integer codes plus one lookup
+    table of the id strings, with categories in sorted string order so
+    groupbys and SnapshotEngine keep the string-sorted customer order.
+    Invoice, stock code and the other text columns become categoricals, and
+    quantity drops to int32 when it fits, and the row labels left over from
+    cleaning become a RangeIndex. line_revenue and unit_price stay float64 --
+    they feed monetary_90d's exact sums. Snapshot builders map customer_id
+    back to strings only in their output.
+    """
+    columns = {}
+    for name in ["customer_id", "invoice", "stock_code", "Description", "Country"]:
+        if name in txns and not isinstance(txns[name].dtype, pd.CategoricalDtype):
+            columns[name] = txns[name].astype("category")
+    if "quantity" in txns and np.abs(txns["quantity"]).max() < 2**31:
+        columns["quantity"] = txns["quantity"].astype(np.int32)
+    return txns.assign(**columns).reset_index(drop=True)
+
+
+def memory_mb(txns: pd.DataFrame) -> float:
+    return txns.memory_usage(deep=True).sum() / 1e6
+
+
+def _customer_labels(customer_id: pd.Series) -> pd.Series:
+    """String customer ids for output, whichever representation came in."""
+    if isinstance(customer_id.dtype, pd.CategoricalDtype):
+        return customer_id.astype(customer_id.cat.categories.dtype)
+    return customer_id
+
+
+def ensure_transaction_cache(
+    path: Path,
+    cache_dir: Path = DEFAULT_CACHE_DIR,
+    force_rebuild: bool = False,
+) -> dict:
+    """Reuse the cleaned-transaction cache if it matches the raw file, else build it.
+
+    Returns the cache metadata; read rows with transaction_store.read_transactions.
+    """
+    fingerprint = transaction_store.fingerprint_file(path)
+    metadata = transaction_store.read_store_metadata(cache_dir)
+    if not force_rebuild and transaction_store.is_current(metadata, fingerprint):
+        appended = len(metadata.get("appended", []))
+        print(f"  Reusing cached transactions: {Path(cache_dir).resolve()}"
+              + (f" (+{appended} appended daily batches)" if appended else ""))
+        return metadata
+    if metadata is not None and not force_rebuild:
+        print("  Cached transactions do not match the raw file -- rebuilding.")
+    metadata = transaction_store.write_transactions(load_transactions(path), cache_dir, fingerprint)
+    print(f"  Cached {metadata['row_count']:,} cleaned rows: {Path(cache_dir).resolve()}")
+    return metadata
+
+
+def window_aggregates(window_90: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series, pd.Series]:
+    """Per-customer aggregates of the 90-day window's transactions.
+
+    Returns (purchase stats, all lines, returned lines), each covering only
+    the customers it has rows for -- snapshot_features fills in the zeros.
+    """
+    purchases_90 = window_90[~window_90["is_return"]]
+    g = purchases_90.groupby("customer_id", observed=True)
+    purchases = pd.DataFrame({
+        "frequency_90d": g["invoice"].nunique(),
+        "monetary_90d": g["line_revenue"].sum(),
+        "distinct_products_90d": g["stock_code"].nunique(),
+    })
+    total_lines = window_90.groupby("customer_id", observed=True).size()
+    return_lines = window_90[window_90["is_return"]].groupby("customer_id", observed=True).size()
+    return purchases, total_lines, return_lines
+
+
+def snapshot_features(
+    lifetime: pd.DataFrame,
+    purchases: pd.DataFrame,
+    total_lines: pd.Series,
+    return_lines: pd.Series,
+    snapshot_date: pd.Timestamp,
+) -> pd.DataFrame:
+    """RETAIL_FEATURES for every customer in `lifetime` (first/last purchase).
+
+    The other three arguments are window_aggregates' output for the 90 days
+    before snapshot_date.
+    """
+    # --- lifetime features ---
+    feat = pd.DataFrame(index=lifetime.index)
+    feat["recency_days"] = (snapshot_date - lifetime["last_purchase"]).dt.days
+    feat["tenure_days"] = (snapshot_date - lifetime["first_purchase"]).dt.days
+
+    # --- 90-day window features ---
+    for col in ["frequency_90d", "monetary_90d", "distinct_products_90d"]:
+        feat[col] = purchases[col]
+
+    # Customers with no activity in the window get true zeros, not NaN.
+    for col in ["frequency_90d", "monetary_90d", "distinct_products_90d"]:
+        feat[col] = feat[col].fillna(0)
+
+    feat["avg_basket_value_90d"] = np.where(
+        feat["frequency_90d"] > 0, feat["monetary_90d"] / feat["frequency_90d"], 0.0
+    )
+
+    # Return rate: returned line items as a share of all line items in the window.
+    feat["return_rate_90d"] = (
+        return_lines.reindex(feat.index).fillna(0) / total_lines.reindex(feat.index)
+    ).fillna(0.0)
+    return feat
 
 
 def build_snapshot(
@@ -111,37 +237,11 @@ def build_snapshot(
         raise ValueError(f"No transactions before {snapshot_date.date()}")
 
     window_90 = past[past["invoice_date"] >= snapshot_date - pd.Timedelta(days=LOOKBACK_WINDOW_DAYS)]
-    purchases_90 = window_90[~window_90["is_return"]]
-
-    # --- lifetime features ---
-    lifetime = past.groupby("customer_id").agg(
+    lifetime = past.groupby("customer_id", observed=True).agg(
         last_purchase=("invoice_date", "max"),
         first_purchase=("invoice_date", "min"),
     )
-    feat = pd.DataFrame(index=lifetime.index)
-    feat["recency_days"] = (snapshot_date - lifetime["last_purchase"]).dt.days
-    feat["tenure_days"] = (snapshot_date - lifetime["first_purchase"]).dt.days
-
-    # --- 90-day window features ---
-    g = purchases_90.groupby("customer_id")
-    feat["frequency_90d"] = g["invoice"].nunique()
-    feat["monetary_90d"] = g["line_revenue"].sum()
-    feat["distinct_products_90d"] = g["stock_code"].nunique()
-
-    # Customers with no activity in the window get true zeros, not NaN.
-    for col in ["frequency_90d", "monetary_90d", "distinct_products_90d"]:
-        feat[col] = feat[col].fillna(0)
-
-    feat["avg_basket_value_90d"] = np.where(
-        feat["frequency_90d"] > 0, feat["monetary_90d"] / feat["frequency_90d"], 0.0
-    )
-
-    # Return rate: returned line items as a share of all line items in the window.
-    total_lines = window_90.groupby("customer_id").size()
-    return_lines = window_90[window_90["is_return"]].groupby("customer_id").size()
-    feat["return_rate_90d"] = (
-        return_lines.reindex(feat.index).fillna(0) / total_lines.reindex(feat.index)
-    ).fillna(0.0)
+    feat = snapshot_features(lifetime, *window_aggregates(window_90), snapshot_date)
 
     # --- churn label: no purchase in the 180-day forward window ---
     repurchased = set(future[~future["is_return"]]["customer_id"])
@@ -152,10 +252,274 @@ def build_snapshot(
     feat[PROPENSITY_TARGET] = feat.index.isin(repurchased_30d).astype(int)
 
     feat = feat.reset_index()
+    feat["customer_id"] = _customer_labels(feat["customer_id"])
     feat.insert(1, "snapshot_date", snapshot_date.date().isoformat())
     return feat[["customer_id", "snapshot_date"] + RETAIL_FEATURES + TARGET_COLUMNS]
 
 
+DAY_SECONDS = 86_400
+NANOSECONDS = 1_000_000_000
+SNAPSHOT_BLOCK_PAIRS = 4_000_000  # (customer, snapshot) pairs answered per vectorized block
+
+
+def _kahan_window_sums(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """sum(values[starts[i]:ends[i]]) for every window, bit-for-bit as pandas sums.
+
+    pandas' groupby sum is Kahan-compensated, so a prefix-sum difference is
+    off in the last bits for ~1 in 10 windows. Instead, windows are sorted by
+    length and all windows still open take their k-th value in one vectorized
+    step -- max-window-length steps in total, not one per window.
+    """
+    lengths = ends - starts
+    order = np.argsort(-lengths, kind="stable")
+    first, lengths = starts[order], lengths[order]
+    total = np.zeros(len(lengths))
+    compensation = np.zeros(len(lengths))
+    longest = lengths[0] if len(lengths) else 0
+    open_windows = np.searchsorted(-lengths, -np.arange(longest), side="left")
+    for k, m in enumerate(open_windows):
+        y = values[first[:m] + k] - compensation[:m]
+        t = total[:m] + y
+        compensation[:m] = (t - total[:m]) - y
+        compensation[:m][np.isnan(compensation[:m])] = 0.0  # as pandas, so +/-inf survives
+        total[:m] = t
+    out = np.empty(len(lengths))
+    out[order] = total
+    return out
+
+
+def _codes(values: pd.Series) -> tuple[np.ndarray, pd.Index]:
+    """(integer code per row, sorted lookup of values): free for a categorical."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        if categories.is_monotonic_increasing:
+            return values.cat.codes.to_numpy(dtype=np.int64), categories
+        values = values.astype(categories.dtype)
+    return pd.factorize(values, sort=True)
+
+
+class SnapshotEngine:
+    """Every snapshot from one sort of the transaction log.
+
+    build_snapshot re-filters the whole log for each date, so a backfill
+    costs O(snapshots x transactions). The engine sorts once by
+    (customer_id, invoice_date) and answers any number of dates with
+    binary searches into that order:
+
+      - row counts before a time (eligibility, return lines, label windows)
+        are searchsorted positions differenced through running counts;
+      - distinct invoices / stock codes in the 90-day window count
+        "coverage" segments: each purchase of a value covers the snapshot
+        times that would still see it, up to its next purchase of the same
+        value, so segments never overlap and counting them is two
+        searchsorteds;
+      - monetary_90d is summed exactly as pandas does (_kahan_window_sums).
+
+    Output matches build_snapshot byte for byte, given that each customer's
+    rows appear in time order in txns (true of the raw log): pandas sums in
+    frame order, the engine in time order.
+    """
+
+    def __init__(self, txns: pd.DataFrame, label_horizon_days: int = LABEL_HORIZON_DAYS):
+        self.label_horizon_days = label_horizon_days
+        codes, self.customers = _codes(txns["customer_id"])
+        stamps = txns["invoice_date"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        order = np.lexsort((stamps, codes))  # stable: ties keep frame order
+        codes, self._stamps = codes[order], stamps[order]
+        seconds = self._stamps // NANOSECONDS  # exact against whole-second snapshots
+
+        # One sorted int64 key per row: customer-major, then seconds since t0.
+        self._t0 = int(seconds.min()) if len(seconds) else 0
+        span = int(seconds.max()) - self._t0 if len(seconds) else 0
+        self._width = span + LOOKBACK_WINDOW_DAYS * DAY_SECONDS + 2
+        self._keys = codes * self._width + (seconds - self._t0)
+        self._first_row = np.searchsorted(codes, np.arange(len(self.customers)))
+
+        is_return = txns["is_return"].to_numpy(dtype=bool)[order]
+        purchase = ~is_return
+        self._returns_before = np.concatenate([[0], np.cumsum(is_return)])
+        self._purchases_before = np.concatenate([[0], np.cumsum(purchase)])
+        self._purchase_revenue = txns["line_revenue"].to_numpy(dtype=float)[order][purchase]
+        self._invoice_starts, self._invoice_ends = self._coverage(
+            _codes(txns["invoice"])[0][order], codes, seconds, purchase)
+        self._product_starts, self._product_ends = self._coverage(
+            _codes(txns["stock_code"])[0][order], codes, seconds, purchase)
+
+    # Everything snapshots() reads besides customers, _t0, _width and the horizon.
+    _ARRAYS = ("_stamps", "_keys", "_first_row", "_returns_before", "_purchases_before",
+               "_purchase_revenue", "_invoice_starts", "_invoice_ends",
+               "_product_starts", "_product_ends")
+
+    def share(self, directory) -> dict:
+        """Write the sorted arrays to `directory`; returns a small spec for attach().
+
+        Workers given the spec memory-map the same files, so every process
+        reads one copy of the arrays from the page cache instead of being
+        sent (or re-sorting) the transaction table.
+        """
+        directory = Path(directory)
+        for name in self._ARRAYS:
+            np.save(directory / f"{name.lstrip('_')}.npy", getattr(self, name))
+        return {"directory": str(directory), "customers": self.customers, "t0": self._t0,
+                "width": self._width, "label_horizon_days": self.label_horizon_days}
+
+    @classmethod
+    def attach(cls, spec: dict) -> SnapshotEngine:
+        """An engine over the memory-mapped arrays of another engine's share()."""
+        engine = cls.__new__(cls)
+        engine.customers = spec["customers"]
+        engine.label_horizon_days = spec["label_horizon_days"]
+        engine._t0, engine._width = spec["t0"], spec["width"]
+        directory = Path(spec["directory"])
+        for name in cls._ARRAYS:
+            mapped = np.load(directory / f"{name.lstrip('_')}.npy", mmap_mode="r")
+            setattr(engine, name, np.asarray(mapped))  # plain ndarray view, no memmap overhead
+        return engine
+
+    def _coverage(self, values, codes, seconds, purchase) -> tuple:
+        """Sorted (start, end) keys of the segments (t, min(t + 90d, next t)] per value."""
+        values = values[purchase]
+        codes, seconds = codes[purchase], seconds[purchase]
+        order = np.lexsort((seconds, values, codes))
+        codes, values, seconds = codes[order], values[order], seconds[order]
+        end = seconds + LOOKBACK_WINDOW_DAYS * DAY_SECONDS
+        repeat = np.flatnonzero((codes[1:] == codes[:-1]) & (values[1:] == values[:-1]))
+        end[repeat] = np.minimum(end[repeat], seconds[repeat + 1])
+        keep = end > seconds  # same value twice at one timestamp: counted once
+        base = codes[keep] * self._width - self._t0
+        return np.sort(base + seconds[keep]), np.sort(base + end[keep])
+
+    def _position(self, base: np.ndarray, seconds: np.ndarray) -> np.ndarray:
+        """Rows of each query's customer before `seconds`, as an index into the sort."""
+        offset = np.clip(seconds - self._t0, 0, self._width - 1)
+        return np.searchsorted(self._keys, base + offset)
+
+    @staticmethod
+    def _distinct(starts: np.ndarray, ends: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return np.searchsorted(starts, query) - np.searchsorted(ends, query)
+
+    def snapshots(self, snapshot_dates) -> list[pd.DataFrame]:
+        """One build_snapshot-identical frame per date, in the order given."""
+        dates = [pd.Timestamp(date) for date in snapshot_dates]
+        requested = []
+        for date in dates:
+            nanoseconds = date.as_unit("ns").value
+            if nanoseconds % NANOSECONDS:
+                raise ValueError(f"Snapshot dates must be whole seconds: {date}")
+            requested.append(nanoseconds // NANOSECONDS)
+        unique = np.unique(np.asarray(requested, dtype=np.int64))
+
+        frames = {}
+        per_block = max(1, SNAPSHOT_BLOCK_PAIRS // max(len(self.customers), 1))
+        for i in range(0, len(unique), per_block):
+            frames.update(self._block(unique[i:i + per_block]))
+        for date, seconds in zip(dates, requested):
+            if seconds not in frames:
+                raise ValueError(f"No transactions before {date.date()}")
+        return [frames[seconds] for seconds in requested]
+
+    def _block(self, block: np.ndarray) -> dict:
+        # Customer-major pairs, so every query below arrives already sorted.
+        customers = len(self.customers)
+        snapshot = np.tile(block, customers)
+        date_index = np.tile(np.arange(len(block)), customers)
+        customer = np.repeat(np.arange(customers), len(block))
+        base = customer * self._width
+
+        before = self._position(base, snapshot)
+        eligible = before > self._first_row[customer]
+        snapshot, date_index, customer, base, before = (
+            a[eligible] for a in (snapshot, date_index, customer, base, before))
+
+        window_start = self._position(base, snapshot - LOOKBACK_WINDOW_DAYS * DAY_SECONDS)
+        label_end = self._position(base, snapshot + self.label_horizon_days * DAY_SECONDS)
+        propensity_end = self._position(base, snapshot + PROPENSITY_HORIZON_DAYS * DAY_SECONDS)
+        query = base + np.clip(snapshot - self._t0, 0, self._width - 1)
+
+        snapshot_ns = snapshot * NANOSECONDS
+        day_ns = DAY_SECONDS * NANOSECONDS
+        window_lines = before - window_start
+        columns = {
+            "recency_days": (snapshot_ns - self._stamps[before - 1]) // day_ns,
+            "frequency_90d": self._distinct(self._invoice_starts, self._invoice_ends, query),
+            "monetary_90d": _kahan_window_sums(self._purchase_revenue,
+                                               self._purchases_before[window_start],
+                                               self._purchases_before[before]),
+            "tenure_days": (snapshot_ns - self._stamps[self._first_row[customer]]) // day_ns,
+            "distinct_products_90d": self._distinct(self._product_starts, self._product_ends, query),
+            "return_lines": self._returns_before[before] - self._returns_before[window_start],
+            "window_lines": window_lines,
+            TARGET: self._purchases_before[label_end] == self._purchases_before[before],
+            PROPENSITY_TARGET: self._purchases_before[propensity_end] > self._purchases_before[before],
+        }
+
+        # Back to snapshot-major; customers stay sorted within each snapshot.
+        order = np.argsort(date_index, kind="stable")
+        customer = customer[order]
+        columns = {name: values[order] for name, values in columns.items()}
+        bounds = np.searchsorted(date_index[order], np.arange(len(block) + 1))
+        return {
+            int(block[d]): self._frame(block[d], customer[lo:hi],
+                                       {name: v[lo:hi] for name, v in columns.items()})
+            for d, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])) if hi > lo
+        }
+
+    def _frame(self, snapshot: int, customer: np.ndarray, columns: dict) -> pd.DataFrame:
+        frequency = columns["frequency_90d"]
+        distinct = columns["distinct_products_90d"]
+        if not (frequency > 0).all():
+            # build_snapshot's fillna(0) leaves these float once any customer had no purchase
+            frequency, distinct = frequency.astype(float), distinct.astype(float)
+        monetary = columns["monetary_90d"]
+        lines = columns["window_lines"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            average = np.where(frequency > 0, monetary / frequency, 0.0)
+            return_rate = np.where(lines > 0, columns["return_lines"] / lines, 0.0)
+        date = pd.Timestamp(int(snapshot), unit="s")
+        return pd.DataFrame({
+            "customer_id": self.customers[customer],
+            "snapshot_date": date.date().isoformat(),
+            "recency_days": columns["recency_days"],
+            "frequency_90d": frequency,
+            "monetary_90d": monetary,
+            "tenure_days": columns["tenure_days"],
+            "distinct_products_90d": distinct,
+            "avg_basket_value_90d": average,
+            "return_rate_90d": return_rate,
+            TARGET: columns[TARGET].astype(int),
+            PROPENSITY_TARGET: columns[PROPENSITY_TARGET].astype(int),
+        })
+
+
+_worker = {}  # per-process state, filled once by _init_worker
+
+
+def _init_worker(spec: dict):
+    """Runs once per worker process: attach to the shared arrays, never per task."""
+    _worker["engine"] = SnapshotEngine.attach(spec)
+
+
+def _build_dates(snapshot_dates: list) -> list[pd.DataFrame]:
+    return _worker["engine"].snapshots(snapshot_dates)
+
+
+def parallel_snapshots(engine: SnapshotEngine, snapshot_dates, workers: int) -> list[pd.DataFrame]:
+    """engine.snapshots(snapshot_dates) spread across a process pool.
+
+    Dates are cut into contiguous runs, a couple per worker so a slow run
+    doesn't leave the others idle. Results come back in the order given,
+    identical to the single-process path.
+    """
+    dates = list(snapshot_dates)
+    runs = [list(run) for run in np.array_split(np.asarray(dates, dtype=object),
+                                                min(len(dates), 2 * workers)) if len(run)]
+    with tempfile.TemporaryDirectory(prefix="snapshot-engine-") as directory:
+        spec = engine.share(directory)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(spec,)) as pool:
+            return [frame for frames in pool.map(_build_dates, runs) for frame in frames]
+
+
 def build_multiple_snapshots(
     txns: pd.DataFrame,
     snapshot_dates: list[str],
@@ -165,12 +529,17 @@ def build_multiple_snapshots(
 
     Multiple snapshots per customer is how you get enough rows from a modest
     customer base -- and it forces the model to learn behavior patterns
-    rather than memorize a single point in time.
+    rather than memorize a single point in time. Identical to concatenating
+    build_snapshot per date, computed in one pass by SnapshotEngine
+    (workers=N: across N processes, same result).
     """
-    return pd.concat(
-        [build_snapshot(txns, date, **kwargs) for date in snapshot_dates],
-        ignore_index=True,
-    )
+    workers = kwargs.pop("workers", 1)
+    engine = SnapshotEngine(txns, **kwargs)
+    if workers > 1:
+        frames = parallel_snapshots(engine, snapshot_dates, workers)
+    else:
+        frames = engine.snapshots(snapshot_dates)
+    return pd.concat(frames, ignore_index=True)
 
 
 def parse_arguments() -> argparse.Namespace:
@@ -189,6 +558,23 @@ def parse_arguments() -> argparse.Namespace:
         default="2011-06-01",
         help="Last monthly snapshot date.",
     )
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Parse the raw CSV without reading or writing the transaction cache.",
+    )
+    parser.add_argument(
+        "--rebuild-cache",
+        action="store_true",
+        help="Rebuild the transaction cache even if it matches the raw file.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Build snapshots across this many processes.",
+    )
     return parser.parse_args()
 
 
@@ -237,8 +623,26 @@ def main() -> None:
     print("RETAIL (ONLINE RETAIL II) TRAINING SNAPSHOT PIPELINE")
     print("=" * 72)
 
+    snapshot_dates = create_snapshot_dates(args.start_date, args.end_date)
+
     print(f"\nLoading transactions from {args.input.resolve()}")
-    txns = load_transactions(args.input)
+    if args.no_cache:
+        txns = load_transactions(args.input, compact=False)
+        maximum_invoice_date = txns["invoice_date"].max()
+        before = memory_mb(txns)
+        txns = compact_transactions(txns)
+        print(f"  Memory: {before:,.1f} MB as parsed -> {memory_mb(txns):,.1f} MB compact")
+    else:
+        store = ensure_transaction_cache(args.input, args.cache_dir, args.rebuild_cache)
+        maximum_invoice_date = pd.Timestamp(store["max_invoice_date"])
+        # Nothing on or after the last snapshot's label window can affect any row.
+        txns = transaction_store.read_transactions(
+            args.cache_dir,
+            columns=SNAPSHOT_COLUMNS,
+            end=snapshot_dates.max() + pd.Timedelta(days=LABEL_HORIZON_DAYS),
+        )
+    if not args.no_cache:
+        print(f"  Memory: {memory_mb(txns):,.1f} MB compact ({len(SNAPSHOT_COLUMNS)} columns)")
     print(
         f"  Kept {len(txns):,} rows | "
         f"{txns['customer_id'].nunique():,} customers | "
@@ -246,10 +650,7 @@ def main() -> None:
         f"{txns['invoice_date'].max().date()}"
     )
 
-    snapshot_dates = create_snapshot_dates(args.start_date, args.end_date)
-    maximum_invoice_date = txns["invoice_date"].max()
-
-    all_snapshots = []
+    buildable = []
     for snapshot_date in snapshot_dates:
         required_end_date = snapshot_date + pd.Timedelta(days=LABEL_HORIZON_DAYS)
         if required_end_date > maximum_invoice_date + pd.Timedelta(days=1):
@@ -258,9 +659,14 @@ def main() -> None:
                 "insufficient future data for the 180-day label."
             )
             continue
-
-        snapshot = build_snapshot(txns, str(snapshot_date.date()))
-        all_snapshots.append(snapshot)
+        buildable.append(snapshot_date)
+
+    engine = SnapshotEngine(txns)
+    if args.workers > 1 and buildable:
+        all_snapshots = parallel_snapshots(engine, buildable, args.workers)
+    else:
+        all_snapshots = engine.snapshots(buildable)
+    for snapshot_date, snapshot in zip(buildable, all_snapshots):
         print(
             f"\n{snapshot_date.date()}: {len(snapshot):,} rows | "
             f"churn rate={snapshot[TARGET].mean():.2%} | "
@@ -0,0 +1,343 @@
+"""
+incremental_features.py
+
+Daily feature snapshots from running per-customer state, instead of
+recomputing every snapshot from the full transaction history.
+
+In production, transactions arrive one day at a time. The features for
+tomorrow's snapshot only need:
+    - each customer's first and last transaction   (recency, tenure)
+    - the rows of the trailing 90-day window        (frequency, monetary,
+                                                     distinct products,
+                                                     return rate)
+FeatureState keeps exactly that, persisted between runs:
+
+    data/state/retail_features/
+        lifetime.parquet     customer_id -> first_purchase, last_purchase
+        window.parquet       transactions in [as_of - 90d, as_of), in arrival order
+        purchases.parquet    customer_id -> frequency / monetary / distinct products (90d)
+        lines.parquet        customer_id -> total and returned line items (90d)
+        state.json           as_of, format version
+
+Advancing a day appends that day's rows to the window, drops rows that fell
+out of it, and recomputes the 90-day aggregates only for customers who had a
+row arrive or expire. The cost grows with the day's rows, the expiring rows
+and the customer count (every eligible customer gets a row in the
+snapshot). It does not grow with the length of history.
+
+Features are computed with build_snapshot's own window_aggregates /
+snapshot_features, so each daily snapshot equals build_snapshot's feature
+columns for that date. monetary_90d sums each customer's window rows in
+arrival order, as build_snapshot sums in frame order, so the two agree to
+the bit while the log arrives time-ordered. Labels are not produced here.
+They need 180 days of future data, so training snapshots still come from
+build_retail_features.py.
+
+Rows must arrive in day order. A row dated before the state's as_of raises
+ValueError; rebuild the state with --init to absorb late data.
+
+Run from the project root. --init reads all history through the transaction
+cache (building it from the raw file if needed). Each day after that comes
+from a CSV of only that day's transactions, in the raw file's layout:
+    python3 pipelines/incremental_features.py --init 2011-06-01
+    python3 pipelines/incremental_features.py --daily-input data/raw/daily/2011-06-01.csv
+
+--daily-input cleans just that file, advances the state through its days and
+appends its rows to the cache (transaction_store.append_transactions), so
+--verify and the next --init see them. Nothing proportional to history is
+read or written. Without --daily-input, days are read from the cache after
+new transactions land in the raw file. That costs a full pass: the raw file
+is hashed, and the whole cache is rebuilt because the file changed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import transaction_store
+from build_retail_features import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_INPUT,
+    LOOKBACK_WINDOW_DAYS,
+    RETAIL_FEATURES,
+    SNAPSHOT_COLUMNS,
+    build_snapshot,
+    ensure_transaction_cache,
+    load_transactions,
+    snapshot_features,
+    window_aggregates,
+)
+
+DEFAULT_STATE_DIR = Path("data/state/retail_features")
+DEFAULT_OUTPUT_DIR = Path("data/processed/daily_features")
+STATE_FORMAT_VERSION = 1
+STATE_FILE = "state.json"
+ONE_DAY = pd.Timedelta(days=1)
+
+
+def _plain(txns: pd.DataFrame) -> pd.DataFrame:
+    """The columns the state keeps, categoricals decoded so days concatenate cleanly."""
+    rows = txns[SNAPSHOT_COLUMNS]
+    decoded = {
+        name: rows[name].astype(rows[name].cat.categories.dtype)
+        for name in ["customer_id", "invoice", "stock_code"]
+        if isinstance(rows[name].dtype, pd.CategoricalDtype)
+    }
+    return rows.assign(**decoded).reset_index(drop=True)
+
+
+def _lifetime(rows: pd.DataFrame) -> pd.DataFrame:
+    return rows.groupby("customer_id").agg(
+        last_purchase=("invoice_date", "max"),
+        first_purchase=("invoice_date", "min"),
+    )
+
+
+class FeatureState:
+    """Per-customer running state from which each day's snapshot features follow."""
+
+    def __init__(self, as_of, lifetime, window, purchases, total_lines, return_lines):
+        self.as_of = pd.Timestamp(as_of)  # covers every transaction before as_of
+        self.lifetime = lifetime
+        self.window = window
+        self.purchases = purchases
+        self.total_lines = total_lines
+        self.return_lines = return_lines
+
+    @classmethod
+    def from_history(cls, txns: pd.DataFrame, as_of) -> FeatureState:
+        """The state as of `as_of`, from all transactions before it (one full pass)."""
+        as_of = pd.Timestamp(as_of)
+        past = _plain(txns[txns["invoice_date"] < as_of])
+        if past.empty:
+            raise ValueError(f"No transactions before {as_of.date()}")
+        window_start = as_of - pd.Timedelta(days=LOOKBACK_WINDOW_DAYS)
+        window = past[past["invoice_date"] >= window_start].reset_index(drop=True)
+        return cls(as_of, _lifetime(past), window, *window_aggregates(window))
+
+    def advance(self, txns: pd.DataFrame, until) -> FeatureState:
+        """Apply the transactions in [as_of, until); the state is then as of `until`."""
+        until = pd.Timestamp(until)
+        if until <= self.as_of:
+            raise ValueError(f"Cannot advance state as of {self.as_of} to {until}")
+        new = _plain(txns)
+        outside = (new["invoice_date"] < self.as_of) | (new["invoice_date"] >= until)
+        if outside.any():
+            raise ValueError(
+                f"{int(outside.sum())} transactions fall outside [{self.as_of}, {until}); "
+                "late data needs a rebuild (--init)."
+            )
+
+        window_start = until - pd.Timedelta(days=LOOKBACK_WINDOW_DAYS)
+        expired = (self.window["invoice_date"] < window_start).to_numpy()
+        touched = pd.Index(
+            np.union1d(new["customer_id"].unique(),
+                       self.window.loc[expired, "customer_id"].unique())
+        )
+        self.window = pd.concat([self.window[~expired], new], ignore_index=True)
+
+        if len(new):
+            self.lifetime = (
+                pd.concat([self.lifetime, _lifetime(new)])
+                .groupby(level=0)
+                .agg({"last_purchase": "max", "first_purchase": "min"})
+            )
+        if len(touched):
+            rows = self.window[self.window["customer_id"].isin(touched)]
+            purchases, total_lines, return_lines = window_aggregates(rows)
+            self.purchases = self._replace(self.purchases, purchases, touched)
+            self.total_lines = self._replace(self.total_lines, total_lines, touched)
+            self.return_lines = self._replace(self.return_lines, return_lines, touched)
+        self.as_of = until
+        return self
+
+    @staticmethod
+    def _replace(current, updated, touched: pd.Index):
+        """`current` with the touched customers' entries swapped for `updated`."""
+        kept = current[~current.index.isin(touched)]
+        if not len(updated):
+            return kept
+        return pd.concat([kept, updated]).sort_index() if len(kept) else updated
+
+    def snapshot(self) -> pd.DataFrame:
+        """Feature rows for a snapshot at as_of: build_snapshot's columns minus labels."""
+        feat = snapshot_features(self.lifetime, self.purchases, self.total_lines,
+                                 self.return_lines, self.as_of)
+        feat = feat.reset_index()
+        feat.insert(1, "snapshot_date", self.as_of.date().isoformat())
+        return feat[["customer_id", "snapshot_date"] + RETAIL_FEATURES]
+
+    def save(self, state_dir: Path) -> None:
+        """Write the state to a staging directory, then swap it into place.
+
+        Raises ValueError if state_dir holds anything but a saved state.
+        """
+        state_dir = Path(state_dir)
+        transaction_store.check_replaceable(state_dir, STATE_FILE)
+        staging = state_dir.with_name(f".{state_dir.name}.{os.getpid()}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        self.lifetime.to_parquet(staging / "lifetime.parquet")
+        self.window.to_parquet(staging / "window.parquet", index=False)
+        self.purchases.to_parquet(staging / "purchases.parquet")
+        lines = pd.DataFrame({"total_lines": self.total_lines,
+                              "return_lines": self.return_lines.reindex(self.total_lines.index,
+                                                                        fill_value=0)})
+        lines.to_parquet(staging / "lines.parquet")
+        with (staging / STATE_FILE).open("w", encoding="utf-8") as file:
+            json.dump({"format_version": STATE_FORMAT_VERSION,
+                       "as_of": self.as_of.isoformat()}, file, indent=2)
+        transaction_store.swap_directory(staging, state_dir, STATE_FILE)
+
+    @classmethod
+    def load(cls, state_dir: Path) -> FeatureState | None:
+        """The saved state, or None if there is none (or it is from another format)."""
+        state_dir = Path(state_dir)
+        try:
+            with (state_dir / STATE_FILE).open("r", encoding="utf-8") as file:
+                metadata = json.load(file)
+        except FileNotFoundError:
+            return None
+        if metadata.get("format_version") != STATE_FORMAT_VERSION:
+            return None
+        lines = pd.read_parquet(state_dir / "lines.parquet")
+        return cls(
+            metadata["as_of"],
+            pd.read_parquet(state_dir / "lifetime.parquet"),
+            pd.read_parquet(state_dir / "window.parquet"),
+            pd.read_parquet(state_dir / "purchases.parquet"),
+            lines["total_lines"],
+            lines.loc[lines["return_lines"] > 0, "return_lines"],
+        )
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Advance the daily retail feature state and write each day's snapshot."
+    )
+    parser.add_argument("--input", type=Path, default=DEFAULT_INPUT)
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--state-dir", type=Path, default=DEFAULT_STATE_DIR)
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument(
+        "--daily-input",
+        type=Path,
+        help="CSV of the transactions from the state's date until --through (default: "
+             "one day), raw layout. Applied to the state and appended to the cache; "
+             "the raw file is not read.",
+    )
+    parser.add_argument(
+        "--init",
+        help="(Re)build the state from all history before this date.",
+    )
+    parser.add_argument(
+        "--through",
+        help="Advance one day at a time until the state is as of this date.",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Check the last snapshot against build_snapshot (reads all history).",
+    )
+    return parser.parse_args()
+
+
+def write_snapshot(state: FeatureState, output_dir: Path) -> pd.DataFrame:
+    snapshot = state.snapshot()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    snapshot.to_csv(output_dir / f"features_{state.as_of.date()}.csv", index=False)
+    return snapshot
+
+
+def advance_through(state: FeatureState, through, day_rows, output_dir: Path) -> None:
+    """Advance one day at a time until `through`; day_rows(start, end) gives each day's rows."""
+    while state.as_of < through:
+        start = time.perf_counter()
+        day = day_rows(state.as_of, state.as_of + ONE_DAY)
+        snapshot = write_snapshot(state.advance(day, state.as_of + ONE_DAY), output_dir)
+        print(f"{state.as_of.date()}: applied {len(day):,} rows | {len(snapshot):,} customers "
+              f"| {time.perf_counter() - start:.2f}s")
+
+
+def apply_daily_input(state: FeatureState, args: argparse.Namespace) -> None:
+    """Advance the state through the daily CSV's days, then append its rows to the cache."""
+    if transaction_store.read_store_metadata(args.cache_dir) is None:
+        raise ValueError(f"No transaction cache in {args.cache_dir}; run with --init DATE")
+    new = load_transactions(args.daily_input)
+    dates = new["invoice_date"]
+    through = pd.Timestamp(args.through) if args.through else state.as_of + ONE_DAY
+    if len(new) and dates.min() < state.as_of:
+        raise ValueError(f"{args.daily_input} has rows before the state's date "
+                         f"{state.as_of.date()}; late data needs a rebuild (--init).")
+    if len(new) and dates.max() >= through:
+        raise ValueError(f"{args.daily_input} has rows on or after {through.date()}; "
+                         "pass --through to apply several days at once")
+
+    advance_through(state, through,
+                    lambda start, end: new[(dates >= start) & (dates < end)],
+                    args.output_dir)
+    source = transaction_store.fingerprint_file(args.daily_input)
+    added = transaction_store.append_transactions(new, args.cache_dir, source)
+    print(f"Appended {added:,} rows to {args.cache_dir.resolve()}")
+
+
+def main() -> None:
+    args = parse_arguments()
+    started = time.perf_counter()
+    if args.daily_input and args.init:
+        raise ValueError("--daily-input continues a saved state; run --init on its own first")
+    if not args.daily_input:
+        ensure_transaction_cache(args.input, args.cache_dir)
+
+    if args.init:
+        start = time.perf_counter()
+        history = transaction_store.read_transactions(args.cache_dir, SNAPSHOT_COLUMNS,
+                                                      end=args.init)
+        state = FeatureState.from_history(history, args.init)
+        snapshot = write_snapshot(state, args.output_dir)
+        print(f"Built state as of {state.as_of.date()} from {len(history):,} rows "
+              f"({len(snapshot):,} customers) in {time.perf_counter() - start:.2f}s")
+    else:
+        state = FeatureState.load(args.state_dir)
+        if state is None:
+            raise ValueError(f"No feature state in {args.state_dir}; run with --init DATE")
+
+    if args.daily_input:
+        apply_daily_input(state, args)
+    else:
+        advance_through(
+            state,
+            pd.Timestamp(args.through) if args.through else state.as_of,
+            lambda start, end: transaction_store.read_transactions(
+                args.cache_dir, SNAPSHOT_COLUMNS, start=start, end=end),
+            args.output_dir,
+        )
+
+    state.save(args.state_dir)
+    print(f"State as of {state.as_of.date()} saved to {args.state_dir.resolve()} "
+          f"({time.perf_counter() - started:.2f}s end to end)")
+
+    if args.verify:
+        history = transaction_store.read_transactions(args.cache_dir, SNAPSHOT_COLUMNS,
+                                                      end=state.as_of)
+        expected = build_snapshot(history, state.as_of)[state.snapshot().columns]
+        pd.testing.assert_frame_equal(state.snapshot(), expected)
+        print(f"Verified: {state.as_of.date()} matches build_snapshot")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:
+        print(f"\nERROR: {exc}", file=sys.stderr)
+        sys.exit(1)
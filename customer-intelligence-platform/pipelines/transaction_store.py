@@ -0,0 +1,323 @@
+"""
+transaction_store.py
+
+Columnar cache of cleaned transactions, so pipeline runs stop re-parsing the
+raw CSV. build_retail_features.load_transactions parses ~1M CSV rows, renames,
+casts customer ids through int -> str and derives is_return / line_revenue on
+every call; the first run writes its result here instead:
+
+    data/cache/transactions/
+        month=2009-12/part-0.parquet     one partition per invoice month
+        month=2010-01/part-0.parquet
+        ...
+        _store_metadata.json             raw-file fingerprint, encodings, date range
+
+Columns are stored compactly:
+    customer_id           int64 (read back as the cleaner's compact categorical)
+    invoice, stock_code,  dictionary-encoded (categorical on read)
+    Description, Country
+    quantity              int32 when every value fits
+    unit_price            float32 if every price round-trips exactly, else
+                          int32 fixed point (cents / mills) if that is exact,
+                          else float64 -- never a lossy encoding
+    is_return             boolean
+line_revenue is not stored; it is recomputed as quantity * unit_price in
+float64 on read, exactly as the cleaner computes it.
+
+The cache is reused only while _store_metadata.json matches the SHA-256 of the
+raw file and STORE_FORMAT_VERSION; otherwise it is rebuilt. Reads project to
+the requested columns and push date bounds down to both the month partitions
+(whole files skipped) and Parquet row-group statistics.
+
+Daily batches that have not reached the raw export yet can be added with
+append_transactions: each one writes only its own rows, as one more file per
+month it touches (month=2011-06/part-20110605T083000-<source>-0.parquet,
+named so files sort in arrival order), and rewrites the metadata. Appended
+batches count as part of the cache until the raw file changes; the rebuild
+that follows starts over from the raw file alone.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+STORE_FORMAT_VERSION = 1
+METADATA_FILE = "_store_metadata.json"  # leading "_": not scanned as data
+PARTITION_COLUMN = "month"
+DERIVED_COLUMNS = {"line_revenue": ["quantity", "unit_price"]}
+CATEGORICAL_COLUMNS = ["invoice", "stock_code", "Description", "Country"]
+PRICE_SCALES = (100, 1000)
+
+
+def fingerprint_file(path: Path) -> str:
+    """SHA-256 of the raw file's bytes (~0.15 s per 100 MB)."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def read_store_metadata(cache_dir: Path) -> dict | None:
+    """The cache's metadata, or None if there is no complete cache."""
+    try:
+        with (Path(cache_dir) / METADATA_FILE).open("r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def is_current(metadata: dict | None, fingerprint: str) -> bool:
+    return (
+        metadata is not None
+        and metadata.get("format_version") == STORE_FORMAT_VERSION
+        and metadata.get("raw_fingerprint") == fingerprint
+    )
+
+
+def _encode_prices(prices: np.ndarray) -> tuple[np.ndarray, int | None]:
+    """The narrowest exact encoding of prices: (values, fixed-point scale or None)."""
+    as_float32 = prices.astype(np.float32)
+    if np.array_equal(as_float32.astype(np.float64), prices):
+        return as_float32, None
+    for scale in PRICE_SCALES:
+        units = np.round(prices * scale)
+        if (np.abs(units).max(initial=0) < 2**31
+                and np.array_equal(units / scale, prices)):
+            return units.astype(np.int32), scale
+    return prices, None
+
+
+def check_replaceable(target: Path, marker: str) -> None:
+    """Raise unless `target` is missing, empty, or an earlier copy holding `marker`.
+
+    Guards every directory swap: a mistyped --cache-dir / --state-dir must
+    never delete files this pipeline didn't write.
+    """
+    target = Path(target)
+    if not target.exists():
+        return
+    if not target.is_dir() or (any(target.iterdir()) and not (target / marker).exists()):
+        raise ValueError(
+            f"Refusing to replace {target}: it exists and has no {marker}, "
+            "so it was not written by this pipeline."
+        )
+
+
+def swap_directory(staging: Path, target: Path, marker: str) -> None:
+    """Move a fully written `staging` directory into place at `target`.
+
+    The previous copy is renamed aside first and deleted only once the new
+    one is in place, so a crash leaves one of the two on disk.
+    """
+    staging, target = Path(staging), Path(target)
+    check_replaceable(target, marker)
+    previous = target.with_name(f".{target.name}.{os.getpid()}.old")
+    shutil.rmtree(previous, ignore_errors=True)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if target.exists():
+        os.replace(target, previous)
+    os.replace(staging, target)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def _table(txns: pd.DataFrame, quantity: np.ndarray, prices: np.ndarray) -> pa.Table:
+    """The stored columns of `txns`, plus the month partition key."""
+    columns = {
+        "customer_id": txns["customer_id"].astype(np.int64).to_numpy(),
+        "invoice_date": txns["invoice_date"],
+        "quantity": quantity,
+        "unit_price": prices,
+        "is_return": txns["is_return"].to_numpy(dtype=bool),
+    }
+    for name in CATEGORICAL_COLUMNS:
+        if name in txns:
+            columns[name] = txns[name].astype("string").astype("category")
+    columns[PARTITION_COLUMN] = txns["invoice_date"].dt.strftime("%Y-%m")
+    return pa.Table.from_pandas(pd.DataFrame(columns), preserve_index=False)
+
+
+def write_transactions(txns: pd.DataFrame, cache_dir: Path, fingerprint: str) -> dict:
+    """Replace the cache with `txns` (load_transactions output); returns its metadata.
+
+    Written to a sibling directory first and renamed into place, metadata last,
+    so an interrupted write never leaves a cache that looks complete. Raises
+    ValueError, before writing anything, if cache_dir holds something other
+    than a transaction cache.
+    """
+    cache_dir = Path(cache_dir)
+    check_replaceable(cache_dir, METADATA_FILE)
+    prices, price_scale = _encode_prices(txns["unit_price"].to_numpy(dtype=np.float64))
+    quantity = txns["quantity"].to_numpy()
+    if np.abs(quantity).max(initial=0) < 2**31:
+        quantity = quantity.astype(np.int32)
+    table = _table(txns, quantity, prices)
+
+    staging = cache_dir.with_name(f".{cache_dir.name}.{os.getpid()}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    ds.write_dataset(
+        table,
+        staging,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]),
+                                     flavor="hive"),
+        basename_template="part-{i}.parquet",
+        preserve_order=True,  # row order is summation order for monetary_90d
+    )
+    metadata = {
+        "format_version": STORE_FORMAT_VERSION,
+        "raw_fingerprint": fingerprint,
+        "row_count": len(txns),
+        "min_invoice_date": str(txns["invoice_date"].min()),
+        "max_invoice_date": str(txns["invoice_date"].max()),
+        "columns": [name for name in table.column_names if name != PARTITION_COLUMN]
+        + list(DERIVED_COLUMNS),
+        "unit_price_scale": price_scale,
+    }
+    with (staging / METADATA_FILE).open("w", encoding="utf-8") as file:
+        json.dump(metadata, file, indent=2)
+
+    swap_directory(staging, cache_dir, METADATA_FILE)
+    return metadata
+
+
+def append_transactions(txns: pd.DataFrame, cache_dir: Path, source: str) -> int:
+    """Add a batch of cleaned rows to the cache without rewriting it; returns rows added.
+
+    `source` identifies the batch (fingerprint_file of its CSV). A batch that
+    was already appended is skipped, and its files are named after it, so a
+    rerun after a crash overwrites rather than duplicates them. Raises
+    ValueError if rows predate the cache's newest row (row order is summation
+    order) or do not fit the stored encodings exactly -- rebuild instead.
+    """
+    cache_dir = Path(cache_dir)
+    metadata = read_store_metadata(cache_dir)
+    if metadata is None:
+        raise FileNotFoundError(f"No transaction cache in {cache_dir}")
+    appended = metadata.get("appended", [])
+    if any(batch["source"] == source for batch in appended):
+        return 0
+
+    if len(txns):
+        first = txns["invoice_date"].min()
+        if first < pd.Timestamp(metadata["max_invoice_date"]):
+            raise ValueError(
+                f"Rows from {first} predate the cache's newest row "
+                f"({metadata['max_invoice_date']}); rebuild the cache to add them."
+            )
+        missing = [name for name in CATEGORICAL_COLUMNS
+                   if name in metadata["columns"] and name not in txns]
+        if missing:
+            raise ValueError(f"Batch lacks cached columns: {', '.join(missing)}")
+
+        schema = ds.dataset(cache_dir, format="parquet", partitioning="hive").schema
+        quantity = txns["quantity"].to_numpy()
+        if schema.field("quantity").type == pa.int32():
+            if np.abs(quantity).max(initial=0) >= 2**31:
+                raise ValueError("Quantities exceed the cache's int32 encoding; rebuild the cache.")
+            quantity = quantity.astype(np.int32)
+        prices = txns["unit_price"].to_numpy(dtype=np.float64)
+        scale = metadata["unit_price_scale"]
+        if scale:
+            stored = np.round(prices * scale)
+            exact = (np.abs(stored).max(initial=0) < 2**31
+                     and np.array_equal(stored / scale, prices))
+        else:
+            stored = prices.astype(schema.field("unit_price").type.to_pandas_dtype())
+            exact = np.array_equal(stored.astype(np.float64), prices)
+        if not exact:
+            raise ValueError("Prices do not fit the cache's exact encoding; rebuild the cache.")
+
+        table = _table(txns, quantity, stored)
+        table = table.select(schema.names).cast(schema)
+        stamp = first.strftime("%Y%m%dT%H%M%S")
+        ds.write_dataset(
+            table,
+            cache_dir,
+            format="parquet",
+            partitioning=ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]),
+                                         flavor="hive"),
+            basename_template=f"part-{stamp}-{source[:12]}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            preserve_order=True,
+        )
+        metadata["row_count"] += len(txns)
+        metadata["max_invoice_date"] = str(txns["invoice_date"].max())
+
+    metadata["appended"] = appended + [{"source": source, "rows": len(txns)}]
+    staging = cache_dir / f".{METADATA_FILE}.{os.getpid()}.tmp"
+    with staging.open("w", encoding="utf-8") as file:
+        json.dump(metadata, file, indent=2)
+    os.replace(staging, cache_dir / METADATA_FILE)  # the batch counts from here on
+    return len(txns)
+
+
+def _date_filter(start, end):
+    """invoice_date in [start, end), on both the partition key and the column."""
+    bounds = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        bounds += [ds.field(PARTITION_COLUMN) >= start.strftime("%Y-%m"),
+                   ds.field("invoice_date") >= start.to_pydatetime()]
+    if end is not None:
+        end = pd.Timestamp(end)
+        bounds += [ds.field(PARTITION_COLUMN) <= end.strftime("%Y-%m"),
+                   ds.field("invoice_date") < end.to_pydatetime()]
+    combined = None
+    for bound in bounds:
+        combined = bound if combined is None else combined & bound
+    return combined
+
+
+def read_transactions(
+    cache_dir: Path,
+    columns: list[str] | None = None,
+    start=None,
+    end=None,
+) -> pd.DataFrame:
+    """Cleaned transactions from the cache, optionally projected and date-bounded.
+
+    `columns` may include line_revenue (derived on read). Rows are those with
+    start <= invoice_date < end, month by month and, within a month, in the
+    order the cleaner produced them -- the same order for a time-ordered log.
+    """
+    cache_dir = Path(cache_dir)
+    metadata = read_store_metadata(cache_dir)
+    if metadata is None:
+        raise FileNotFoundError(f"No transaction cache in {cache_dir}")
+    wanted = list(metadata["columns"] if columns is None else columns)
+    unknown = [name for name in wanted if name not in metadata["columns"]]
+    if unknown:
+        raise ValueError(f"Not in the transaction cache: {', '.join(unknown)}")
+    stored = [name for name in wanted if name not in DERIVED_COLUMNS]
+    for name in wanted:
+        stored += [c for c in DERIVED_COLUMNS.get(name, []) if c not in stored]
+
+    dataset = ds.dataset(cache_dir, format="parquet", partitioning="hive")
+    table = dataset.to_table(columns=stored, filter=_date_filter(start, end))
+    df = table.to_pandas()
+
+    if "customer_id" in df:
+        # Categorical in string order, as compact_transactions builds it.
+        ids, codes = np.unique(df["customer_id"].to_numpy(), return_inverse=True)
+        names = pd.Index(ids.astype(str), dtype="str")
+        order = names.argsort()
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        df["customer_id"] = pd.Categorical.from_codes(rank[codes], names[order])
+    if "unit_price" in df and metadata["unit_price_scale"]:
+        df["unit_price"] = df["unit_price"].to_numpy() / metadata["unit_price_scale"]
+    elif "unit_price" in df:
+        df["unit_price"] = df["unit_price"].astype(np.float64)
+    if "line_revenue" in wanted:
+        df["line_revenue"] = df["quantity"] * df["unit_price"]
+    return df[wanted]
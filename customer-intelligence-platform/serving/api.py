@@ -1,42 +1,433 @@
 """Real-time scoring API.
 
 Loads the latest model from the registry at startup and serves predictions.
+New versions can be swapped in without a restart: the replacement bundle is
+loaded and warmed in the background, then replaces the live one in a single
+assignment. In-flight requests finish on the bundle they started with.
 
 Run from the customer-intelligence-platform directory:
 
     uvicorn serving.api:app --reload
 
 Endpoints:
-    GET  /health   → model version + status (for load balancers / k8s probes)
-    POST /predict  → churn score for one customer
+    GET  /health         → model version + status (for load balancers / k8s probes)
+    POST /predict        → churn score for one customer
+    POST /predict/batch  → churn scores for many customers in one model call
+    POST /predict/fast, /predict/batch/fast
+                         → the same, parsed and rendered with a fast JSON codec;
+                           items may send positional "values" instead of "features"
+    POST /admin/reload   → switch to the latest (or a given) registry version
+    POST /admin/shadow   → shadow-score live traffic with a candidate version (or stop)
+                           (admin endpoints need ADMIN_TOKEN; see below)
+    GET  /metrics        → Prometheus metrics: counts, errors, per-stage latency
+    GET  /drift          → PSI / KS of served features and scores vs training
 
-Set REGISTRY_DIR to point at a non-default registry (used by tests and Docker).
+Set BINARY_PORT (and optionally BINARY_HOST) to also serve the length-prefixed
+binary protocol in binary_protocol.py: positional float64 batches streamed over
+one connection, scored by the same bundles, contract and caches.
+
+Send an X-Model-Version header to /predict or /predict/batch to be scored by a
+specific registry version instead of the live one. Only versions already
+resident (the live one, the shadow version) or listed in SELECTABLE_VERSIONS
+(comma-separated, loaded at startup) are served; any other version gets a 404
+without being loaded, so callers can't force a model load per request. Up to
+MODEL_CACHE_SIZE such versions stay resident (least recently used evicted);
+keep it at least the length of SELECTABLE_VERSIONS. With SHADOW_VERSION set,
+live-version traffic is re-scored by that version after the response is sent,
+and the score deltas are logged and summarised on /health.
+Set PREDICTION_CACHE_SIZE (and optionally PREDICTION_CACHE_TTL_SECONDS) to cache
+scores by (model version, feature vector); hit/miss counters appear on /health.
+
+/admin/* changes what every caller is scored with, so it is refused (403)
+unless ADMIN_TOKEN is set, and then requires that token in an X-Admin-Token
+header (401 otherwise). A version whose files fail their registry checksums
+is reported as 409, never as a bad request.
+
+Set REGISTRY_DIR to point at a non-default registry (used by tests and Docker),
+and MAX_BATCH_SIZE to cap how many customers one /predict/batch call may carry.
+Set MICROBATCH_WINDOW_MS (and optionally MICROBATCH_MAX_SIZE) to queue concurrent
+/predict calls and score them together; /health then reports the batcher's stats.
+Set MODEL_POLL_SECONDS to watch the registry and reload when a newer version lands.
+
+When the live version ships a drift reference (see drift.py), every row it
+scores is counted into fixed-bin histograms. Set DRIFT_CHECK_SECONDS to close
+a drift window that often, logging a warning for each shifted feature or score.
 """
 
+import asyncio
+import hmac
+import logging
 import os
-from contextlib import asynccontextmanager
+import time
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timezone
 from pathlib import Path
 
-import pandas as pd
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Request
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse
+import numpy as np
+from pydantic import BaseModel, Field, model_validator
+from pydantic_core import PydanticCustomError
+from starlette.concurrency import run_in_threadpool
 
-from .model_loader import load_model, validate_features
+from . import binary_protocol, codec, metrics
+from .bundle_cache import BundleCache, ShadowMonitor
+from .drift import monitor_for
+from .microbatch import MicroBatcher
+from .prediction_cache import PredictionCache
+from .registry_index import CorruptArtifactError
+from .model_loader import (
+    VERSION_PATTERN,
+    latest_version,
+    load_model,
+    score_rows,
+    validate_features,
+)
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_REGISTRY = Path(__file__).resolve().parents[1] / "registry"
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "1000"))
+
+state = {
+    "bundle": None,
+    "batcher": None,
+    "registry": None,
+    "loaded_at": None,
+    "bundles": None,
+    "shadow": None,
+    "cache": None,
+    "drift": None,
+    "admin_token": None,
+    "selectable": frozenset(),
+}
+_reload_lock = asyncio.Lock()
+
+
+def _score_batch(items: list) -> list:
+    """(score, version) per (bundle, row) item.
+
+    Each row is scored by the bundle it was validated against, so a swap
+    mid-batch can never pair one version's feature order with another's model.
+    """
+    results = [None] * len(items)
+    by_bundle = {}
+    for i, (bundle, row) in enumerate(items):
+        by_bundle.setdefault(id(bundle), (bundle, []))[1].append((i, row))
+    for bundle, entries in by_bundle.values():
+        scores = score_rows(bundle, [row for _, row in entries])
+        for (i, _), score in zip(entries, scores):
+            results[i] = (score, bundle.version)
+    return results
+
+
+def _cached_score_rows(bundle, rows: list) -> list:
+    """score_rows, answering repeat feature vectors from the prediction cache."""
+    cache = state["cache"]
+    if cache is None:
+        return score_rows(bundle, rows)
+    scores = [cache.get(bundle.version, row) for row in rows]
+    misses = [i for i, score in enumerate(scores) if score is None]
+    if misses:
+        for i, score in zip(misses, score_rows(bundle, [rows[i] for i in misses])):
+            cache.put(bundle.version, rows[i], score)
+            scores[i] = score
+    return scores
+
+
+def _record_drift(bundle, rows, scores):
+    """Count live-version traffic into the drift histograms (other versions are skipped)."""
+    monitor = state["drift"]
+    if monitor is not None and monitor.version == bundle.version:
+        monitor.record(rows, scores)
 
-state = {"bundle": None}
+
+def _validate_and_score(bundle, items: list, to_row) -> tuple:
+    """(errors, scores) per item: validate each with `to_row`, score the valid ones at once.
+
+    A contract violation rejects only its own item: errors[i] holds the message
+    and scores[i] is None.
+    """
+    errors, scores = [None] * len(items), [None] * len(items)
+    rows, positions = [], []
+    for i, item in enumerate(items):
+        try:
+            rows.append(to_row(item))
+            positions.append(i)
+        except ValueError as exc:
+            errors[i] = str(exc)
+    if len(rows) < len(items):
+        metrics.REJECTED_ITEMS.inc(bundle.version, amount=len(items) - len(rows))
+    metrics.lap("validate")
+    if rows:
+        row_scores = _cached_score_rows(bundle, rows)
+        for pos, score in zip(positions, row_scores):
+            scores[pos] = score
+        _record_drift(bundle, rows, row_scores)
+    metrics.lap("score")
+    return errors, scores
+
+
+async def _score_one(bundle, row: list) -> tuple:
+    """(score, version) for one validated row, via the cache and micro-batcher if enabled."""
+    cache = state["cache"]
+    score = cache.get(bundle.version, row) if cache is not None else None
+    version = bundle.version
+    if score is None:
+        if state["batcher"] is not None:
+            score, version = await state["batcher"].submit((bundle, row))
+        else:
+            score, version = (await run_in_threadpool(_score_batch, [(bundle, row)]))[0]
+        if cache is not None:
+            cache.put(version, row, score)
+    _record_drift(bundle, [row], [score])  # hits too, as _validate_and_score does
+    return score, version
+
+
+def _score_matrix(bundle, X: np.ndarray) -> tuple:
+    """(scores, errors) for a positional float matrix; rejected rows score NaN."""
+    errors = bundle.validator.validate_matrix(X)
+    valid = np.flatnonzero([error is None for error in errors])
+    if len(valid) < len(X):
+        metrics.REJECTED_ITEMS.inc(bundle.version, amount=len(X) - len(valid))
+    scores = np.full(len(X), np.nan)
+    if len(valid):
+        scores[valid] = _cached_score_rows(bundle, X[valid])
+        monitor = state["drift"]
+        if monitor is not None and monitor.version == bundle.version:
+            monitor.update(X[valid], scores[valid])
+    return scores, errors
+
+
+async def _binary_info() -> bytes:
+    bundle = state["bundle"]
+    return binary_protocol.encode_info(bundle.version, bundle.feature_names)
+
+
+async def _binary_score(version: str | None, ids: list, X: np.ndarray) -> bytes:
+    """SCORE frames from the binary transport; ValueError becomes an ERROR reply."""
+    start = time.perf_counter()
+    try:
+        if len(ids) > MAX_BATCH_SIZE:
+            raise ValueError(f"batch of {len(ids)} exceeds MAX_BATCH_SIZE={MAX_BATCH_SIZE}")
+        try:
+            bundle = await run_in_threadpool(_resolve_bundle, version)
+        except HTTPException as exc:
+            raise ValueError(exc.detail) from None
+        scores, errors = await run_in_threadpool(_score_matrix, bundle, X)
+    except ValueError:
+        metrics.REQUESTS.inc("binary:score", "error")
+        metrics.ERRORS.inc("binary:score", "contract_violation")
+        raise
+    metrics.REQUESTS.inc("binary:score", "ok")
+    metrics.REQUEST_LATENCY.observe(time.perf_counter() - start, "binary:score", bundle.version)
+    if version is None and state["shadow"] is not None:
+        items = [(ids[i], dict(zip(bundle.feature_names, X[i].tolist())), float(scores[i]))
+                 for i, error in enumerate(errors) if error is None]
+        asyncio.get_running_loop().run_in_executor(None, _shadow_score, items, bundle.version)
+    return binary_protocol.encode_score_response(bundle.version, scores, errors)
+
+
+def _load_and_warm(registry: Path, version: str):
+    """Load a bundle and push one synthetic request through it before it goes live."""
+    bundle = load_model(registry, version)
+    synthetic = validate_features(bundle, {name: 0.0 for name in bundle.feature_names})
+    score_rows(bundle, [synthetic])
+    return bundle
+
+
+async def reload_model(version: str = None) -> dict:
+    """Swap in `version` (default: latest) if it isn't already live."""
+    if version is not None and not VERSION_PATTERN.match(version):
+        raise ValueError(f"Not a registry version: {version!r}")
+    async with _reload_lock:
+        registry = state["registry"]
+        target = version or await run_in_threadpool(latest_version, registry)
+        previous = state["bundle"].version if state["bundle"] is not None else None
+        if target != previous:
+            bundle = await run_in_threadpool(_load_and_warm, registry, target)
+            state["bundle"] = bundle  # one assignment: requests see old or new, never half
+            state["loaded_at"] = datetime.now(timezone.utc).isoformat()
+            state["drift"] = monitor_for(bundle)
+            if state["cache"] is not None and previous is not None:
+                state["cache"].invalidate(previous)
+            logger.info("Switched model %s → %s", previous, target)
+        return {"model_version": target, "previous_version": previous,
+                "reloaded": target != previous}
+
+
+def _corrupt(exc: CorruptArtifactError) -> HTTPException:
+    return HTTPException(status_code=409,
+                         detail=f"registry version failed its integrity check: {exc}")
+
+
+def _resolve_bundle(version: str | None, load: bool = False):
+    """The live bundle, or another resident version.
+
+    A version that isn't resident is only loaded if it is in SELECTABLE_VERSIONS,
+    or `load` is set (admin calls); otherwise it is a 404.
+    """
+    live = state["bundle"]
+    if version is None or version == live.version:
+        return live
+    if not VERSION_PATTERN.match(version):
+        raise HTTPException(status_code=400, detail=f"Not a registry version: {version!r}")
+    bundle = state["bundles"].resident(version)
+    if bundle is not None:
+        return bundle
+    if not load and version not in state["selectable"]:
+        raise HTTPException(status_code=404, detail=(
+            f"Unknown model version: {version} (not resident or in SELECTABLE_VERSIONS)"))
+    try:
+        return state["bundles"].get(version)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    except CorruptArtifactError as exc:
+        raise _corrupt(exc)
+
+
+def _shadow_score(items: list, live_version: str):
+    """Re-score (customer_id, features, live_score) items with the shadow version.
+
+    Runs as a background task after the response is sent, so a slow or broken
+    candidate can never affect what callers see.
+    """
+    monitor = state["shadow"]
+    if monitor is None or monitor.version == live_version:
+        return
+    try:
+        bundle = state["bundles"].get(monitor.version)
+        ids, rows, live_scores = [], [], []
+        for customer_id, features, live_score in items:
+            try:
+                rows.append(validate_features(bundle, features))
+            except ValueError:
+                monitor.record_rejected()
+                continue
+            ids.append(customer_id)
+            live_scores.append(live_score)
+        shadow_scores = score_rows(bundle, rows) if rows else []
+    except Exception:
+        monitor.record_error()
+        logger.exception("Shadow scoring with %s failed", monitor.version)
+        return
+    for customer_id, live, shadow in zip(ids, live_scores, shadow_scores):
+        monitor.record(shadow - live)
+        logger.debug("shadow %s vs %s customer=%s delta=%+.4f",
+                     monitor.version, live_version, customer_id, shadow - live)
+
+
+async def _watch_drift(interval: float):
+    """Close a drift window every `interval` seconds; warn about shifted distributions."""
+    while True:
+        await asyncio.sleep(interval)
+        monitor = state["drift"]
+        if monitor is None:
+            continue
+        report = await run_in_threadpool(monitor.rotate)
+        shifted = {name: report["features"][name] for name in report["drifted"]}
+        if report["score"]["status"] in ("moderate", "major"):
+            shifted["churn_score"] = report["score"]
+        for name, result in shifted.items():
+            logger.warning("Drift in %s for %s since %s: psi=%.3f ks=%.3f (%s, %d rows)",
+                           name, report["model_version"], report["since"], result["psi"],
+                           result["ks"], result["status"], report["rows"])
+
+
+async def _watch_registry(interval: float):
+    """Reload whenever the registry's latest version changes."""
+    seen = await run_in_threadpool(latest_version, state["registry"])
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            latest = await run_in_threadpool(latest_version, state["registry"])
+            if latest != seen:
+                await reload_model(latest)
+                seen = latest
+        except Exception:
+            # A half-written version dir or a bad artifact must not take down serving.
+            logger.exception("Registry watch failed; keeping %s", state["bundle"].version)
+
+
+def preload_model():
+    """Load and warm the live bundle before the app starts.
+
+    Called by serving.launcher in the parent process, so every forked worker
+    starts with the bundle already in (copy-on-write shared) memory and its
+    lifespan skips the load.
+    """
+    registry = Path(os.environ.get("REGISTRY_DIR", DEFAULT_REGISTRY))
+    state["registry"] = registry
+    state["bundle"] = _load_and_warm(registry, latest_version(registry))
+    state["loaded_at"] = datetime.now(timezone.utc).isoformat()
+    return state["bundle"]
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     registry = Path(os.environ.get("REGISTRY_DIR", DEFAULT_REGISTRY))
-    state["bundle"] = load_model(registry)
+    if state["bundle"] is None or state["registry"] != registry:
+        state["registry"] = registry
+        state["bundle"] = load_model(registry)
+        state["loaded_at"] = datetime.now(timezone.utc).isoformat()
+    state["drift"] = monitor_for(state["bundle"])  # per worker: histograms aren't shared
+    state["admin_token"] = os.environ.get("ADMIN_TOKEN") or None
+    state["bundles"] = BundleCache(registry, int(os.environ.get("MODEL_CACHE_SIZE", "3")))
+    state["selectable"] = frozenset(
+        v.strip() for v in os.environ.get("SELECTABLE_VERSIONS", "").split(",") if v.strip())
+    for version in state["selectable"]:
+        state["bundles"].get(version)  # resident before traffic, not on a request
+    shadow_version = os.environ.get("SHADOW_VERSION")
+    state["shadow"] = ShadowMonitor(shadow_version) if shadow_version else None
+    cache_size = int(os.environ.get("PREDICTION_CACHE_SIZE", "0"))
+    if cache_size > 0:
+        state["cache"] = PredictionCache(
+            cache_size, float(os.environ.get("PREDICTION_CACHE_TTL_SECONDS", "3600")))
+    watcher = None
+    poll_seconds = float(os.environ.get("MODEL_POLL_SECONDS", "0"))
+    if poll_seconds > 0:
+        watcher = asyncio.create_task(_watch_registry(poll_seconds))
+    drift_watcher = None
+    drift_seconds = float(os.environ.get("DRIFT_CHECK_SECONDS", "0"))
+    if drift_seconds > 0:
+        drift_watcher = asyncio.create_task(_watch_drift(drift_seconds))
+    window_ms = float(os.environ.get("MICROBATCH_WINDOW_MS", "0"))
+    if window_ms > 0:
+        state["batcher"] = MicroBatcher(
+            _score_batch,
+            window_ms=window_ms,
+            max_size=int(os.environ.get("MICROBATCH_MAX_SIZE", "64")),
+        )
+        await state["batcher"].start()
+    binary_server = None
+    binary_port = int(os.environ.get("BINARY_PORT", "0"))
+    if binary_port > 0:
+        binary_server = await binary_protocol.start_server(
+            _binary_info, _binary_score, os.environ.get("BINARY_HOST", "0.0.0.0"), binary_port)
     yield
+    if binary_server is not None:
+        binary_server.close()
+    for task in (watcher, drift_watcher):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    if state["batcher"] is not None:
+        await state["batcher"].stop()
     state["bundle"] = None
+    state["batcher"] = None
+    state["bundles"] = None
+    state["shadow"] = None
+    state["cache"] = None
+    state["drift"] = None
+    state["admin_token"] = None
+    state["selectable"] = frozenset()
 
 
 app = FastAPI(title="Customer Intelligence Scoring API", lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 class PredictRequest(BaseModel):
@@ -50,29 +441,280 @@ class PredictResponse(BaseModel):
     model_version: str
 
 
+class BatchPredictRequest(BaseModel):
+    items: list[PredictRequest] = Field(..., min_length=1)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _cap_batch_size(cls, data):
+        """Refuse an oversized batch on its raw item count, before any item is parsed."""
+        items = data.get("items") if isinstance(data, dict) else None
+        if isinstance(items, list) and len(items) > MAX_BATCH_SIZE:
+            raise PydanticCustomError(
+                "batch_too_large", "batch of {n} exceeds MAX_BATCH_SIZE={cap}",
+                {"n": len(items), "cap": MAX_BATCH_SIZE})
+        return data
+
+
+class BatchItemResult(BaseModel):
+    customer_id: str
+    churn_score: float | None = None
+    error: str | None = None
+
+
+class BatchPredictResponse(BaseModel):
+    model_version: str
+    n_scored: int
+    n_rejected: int
+    results: list[BatchItemResult]
+
+
+@app.exception_handler(RequestValidationError)
+async def _validation_error(request: Request, exc: RequestValidationError):
+    """An oversized batch is 413 (as on the fast path); other bad bodies stay 422."""
+    for error in exc.errors():
+        if error["type"] == "batch_too_large":
+            return JSONResponse(status_code=413, content={"detail": error["msg"]})
+    return await request_validation_exception_handler(request, exc)
+
+
 @app.get("/health")
 def health():
     bundle = state["bundle"]
+    batcher = state["batcher"]
     return {
         "status": "ok",
         "model_version": bundle.version,
         "auc_at_training": bundle.metrics.get("auc_test"),
+        "loaded_at": state["loaded_at"],
+        "microbatch": batcher.stats() if batcher is not None else None,
+        "resident_versions": state["bundles"].versions(),
+        "shadow": state["shadow"].stats() if state["shadow"] is not None else None,
+        "prediction_cache": state["cache"].stats() if state["cache"] is not None else None,
+        "feature_names": bundle.feature_names,  # the order for positional "values"
+        "json_codec": codec.BACKEND,
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/drift")
+def drift():
+    """Served-vs-training distribution shift for the live version.
+
+    "current" covers rows scored since the last window closed (or startup);
+    "last_window" is the previous closed window when DRIFT_CHECK_SECONDS is set.
+    """
+    monitor = state["drift"]
+    if monitor is None:
+        raise HTTPException(status_code=404,
+                            detail=f"{state['bundle'].version} has no drift reference")
+    return {"current": monitor.report(), "last_window": monitor.last_window}
+
+
 @app.post("/predict", response_model=PredictResponse)
-def predict(req: PredictRequest):
-    bundle = state["bundle"]
+async def predict(req: PredictRequest, background_tasks: BackgroundTasks,
+                  x_model_version: str | None = Header(default=None)):
+    metrics.lap("parse")
+    if x_model_version is None:
+        bundle = state["bundle"]
+    else:
+        bundle = await run_in_threadpool(_resolve_bundle, x_model_version)
+    metrics.set_model_version(bundle.version)
     try:
         row = validate_features(bundle, req.features)
     except ValueError as exc:
         # Reject contract violations loudly — never impute silently in serving.
         raise HTTPException(status_code=400, detail=str(exc))
-    # DataFrame (not a bare list) so feature names match what the model saw in training
-    X = pd.DataFrame([row], columns=bundle.feature_names)
-    score = float(bundle.model.predict_proba(X)[0, 1])
+    finally:
+        metrics.lap("validate")
+    score, version = await _score_one(bundle, row)
+    metrics.lap("score")
+    if x_model_version is None and state["shadow"] is not None:
+        background_tasks.add_task(_shadow_score, [(req.customer_id, req.features, score)],
+                                  version)
     return PredictResponse(
         customer_id=req.customer_id,
         churn_score=round(score, 4),
+        model_version=version,
+    )
+
+
+@app.post("/predict/batch", response_model=BatchPredictResponse)
+def predict_batch(req: BatchPredictRequest, background_tasks: BackgroundTasks,
+                  x_model_version: str | None = Header(default=None)):
+    """Score many customers with one vectorized model call.
+
+    Each item is validated on its own: a contract violation rejects that item
+    (reported in its `error` field), never the whole batch.
+    """
+    metrics.lap("parse")
+    bundle = _resolve_bundle(x_model_version)
+    metrics.set_model_version(bundle.version)
+    errors, scores = _validate_and_score(
+        bundle, req.items, lambda item: validate_features(bundle, item.features))
+    results = [
+        BatchItemResult(customer_id=item.customer_id, error=error,
+                        churn_score=round(score, 4) if score is not None else None)
+        for item, error, score in zip(req.items, errors, scores)
+    ]
+    n_scored = sum(score is not None for score in scores)
+    if n_scored and x_model_version is None and state["shadow"] is not None:
+        background_tasks.add_task(_shadow_score, [
+            (item.customer_id, item.features, score)
+            for item, score in zip(req.items, scores) if score is not None
+        ], bundle.version)
+
+    return BatchPredictResponse(
         model_version=bundle.version,
+        n_scored=n_scored,
+        n_rejected=len(results) - n_scored,
+        results=results,
     )
+
+
+# --- fast path: raw body + fast JSON codec, optional positional feature values ---
+
+def _parse_fast_body(body: bytes) -> dict:
+    try:
+        payload = codec.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="request body is not valid JSON")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=422, detail="request body must be a JSON object")
+    return payload
+
+
+def _fast_customer_id(item) -> str:
+    customer_id = item.get("customer_id") if isinstance(item, dict) else None
+    if not isinstance(customer_id, str) or not customer_id:
+        raise HTTPException(status_code=422, detail="every item needs a non-empty customer_id")
+    return customer_id
+
+
+def _fast_row(bundle, item: dict) -> list:
+    """Validated, ordered values from an item's "values" array or "features" object."""
+    values = item.get("values")
+    if values is not None:
+        if not isinstance(values, list):
+            raise ValueError('"values" must be an array')
+        return bundle.validator.validate_values(values)
+    features = item.get("features")
+    if isinstance(features, dict):
+        return bundle.validator(features)
+    raise ValueError('item needs a "features" object or a "values" array')
+
+
+def _fast_features(bundle, item: dict) -> dict:
+    """A validated item's features as a dict, rebuilt from positional values if need be."""
+    values = item.get("values")
+    return item["features"] if values is None else dict(zip(bundle.feature_names, values))
+
+
+@app.post("/predict/fast", response_class=codec.FastJSONResponse)
+async def predict_fast(request: Request, background_tasks: BackgroundTasks,
+                       x_model_version: str | None = Header(default=None)):
+    """/predict without pydantic: body parsed and response rendered by serving.codec.
+
+    Send {"customer_id": ..., "features": {...}} as for /predict, or
+    {"customer_id": ..., "values": [...]} with the values in the order /health
+    lists as feature_names (that of the X-Model-Version version, if one is sent).
+    """
+    item = _parse_fast_body(await request.body())
+    customer_id = _fast_customer_id(item)
+    metrics.lap("parse")
+    if x_model_version is None:
+        bundle = state["bundle"]
+    else:
+        bundle = await run_in_threadpool(_resolve_bundle, x_model_version)
+    metrics.set_model_version(bundle.version)
+    try:
+        row = _fast_row(bundle, item)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    finally:
+        metrics.lap("validate")
+    score, version = await _score_one(bundle, row)
+    metrics.lap("score")
+    if x_model_version is None and state["shadow"] is not None:
+        background_tasks.add_task(
+            _shadow_score, [(customer_id, _fast_features(bundle, item), score)], version)
+    return codec.FastJSONResponse({
+        "customer_id": customer_id,
+        "churn_score": round(score, 4),
+        "model_version": version,
+    })
+
+
+@app.post("/predict/batch/fast", response_class=codec.FastJSONResponse)
+async def predict_batch_fast(request: Request, background_tasks: BackgroundTasks,
+                             x_model_version: str | None = Header(default=None)):
+    """/predict/batch without pydantic; items take "features" or positional "values"."""
+    items = _parse_fast_body(await request.body()).get("items")
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=422, detail='"items" must be a non-empty array')
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"batch of {len(items)} exceeds MAX_BATCH_SIZE={MAX_BATCH_SIZE}",
+        )
+    customer_ids = [_fast_customer_id(item) for item in items]
+    metrics.lap("parse")
+    bundle = await run_in_threadpool(_resolve_bundle, x_model_version)
+    metrics.set_model_version(bundle.version)
+    errors, scores = await run_in_threadpool(
+        _validate_and_score, bundle, items, lambda item: _fast_row(bundle, item))
+    n_scored = sum(score is not None for score in scores)
+    if n_scored and x_model_version is None and state["shadow"] is not None:
+        background_tasks.add_task(_shadow_score, [
+            (customer_id, _fast_features(bundle, item), score)
+            for customer_id, item, score in zip(customer_ids, items, scores) if score is not None
+        ], bundle.version)
+    return codec.FastJSONResponse({
+        "model_version": bundle.version,
+        "n_scored": n_scored,
+        "n_rejected": len(items) - n_scored,
+        "results": [
+            {"customer_id": customer_id,
+             "churn_score": round(score, 4) if score is not None else None,
+             "error": error}
+            for customer_id, error, score in zip(customer_ids, errors, scores)
+        ],
+    })
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    """Gate /admin/*: disabled without ADMIN_TOKEN, else the caller must send it."""
+    expected = state["admin_token"]
+    if expected is None:
+        raise HTTPException(status_code=403, detail="admin endpoints are disabled; set ADMIN_TOKEN")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(),
+                                                        expected.encode()):
+        raise HTTPException(status_code=401, detail="missing or wrong X-Admin-Token")
+
+
+@app.post("/admin/reload", dependencies=[Depends(require_admin)])
+async def admin_reload(version: str | None = None):
+    """Load, warm and switch to `version` (default: the registry's latest)."""
+    try:
+        return await reload_model(version)
+    except CorruptArtifactError as exc:
+        raise _corrupt(exc)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+
+
+@app.post("/admin/shadow", dependencies=[Depends(require_admin)])
+def admin_shadow(version: str | None = None):
+    """Start shadow-scoring live traffic with `version`; no version stops it."""
+    if version is None:
+        state["shadow"] = None
+        return {"shadow": None}
+    _resolve_bundle(version, load=True)  # load now (and 4xx now), not on the first shadowed request
+    state["shadow"] = ShadowMonitor(version)
+    return {"shadow": state["shadow"].stats()}
@@ -0,0 +1,172 @@
+"""Compact, pickle-free model artifacts for the registry.
+
+model.pkl stays the source of truth, but unpickling a sklearn pipeline means
+importing sklearn and rebuilding every estimator object, so container start
+time grows with the model. Alongside it, registration writes a compact
+artifact that load_model prefers when present:
+
+    model_compact.json   the fast_scorer spec as plain JSON: preprocessing
+                         arrays and, for linear models, the folded coefficients
+    model.lgb.txt        native LightGBM model text     (LightGBM only)
+    model.xgb.ubj        native XGBoost UBJSON model    (XGBoost only)
+
+The compact file also records the pipeline's scores on the fast_scorer probe
+rows. Loading re-scores the probes and refuses an artifact that disagrees, so
+the compact path can't silently drift from model.pkl.
+
+Compare cold-start load times for a registry version (fresh process each):
+
+    python -m serving.artifacts --registry registry --repeats 5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .fast_scorer import (
+    FastScorer,
+    build_scorer,
+    describe_model,
+    matches_reference,
+    reference_scores,
+)
+from .registry_index import CorruptArtifactError
+
+COMPACT_FILE = "model_compact.json"
+FORMAT_VERSION = 1
+BOOSTER_FILES = {"lightgbm": "model.lgb.txt", "xgboost": "model.xgb.ubj"}
+
+
+class CompactModel:
+    """predict_proba-compatible model backed by a FastScorer, for bundle.model."""
+
+    classes_ = np.array([0, 1])
+
+    def __init__(self, scorer: FastScorer, feature_names: list):
+        self.scorer = scorer
+        self.feature_names = feature_names
+
+    def predict_proba(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            X = X[self.feature_names]
+        p = self.scorer.predict(np.asarray(X, dtype=float))
+        return np.column_stack([1 - p, p])
+
+
+def _to_json(spec: dict) -> dict:
+    def plain(d):
+        return {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in d.items()}
+    estimator = {k: v for k, v in spec["estimator"].items() if k != "booster"}
+    if "booster" in spec["estimator"]:
+        estimator["file"] = BOOSTER_FILES[estimator["type"]]
+    return {"transforms": [plain(t) for t in spec["transforms"]], "estimator": plain(estimator)}
+
+
+def _from_json(doc: dict, vdir: Path) -> dict:
+    def arrays(d):
+        return {k: np.asarray(v, dtype=float) if isinstance(v, list) else v for k, v in d.items()}
+    estimator = arrays(doc["estimator"])
+    if estimator["type"] == "lightgbm":
+        import lightgbm
+        estimator["booster"] = lightgbm.Booster(model_file=str(vdir / estimator["file"]))
+    elif estimator["type"] == "xgboost":
+        import xgboost
+        estimator["booster"] = xgboost.Booster()
+        estimator["booster"].load_model(str(vdir / estimator["file"]))
+    return {"transforms": [arrays(t) for t in doc["transforms"]], "estimator": estimator}
+
+
+def save_compact(model, feature_names: list, vdir) -> bool:
+    """Write the compact artifact next to model.pkl; False if the model isn't supported."""
+    vdir = Path(vdir)
+    try:
+        spec = describe_model(model, len(feature_names))
+        if spec is None:
+            return False
+        expected = reference_scores(model, feature_names)
+        if not matches_reference(build_scorer(spec), expected, len(feature_names)):
+            return False
+    except Exception:
+        # As in build_fast_scorer: a model we can't introspect just keeps model.pkl.
+        return False
+
+    if "booster" in spec["estimator"]:
+        spec["estimator"]["booster"].save_model(str(vdir / BOOSTER_FILES[spec["estimator"]["type"]]))
+    (vdir / COMPACT_FILE).write_text(json.dumps({
+        "format_version": FORMAT_VERSION,
+        "feature_names": feature_names,
+        **_to_json(spec),
+        "probe_scores": expected.tolist(),
+    }, indent=2))
+    return True
+
+
+def load_compact(vdir, feature_names: list) -> CompactModel:
+    """Rebuild a model from the compact artifact, verified against its recorded probes."""
+    vdir = Path(vdir)
+    doc = json.loads((vdir / COMPACT_FILE).read_text())
+    if doc["format_version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact artifact version {doc['format_version']}")
+    if doc["feature_names"] != feature_names:
+        raise ValueError("Compact artifact feature order does not match feature_metadata.json")
+    scorer = build_scorer(_from_json(doc, vdir))
+    if not matches_reference(scorer, doc["probe_scores"], len(feature_names)):
+        raise CorruptArtifactError(
+            f"Compact artifact in {vdir} does not reproduce its recorded scores")
+    return CompactModel(scorer, feature_names)
+
+
+def _time_cold_load(registry_dir, version: str, prefer_compact: bool) -> float:
+    """Seconds for a fresh interpreter to import the loader and load one version."""
+    code = (
+        "import time; t = time.perf_counter(); "
+        "from serving.model_loader import load_model; "
+        f"load_model({str(registry_dir)!r}, {version!r}, prefer_compact={prefer_compact}); "
+        "print(time.perf_counter() - t)"
+    )
+    root = Path(__file__).resolve().parents[1]
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, check=True,
+                         capture_output=True, text=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def benchmark_load(registry_dir, version: str, repeats: int = 5) -> dict:
+    """Median cold-start load time, pickle vs. compact artifact."""
+    results = {}
+    for label, prefer_compact in [("pickle", False), ("compact", True)]:
+        times = [_time_cold_load(registry_dir, version, prefer_compact) for _ in range(repeats)]
+        results[f"{label}_ms"] = round(statistics.median(times) * 1000, 1)
+    results["speedup"] = round(results["pickle_ms"] / results["compact_ms"], 2)
+    return results
+
+
+def main():
+    from .model_loader import latest_version
+
+    parser = argparse.ArgumentParser(description="Compare pickle vs. compact artifact load time")
+    parser.add_argument("--registry", default=str(Path(__file__).resolve().parents[1] / "registry"))
+    parser.add_argument("--version", default=None, help="e.g. model_v1 (default: latest)")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    version = args.version or latest_version(args.registry)
+    if not (Path(args.registry) / version / COMPACT_FILE).exists():
+        raise SystemExit(f"{version} has no {COMPACT_FILE} — nothing to compare")
+    start = time.perf_counter()
+    results = benchmark_load(args.registry, version, args.repeats)
+    print(f"\nCold-start load of {version} (median of {args.repeats} fresh processes):")
+    print(f"  {'pickle':<8} {results['pickle_ms']:>8.1f} ms")
+    print(f"  {'compact':<8} {results['compact_ms']:>8.1f} ms")
+    print(f"  {'speedup':<8} {results['speedup']:>8.2f}x   "
+          f"(benchmark took {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,573 @@
-"""Batch scoring job: score every customer in a CSV, write a scores table.
+"""Batch scoring job: score every customer in a file, write a scores table.
 
 This is the deployment mode that fits churn best — scores change slowly and
 are consumed by campaign tools, so a scheduled job writing a table beats a
 real-time endpoint.
 
+For inputs too large to hold in memory, --chunksize streams the file: the
+header is validated once up front, then each chunk is read, scored and
+appended to the output, so memory stays flat however many customers there are.
+
+--workers N spreads the same work across N processes: the file is cut into
+line-aligned byte ranges, each worker loads the model once and parses, scores
+and writes its own ranges, and the parts are stitched back together in input
+order. The model version and scored_at are fixed once per run, in the parent.
+
+Input and output may each be CSV, Parquet or Arrow IPC/Feather (by suffix, or
+--input-format/--output-format). Columnar inputs are read with column
+projection — only the id and the bundle's features — and columnar outputs are
+compressed. Parallel runs split columnar inputs by row group / record batch.
+
+Every chunk goes through vectorized contract validation (batch_validation.py)
+before scoring: rows with non-numeric, missing or infinite values, negative
+counts or values far outside the training ranges are not scored but written,
+with a reason, to a quarantine side file next to the output
+(scores.csv → scores.quarantine.csv), and the run reports counts per reason.
+
+When the model version ships a drift reference (see drift.py), the run also
+writes scores.drift.json: PSI / KS of the scored rows' features and scores
+against the training distributions, the batch-side twin of GET /drift.
+
+--incremental STATE re-scores only what changed since the last run: each
+valid row's feature vector is hashed and looked up in STATE, a Parquet index
+of (customer, feature hash, score, scored_at) written by the previous run. Rows
+whose hash matches an entry for the same model version carry their score and
+scored_at forward; new and changed rows are scored. A new model version
+re-scores everyone. The index is replaced only after the run succeeds.
+
 Run from the customer-intelligence-platform directory:
 
     python -m serving.batch_score --input customers.csv --output scores.csv
+    python -m serving.batch_score --input customers.csv --output scores.csv --chunksize 500000
+    python -m serving.batch_score --input customers.csv --output scores.csv --workers 16
+    python -m serving.batch_score --input customers.parquet --output scores.parquet
+    python -m serving.batch_score --input customers.parquet --output scores.parquet \\
+        --incremental state/score_index.parquet
 """
 
 import argparse
+import io
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
-from .model_loader import load_model
+from .batch_validation import DEFAULT_RANGE_TOLERANCE, REASON_COLUMN, validate_frame
+from .drift import monitor_for
+from .model_loader import latest_version, load_model, score_frame
+from .table_io import (
+    TableWriter,
+    count_row_groups,
+    detect_format,
+    iter_chunks,
+    read_arrow_table,
+    read_columns,
+    read_row_group,
+    read_table,
+)
 
 DEFAULT_REGISTRY = Path(__file__).resolve().parents[1] / "registry"
+OUTPUT_COLUMNS = ["churn_score", "model_version", "scored_at"]
+DEFAULT_CHUNKSIZE = 100_000
+SAMPLE_LINES = 1000  # lines read to estimate bytes per row when splitting a CSV
+HASH_MANTISSA_BITS = 32  # of float64's 52: changes above ~1e-10 relative are seen
 
+_worker = {}  # per-process state, filled once by _init_worker
 
-def score_file(input_csv, output_csv, registry_dir=DEFAULT_REGISTRY, version=None,
-               id_column: str = "customer_id") -> pd.DataFrame:
-    """Score all rows in input_csv; write id, score, model version, timestamp."""
-    bundle = load_model(registry_dir, version)
-    df = pd.read_csv(input_csv)
 
-    missing = [c for c in [id_column] + bundle.feature_names if c not in df.columns]
+def check_columns(columns, bundle, id_column: str) -> None:
+    """Fail before scoring anything if the input can't satisfy the contract."""
+    missing = [c for c in [id_column] + bundle.feature_names if c not in columns]
     if missing:
         raise ValueError(f"Input is missing required columns: {', '.join(missing)}")
 
-    X = df[bundle.feature_names]  # training order, enforced by the bundle
-    scores = bundle.model.predict_proba(X)[:, 1]
 
-    out = pd.DataFrame({
-        id_column: df[id_column],
+def score_chunk(bundle, df: pd.DataFrame, id_column: str, scored_at: str) -> pd.DataFrame:
+    """id, score, model version, timestamp for one frame of customers."""
+    X = df[bundle.feature_names]  # training order, enforced by the bundle
+    scores = score_frame(bundle, X)
+    return pd.DataFrame({
+        id_column: df[id_column].to_numpy(),
         "churn_score": scores.round(4),
         "model_version": bundle.version,
-        "scored_at": datetime.now(timezone.utc).isoformat(),
+        "scored_at": scored_at,
     })
-    out.to_csv(output_csv, index=False)
+
+
+def _empty_scores(id_column: str) -> pd.DataFrame:
+    return pd.DataFrame(columns=[id_column] + OUTPUT_COLUMNS)
+
+
+def quarantine_path(output_path) -> Path:
+    """Where rows failing validation go: scores.csv → scores.quarantine.csv."""
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.stem}.quarantine{output_path.suffix}")
+
+
+def drift_report_path(output_path) -> Path:
+    """Where the run's drift report goes: scores.csv → scores.drift.json."""
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.stem}.drift.json")
+
+
+def _track_drift(monitor, bundle, valid: pd.DataFrame, out: pd.DataFrame):
+    if monitor is not None and len(out):
+        monitor.update(valid[bundle.feature_names].to_numpy(dtype=float),
+                       out["churn_score"].to_numpy())
+
+
+def _write_drift_report(monitor, output_path) -> dict:
+    """Write and summarise the run's drift report; None if the version has no reference."""
+    path = drift_report_path(output_path)
+    path.unlink(missing_ok=True)
+    if monitor is None:
+        return None
+    report = monitor.report()
+    path.write_text(json.dumps(report, indent=2))
+    shifted = report["drifted"] + (
+        ["churn_score"] if report["score"]["status"] in ("moderate", "major") else [])
+    print(f"Drift report → {path} (shifted: {', '.join(shifted) or 'none'})")
+    return report
+
+
+def _merge_counts(total: dict, counts: dict):
+    for reason, n in counts.items():
+        total[reason] = total.get(reason, 0) + n
+
+
+def _report_quarantine(counts: dict, path):
+    n = sum(counts.values())
+    if n:
+        detail = ", ".join(f"{reason}={k:,}" for reason, k in sorted(counts.items()))
+        print(f"Quarantined rows → {path} ({detail})")
+
+
+def score_file(input_csv, output_csv, registry_dir=DEFAULT_REGISTRY, version=None,
+               id_column: str = "customer_id", input_format: str = None,
+               output_format: str = None,
+               range_tolerance: float = DEFAULT_RANGE_TOLERANCE) -> pd.DataFrame:
+    """Score all valid rows in input_csv; write id, score, model version, timestamp.
+
+    Rows failing validation are written to quarantine_path(output_csv) instead.
+    """
+    bundle = load_model(registry_dir, version)
+    in_fmt = detect_format(input_csv, input_format)
+    out_fmt = detect_format(output_csv, output_format)
+    if in_fmt == "csv":
+        df = read_table(input_csv, in_fmt)
+        check_columns(df.columns, bundle, id_column)
+    else:
+        check_columns(read_columns(input_csv, in_fmt), bundle, id_column)
+        df = read_table(input_csv, in_fmt, columns=[id_column] + bundle.feature_names)
+
+    quarantine_path(output_csv).unlink(missing_ok=True)  # never leave a stale one behind
+    checked = validate_frame(df, bundle.validator, id_column, range_tolerance)
+    out = score_chunk(bundle, checked.valid, id_column, datetime.now(timezone.utc).isoformat())
+    monitor = monitor_for(bundle)
+    _track_drift(monitor, bundle, checked.valid, out)
+    writer = TableWriter(output_csv, out_fmt)
+    writer.write(out)
+    writer.close()
+    if len(checked.quarantined):
+        quarantine = TableWriter(quarantine_path(output_csv), out_fmt)
+        quarantine.write(checked.quarantined)
+        quarantine.close()
     print(f"Scored {len(out)} customers with {bundle.version} → {output_csv}")
+    _report_quarantine(checked.counts, quarantine_path(output_csv))
+    _write_drift_report(monitor, output_csv)
     return out
 
 
+def stream_score_file(input_csv, output_csv, registry_dir=DEFAULT_REGISTRY, version=None,
+                      id_column: str = "customer_id", chunksize: int = DEFAULT_CHUNKSIZE,
+                      input_format: str = None, output_format: str = None,
+                      range_tolerance: float = DEFAULT_RANGE_TOLERANCE) -> dict:
+    """Score input_csv chunk by chunk, appending to output_csv; return run stats.
+
+    Only the id and feature columns are parsed, and at most one chunk is in
+    memory at a time. Every row in the run shares one scored_at timestamp.
+    Rows failing validation are appended to quarantine_path(output_csv).
+    """
+    bundle = load_model(registry_dir, version)
+    in_fmt = detect_format(input_csv, input_format)
+    out_fmt = detect_format(output_csv, output_format)
+    check_columns(read_columns(input_csv, in_fmt), bundle, id_column)
+    scored_at = datetime.now(timezone.utc).isoformat()
+
+    quarantine_path(output_csv).unlink(missing_ok=True)
+    start = time.perf_counter()
+    writer = TableWriter(output_csv, out_fmt)
+    quarantine = TableWriter(quarantine_path(output_csv), out_fmt)
+    counts = {}
+    monitor = monitor_for(bundle)
+    chunks = iter_chunks(input_csv, in_fmt, [id_column] + bundle.feature_names, chunksize,
+                         dtype={id_column: str})
+    try:
+        for i, chunk in enumerate(chunks):
+            checked = validate_frame(chunk, bundle.validator, id_column, range_tolerance)
+            out = score_chunk(bundle, checked.valid, id_column, scored_at)
+            _track_drift(monitor, bundle, checked.valid, out)
+            writer.write(out)
+            if len(checked.quarantined):
+                quarantine.write(checked.quarantined)
+                _merge_counts(counts, checked.counts)
+            elapsed = time.perf_counter() - start
+            print(f"  chunk {i + 1}: {writer.rows:,} rows | {writer.rows / elapsed:,.0f} rows/s")
+    finally:
+        writer.close(empty=_empty_scores(id_column))
+        quarantine.close()
+    rows = writer.rows
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows:,} customers with {bundle.version} → {output_csv}")
+    _report_quarantine(counts, quarantine.path)
+    report = _write_drift_report(monitor, output_csv)
+    return {
+        "rows": rows,
+        "quarantined": quarantine.rows,
+        "quarantine_counts": counts,
+        "drifted": report["drifted"] if report else None,
+        "model_version": bundle.version,
+        "scored_at": scored_at,
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def csv_byte_ranges(path, target_rows: int) -> tuple:
+    """(header bytes, [(start, end), ...]) splitting the data rows on line boundaries.
+
+    Assumes no quoted newlines, which holds for id + numeric feature files.
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    with open(path, "rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+        sample = [line for line in (f.readline() for _ in range(SAMPLE_LINES)) if line]
+        if not sample:
+            return header, []
+        step = max(int(sum(map(len, sample)) / len(sample) * target_rows), 1)
+
+        bounds = [data_start]
+        while bounds[-1] + step < size:
+            f.seek(bounds[-1] + step)
+            f.readline()  # finish the current line so the next range starts on a row
+            if f.tell() >= size:
+                break
+            bounds.append(f.tell())
+        bounds.append(size)
+    return header, list(zip(bounds[:-1], bounds[1:]))
+
+
+def _init_worker(registry_dir, version: str, id_column: str, scored_at: str,
+                 range_tolerance: float = DEFAULT_RANGE_TOLERANCE):
+    """Runs once per worker process: load the bundle here, never per chunk."""
+    _worker["bundle"] = load_model(registry_dir, version)
+    _worker["id_column"] = id_column
+    _worker["scored_at"] = scored_at
+    _worker["range_tolerance"] = range_tolerance
+
+
+def _score_part(input_path, in_fmt: str, task, part_path, out_fmt: str) -> tuple:
+    """Read, validate, score and write one unit of work.
+
+    A task is a (start, end, header) byte range for CSV, or a row-group /
+    record-batch index for Parquet and Arrow. Returns (rows scored, rows
+    quarantined, reason counts, drift bin counts or None); quarantined rows go
+    to a ".quarantine" part file.
+    """
+    bundle, id_column = _worker["bundle"], _worker["id_column"]
+    columns = [id_column] + bundle.feature_names
+    if in_fmt == "csv":
+        start, end, header = task
+        with open(input_path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        df = pd.read_csv(io.BytesIO(header + data), usecols=columns, dtype={id_column: str})
+    else:
+        df = read_row_group(input_path, in_fmt, task, columns)
+    checked = validate_frame(df, bundle.validator, id_column, _worker["range_tolerance"])
+    out = score_chunk(bundle, checked.valid, id_column, _worker["scored_at"])
+    monitor = monitor_for(bundle)
+    _track_drift(monitor, bundle, checked.valid, out)
+    writer = TableWriter(part_path, out_fmt, header=False)
+    writer.write(out)
+    writer.close()
+    if len(checked.quarantined):
+        quarantine = TableWriter(_quarantine_part(part_path), out_fmt, header=False)
+        quarantine.write(checked.quarantined)
+        quarantine.close()
+    drift_counts = monitor.counts() if monitor is not None else None
+    return len(out), len(checked.quarantined), checked.counts, drift_counts
+
+
+def _quarantine_part(part_path) -> Path:
+    return Path(f"{part_path}.quarantine")
+
+
+def _stitch_parts(parts: list, output_path, out_fmt: str, columns: list):
+    """Concatenate part files, in order, into the final output."""
+    if out_fmt == "csv":
+        with open(output_path, "wb") as out:
+            out.write(",".join(columns).encode() + b"\n")
+            for part in parts:
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, out)
+        return
+    writer = TableWriter(output_path, out_fmt)
+    for part in parts:  # one part in memory at a time
+        writer.write_table(read_arrow_table(part, out_fmt))
+    writer.close(empty=pd.DataFrame(columns=columns))
+
+
+def parallel_score_file(input_csv, output_csv, registry_dir=DEFAULT_REGISTRY, version=None,
+                        id_column: str = "customer_id", chunksize: int = DEFAULT_CHUNKSIZE,
+                        workers: int = 2, input_format: str = None,
+                        output_format: str = None,
+                        range_tolerance: float = DEFAULT_RANGE_TOLERANCE) -> dict:
+    """Score input_csv across a process pool; output rows keep input order.
+
+    Quarantined rows from every part are stitched, in order, into
+    quarantine_path(output_csv).
+    """
+    version = version or latest_version(registry_dir)
+    bundle = load_model(registry_dir, version)
+    in_fmt = detect_format(input_csv, input_format)
+    out_fmt = detect_format(output_csv, output_format)
+    check_columns(read_columns(input_csv, in_fmt), bundle, id_column)
+    scored_at = datetime.now(timezone.utc).isoformat()
+
+    if in_fmt == "csv":
+        header, ranges = csv_byte_ranges(input_csv, chunksize)
+        tasks = [(start, end, header) for start, end in ranges]
+    else:
+        tasks = list(range(count_row_groups(input_csv, in_fmt)))
+    output_csv = Path(output_csv)
+    quarantine_path(output_csv).unlink(missing_ok=True)
+    parts_dir = output_csv.parent / f".{output_csv.name}.parts"
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    parts = [parts_dir / f"part-{i:05d}" for i in range(len(tasks))]
+
+    start = time.perf_counter()
+    rows = quarantined = 0
+    counts = {}
+    monitor = monitor_for(bundle)  # bin counts add up across parts
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(registry_dir, version, id_column, scored_at,
+                                       range_tolerance)) as pool:
+        n = len(tasks)
+        results = pool.map(_score_part, [input_csv] * n, [in_fmt] * n, tasks, parts,
+                           [out_fmt] * n)
+        for i, (part_rows, part_quarantined, part_counts, drift_counts) in enumerate(results):
+            rows += part_rows
+            quarantined += part_quarantined
+            _merge_counts(counts, part_counts)
+            if drift_counts is not None:
+                monitor.merge(drift_counts)
+            elapsed = time.perf_counter() - start
+            print(f"  part {i + 1}/{n}: {rows:,} rows | {rows / elapsed:,.0f} rows/s")
+
+    _stitch_parts(parts, output_csv, out_fmt, [id_column] + OUTPUT_COLUMNS)
+    quarantine_parts = [q for q in map(_quarantine_part, parts) if q.exists()]
+    if quarantine_parts:
+        _stitch_parts(quarantine_parts, quarantine_path(output_csv), out_fmt,
+                      [id_column] + bundle.feature_names + [REASON_COLUMN])
+    shutil.rmtree(parts_dir)
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows:,} customers with {version} on {workers} workers → {output_csv}")
+    _report_quarantine(counts, quarantine_path(output_csv))
+    report = _write_drift_report(monitor, output_csv)
+    return {
+        "rows": rows,
+        "quarantined": quarantined,
+        "quarantine_counts": counts,
+        "drifted": report["drifted"] if report else None,
+        "model_version": version,
+        "scored_at": scored_at,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def feature_hashes(X: pd.DataFrame) -> np.ndarray:
+    """64-bit hash of each row's feature values (columns in training order).
+
+    Values are hashed as float64, the dtype scoring sees. hash_pandas_object
+    would otherwise hash dtypes too, and CSV chunks or Parquet files may carry
+    integral columns as int64. They are also rounded to HASH_MANTISSA_BITS,
+    because pandas' CSV float parser can land one ulp away from the exact
+    value, so a CSV and a Parquet copy of the same data must hash alike.
+    """
+    drop = 52 - HASH_MANTISSA_BITS
+    bits = X.to_numpy(dtype=np.float64).view(np.uint64)
+    rounded = (bits + np.uint64(1 << (drop - 1))) >> np.uint64(drop)
+    return pd.util.hash_pandas_object(pd.DataFrame(rounded), index=False).to_numpy()
+
+
+class ScoreIndex:
+    """The previous run's (feature hash, score, scored_at) per customer, for one version."""
+
+    def __init__(self, state_path, version: str, id_column: str):
+        columns = [id_column, "feature_hash", "churn_score", "model_version", "scored_at"]
+        if Path(state_path).exists():
+            index = pd.read_parquet(state_path, columns=columns)
+            index = index[index["model_version"] == version]
+        else:
+            index = pd.DataFrame(columns=columns)
+        index = index.drop_duplicates(id_column, keep="last")
+        self.ids = pd.Index(index[id_column].to_numpy(dtype=object))
+        self.feature_hashes = index["feature_hash"].to_numpy(dtype=np.uint64)
+        self.scores = index["churn_score"].to_numpy(dtype=float)
+        self.scored_at = index["scored_at"].to_numpy(dtype=object)
+
+    def lookup(self, ids: pd.Series, hashes: np.ndarray) -> tuple:
+        """(unchanged mask, positions): rows whose id is indexed with the same feature hash."""
+        pos = self.ids.get_indexer(ids.to_numpy(dtype=object))
+        unchanged = pos >= 0
+        unchanged[unchanged] = self.feature_hashes[pos[unchanged]] == hashes[unchanged]
+        return unchanged, pos
+
+
+def incremental_score_file(input_csv, output_csv, state_path, registry_dir=DEFAULT_REGISTRY,
+                           version=None, id_column: str = "customer_id",
+                           chunksize: int = DEFAULT_CHUNKSIZE, input_format: str = None,
+                           output_format: str = None,
+                           range_tolerance: float = DEFAULT_RANGE_TOLERANCE) -> dict:
+    """stream_score_file, scoring only rows whose features changed since the last run.
+
+    The output holds every valid row, as a full run would; carried-forward rows
+    keep the scored_at of the run that actually scored them. state_path is
+    rewritten with this run's rows, so customers absent today drop out of it.
+    """
+    bundle = load_model(registry_dir, version)
+    in_fmt = detect_format(input_csv, input_format)
+    out_fmt = detect_format(output_csv, output_format)
+    check_columns(read_columns(input_csv, in_fmt), bundle, id_column)
+    quarantine_path(output_csv).unlink(missing_ok=True)
+    scored_at = datetime.now(timezone.utc).isoformat()
+
+    index = ScoreIndex(state_path, bundle.version, id_column)
+    state_path = Path(state_path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    new_state = state_path.with_name(f".{state_path.name}.tmp")
+    start = time.perf_counter()
+    writer = TableWriter(output_csv, out_fmt)
+    quarantine = TableWriter(quarantine_path(output_csv), out_fmt)
+    state_writer = TableWriter(new_state, "parquet")
+    counts = {}
+    rescored = 0
+    monitor = monitor_for(bundle)
+    chunks = iter_chunks(input_csv, in_fmt, [id_column] + bundle.feature_names, chunksize,
+                         dtype={id_column: str})
+    try:
+        for chunk in chunks:
+            checked = validate_frame(chunk, bundle.validator, id_column, range_tolerance)
+            if len(checked.quarantined):
+                quarantine.write(checked.quarantined)
+                _merge_counts(counts, checked.counts)
+            valid = checked.valid
+            X = valid[bundle.feature_names]
+            hashes = feature_hashes(X)
+            unchanged, pos = index.lookup(valid[id_column], hashes)
+
+            scores = np.empty(len(valid))
+            stamps = np.full(len(valid), scored_at, dtype=object)
+            scores[unchanged] = index.scores[pos[unchanged]]
+            stamps[unchanged] = index.scored_at[pos[unchanged]]
+            changed = ~unchanged
+            if changed.any():
+                scores[changed] = score_frame(bundle, X[changed]).round(4)
+            rescored += int(changed.sum())
+            if monitor is not None and len(valid):
+                monitor.update(X.to_numpy(dtype=float), scores)
+
+            out = pd.DataFrame({
+                id_column: valid[id_column].to_numpy(),
+                "churn_score": scores,
+                "model_version": bundle.version,
+                "scored_at": stamps,
+            })
+            writer.write(out)
+            state_writer.write(out.assign(feature_hash=hashes))
+    except BaseException:
+        state_writer.close()
+        new_state.unlink(missing_ok=True)
+        raise
+    finally:
+        writer.close(empty=_empty_scores(id_column))
+        quarantine.close()
+    state_writer.close(empty=_empty_scores(id_column).assign(
+        feature_hash=pd.Series(dtype=np.uint64)))
+    os.replace(new_state, state_path)  # only a finished run replaces the index
+    rows = writer.rows
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows:,} customers with {bundle.version} → {output_csv} "
+          f"({rescored:,} re-scored, {rows - rescored:,} carried forward)")
+    _report_quarantine(counts, quarantine.path)
+    report = _write_drift_report(monitor, output_csv)
+    return {
+        "rows": rows,
+        "rescored": rescored,
+        "carried_forward": rows - rescored,
+        "quarantined": quarantine.rows,
+        "quarantine_counts": counts,
+        "drifted": report["drifted"] if report else None,
+        "model_version": bundle.version,
+        "scored_at": scored_at,
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed, 1) if elapsed else 0.0,
+    }
+
+
 def main():
     parser = argparse.ArgumentParser(description="Batch-score customers for churn")
-    parser.add_argument("--input", required=True, help="CSV with customer_id + feature columns")
-    parser.add_argument("--output", required=True, help="Where to write the scores CSV")
+    parser.add_argument("--input", required=True,
+                        help="CSV/Parquet/Arrow file with customer_id + feature columns")
+    parser.add_argument("--output", required=True, help="Where to write the scores table")
+    parser.add_argument("--input-format", choices=["csv", "parquet", "arrow"], default=None,
+                        help="Override format detection from the --input suffix")
+    parser.add_argument("--output-format", choices=["csv", "parquet", "arrow"], default=None,
+                        help="Override format detection from the --output suffix")
     parser.add_argument("--registry", default=str(DEFAULT_REGISTRY))
     parser.add_argument("--version", default=None, help="e.g. model_v1 (default: latest)")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream the input in chunks of this many rows")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Score chunks in parallel across this many processes")
+    parser.add_argument("--incremental", default=None, metavar="STATE",
+                        help="Only re-score rows whose features changed since the run that "
+                             "wrote this Parquet score index (created if missing)")
+    parser.add_argument("--range-tolerance", type=float, default=DEFAULT_RANGE_TOLERANCE,
+                        help="Quarantine values beyond the training [min, max] widened by "
+                             "this fraction of its span")
     args = parser.parse_args()
-    score_file(args.input, args.output, args.registry, args.version)
+    if args.incremental and args.workers > 1:
+        parser.error("--incremental scores in one process; drop --workers")
+    options = {"input_format": args.input_format, "output_format": args.output_format,
+               "range_tolerance": args.range_tolerance}
+    if args.incremental:
+        incremental_score_file(args.input, args.output, args.incremental, args.registry,
+                               args.version, chunksize=args.chunksize or DEFAULT_CHUNKSIZE,
+                               **options)
+    elif args.workers > 1:
+        parallel_score_file(args.input, args.output, args.registry, args.version,
+                            chunksize=args.chunksize or DEFAULT_CHUNKSIZE, workers=args.workers,
+                            **options)
+    elif args.chunksize:
+        stream_score_file(args.input, args.output, args.registry, args.version,
+                          chunksize=args.chunksize, **options)
+    else:
+        score_file(args.input, args.output, args.registry, args.version, **options)
 
 
 if __name__ == "__main__":
@@ -4,20 +4,56 @@ Reports p50/p95/p99, not just the mean: tail latency is what users feel and
 what SLOs are written against. A mean of 5ms with a p99 of 400ms is a bad
 endpoint that looks fine on a dashboard.
 
+Three load shapes:
+
+    sequential   one request at a time (the default) — a latency floor
+    closed loop  --concurrency N workers, each sending as soon as its last
+                 request returns — what a replica sustains
+    open loop    --rate R requests/s on a fixed schedule, latency measured
+                 from the *intended* send time — avoids coordinated omission,
+                 where a slow server quietly slows the load generator down
+
+--batch-sizes 1,10,100 benchmarks /predict/batch payloads of each size, and
+--output writes every run (summary + log-linear latency histogram) to JSON so
+runs can be diffed. Point --url at /predict/fast or /predict/batch/fast to use
+the fast JSON path; --format values sends positional feature arrays (in the
+order /health advertises) instead of name → value objects. A tcp://host:port
+--url benchmarks the binary transport (API started with BINARY_PORT) with the
+same payloads, sent as float64 arrays over one connection per worker.
+
 Run (server must be running in another terminal):
 
     uvicorn serving.api:app --port 8000
     python -m serving.benchmark --n 500
+    python -m serving.benchmark --n 5000 --concurrency 16
+    python -m serving.benchmark --n 5000 --rate 500 --concurrency 64
+    python -m serving.benchmark --url http://127.0.0.1:8000/predict/batch \\
+        --batch-sizes 1,10,100 --concurrency 8 --output bench.json
+    python -m serving.benchmark --url http://127.0.0.1:8000/predict/fast --format values
+    BINARY_PORT=9000 uvicorn serving.api:app --port 8000
+    python -m serving.benchmark --url tcp://127.0.0.1:9000 --batch-sizes 1,100 --concurrency 8
 """
 
 import argparse
 import statistics
+import threading
 import time
 import urllib.error
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
 
 import json as _json
 
+import numpy as np
+
+from .binary_protocol import (
+    BinaryClient,
+    ProtocolError,
+    decode_score_response,
+    encode_score_request,
+)
+
 SAMPLE = {
     "customer_id": "bench",
     "features": {
@@ -26,14 +62,72 @@ SAMPLE = {
     },
 }
 
+HISTOGRAM_SUB_BUCKET_BITS = 7  # 128 sub-buckets per power of two → <1% relative error
 
-def time_request(url: str, payload: dict) -> float:
-    """Round-trip time for one request, in milliseconds."""
+
+def batch_payload(size: int) -> dict:
+    """A /predict/batch body carrying `size` copies of SAMPLE."""
+    return {"items": [{**SAMPLE, "customer_id": f"bench_{i}"} for i in range(size)]}
+
+
+def feature_order(url: str) -> list:
+    """The live model's feature order, from /health on the server behind `url`."""
+    parts = urlsplit(url)
+    health = urlunsplit((parts.scheme, parts.netloc, "/health", "", ""))
+    with urllib.request.urlopen(health) as resp:
+        return _json.loads(resp.read())["feature_names"]
+
+
+def positional(payload: dict, feature_names: list) -> dict:
+    """`payload` with every item's features sent as a "values" array instead."""
+    def item(d):
+        return {"customer_id": d["customer_id"],
+                "values": [d["features"][name] for name in feature_names]}
+    if "items" in payload:
+        return {"items": [item(d) for d in payload["items"]]}
+    return item(payload)
+
+
+def _binary_sender(url: str, payload: dict):
+    """send() for the binary transport: one persistent connection per thread."""
+    parts = urlsplit(url)
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, "client"):
+            local.client = BinaryClient(parts.hostname, parts.port)
+        return local.client
+
+    feature_names = client().info()["feature_names"]
+    items = payload.get("items", [payload])
+    X = np.array([[item["features"][name] for name in feature_names] for item in items])
+    request = encode_score_request([item["customer_id"] for item in items], X)
+
+    def send():
+        decode_score_response(client().roundtrip(request))  # raises ProtocolError on ERROR
+    return send
+
+
+def make_sender(url: str, payload: dict):
+    """A zero-argument callable that sends `payload` once and waits for the reply.
+
+    http(s):// URLs POST the JSON body; tcp://host:port uses the binary protocol.
+    """
+    if url.startswith("tcp://"):
+        return _binary_sender(url, payload)
     data = _json.dumps(payload).encode()
-    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+
+    def send():
+        req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req) as resp:
+            resp.read()
+    return send
+
+
+def time_request(send) -> float:
+    """Round-trip time for one request, in milliseconds."""
     start = time.perf_counter()
-    with urllib.request.urlopen(req) as resp:
-        resp.read()
+    send()
     return (time.perf_counter() - start) * 1000
 
 
@@ -44,19 +138,142 @@ def percentile(values: list, p: float) -> float:
     return ordered[idx]
 
 
-def benchmark(url: str, n: int = 500, warmup: int = 20) -> dict:
+class LatencyHistogram:
+    """HDR-style log-linear histogram of latencies, recorded in microseconds.
+
+    Each power-of-two range is split into 2**HISTOGRAM_SUB_BUCKET_BITS linear
+    sub-buckets, so relative error is bounded while memory stays constant and
+    two runs' histograms can be merged or diffed bucket by bucket.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+
+    @staticmethod
+    def bucket_floor(us: int) -> int:
+        shift = max(us.bit_length() - HISTOGRAM_SUB_BUCKET_BITS, 0)
+        return (us >> shift) << shift
+
+    def record(self, ms: float):
+        key = self.bucket_floor(max(int(ms * 1000), 0))
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.total += 1
+
+    def percentile(self, p: float) -> float:
+        """Latency (ms) at percentile p, from bucket floors."""
+        target = max(int(self.total * p / 100), 1) if self.total else 0
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= target:
+                return key / 1000
+        return 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "unit": "us",
+            "sub_bucket_bits": HISTOGRAM_SUB_BUCKET_BITS,
+            "total": self.total,
+            "counts": {str(k): self.counts[k] for k in sorted(self.counts)},
+        }
+
+
+def _send(send, scheduled: float = None) -> tuple:
+    """(latency_ms, ok). Open-loop latency counts from the scheduled send time.
+
+    HTTP error statuses, ERROR frames and dropped or refused connections are
+    counted as failed requests rather than aborting the run.
+    """
+    if scheduled is not None:
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    start = scheduled if scheduled is not None else time.perf_counter()
+    try:
+        send()
+        ok = True
+    except (urllib.error.URLError, ConnectionError, TimeoutError, ProtocolError):
+        ok = False
+    return (time.perf_counter() - start) * 1000, ok
+
+
+def _run_closed_loop(send, n: int, concurrency: int) -> list:
+    """N workers draining a shared request budget as fast as the server allows."""
+    remaining = [n]
+    lock = threading.Lock()
+    results = []
+
+    def worker():
+        local = []
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    break
+                remaining[0] -= 1
+            local.append(_send(send))
+        with lock:
+            results.extend(local)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return results
+
+
+def _run_open_loop(send, n: int, rate: float, concurrency: int) -> list:
+    """Requests on a fixed arrival schedule, regardless of how fast replies come back."""
+    start = time.perf_counter() + 0.05
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(_send, send, start + i / rate) for i in range(n)]
+        return [f.result() for f in futures]
+
+
+def benchmark(url: str, n: int = 500, warmup: int = 20, concurrency: int = 1,
+              rate: float = None, batch_size: int = None, fmt: str = "features") -> dict:
+    payload = SAMPLE if batch_size is None else batch_payload(batch_size)
+    if fmt == "values" and not url.startswith("tcp://"):
+        payload = positional(payload, feature_order(url))
+    send = make_sender(url, payload)
     for _ in range(warmup):  # exclude first-call model/JIT warmup from the stats
-        time_request(url, SAMPLE)
+        time_request(send)
+
+    wall_start = time.perf_counter()
+    if rate is not None:
+        mode = "open_loop"
+        results = _run_open_loop(send, n, rate, max(concurrency, 1))
+    elif concurrency > 1:
+        mode = "closed_loop"
+        results = _run_closed_loop(send, n, concurrency)
+    else:
+        mode = "sequential"
+        results = [_send(send) for _ in range(n)]
+    wall_s = time.perf_counter() - wall_start
 
-    timings = [time_request(url, SAMPLE) for _ in range(n)]
+    timings = [ms for ms, ok in results if ok]
+    if not timings:
+        raise RuntimeError(f"All {n} requests to {url} failed")
+    histogram = LatencyHistogram()
+    for ms in timings:
+        histogram.record(ms)
+    rows_per_request = batch_size or 1
     return {
+        "url": url,
+        "mode": mode,
         "n": n,
+        "concurrency": concurrency,
+        "target_rate_rps": rate,
+        "batch_size": batch_size,
+        "format": "binary" if url.startswith("tcp://") else fmt,
+        "errors": len(results) - len(timings),
         "mean_ms": round(statistics.mean(timings), 2),
         "p50_ms": round(percentile(timings, 50), 2),
         "p95_ms": round(percentile(timings, 95), 2),
         "p99_ms": round(percentile(timings, 99), 2),
         "max_ms": round(max(timings), 2),
-        "throughput_rps": round(1000 / statistics.mean(timings), 1),
+        "throughput_rps": round(len(timings) / wall_s, 1),
+        "rows_per_s": round(len(timings) * rows_per_request / wall_s, 1),
+        "histogram": histogram.to_dict(),
     }
 
 
@@ -64,18 +281,44 @@ def main():
     parser = argparse.ArgumentParser(description="Benchmark /predict latency")
     parser.add_argument("--url", default="http://127.0.0.1:8000/predict")
     parser.add_argument("--n", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Worker threads (closed loop), or the pool size with --rate")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Open-loop arrival rate in requests/s")
+    parser.add_argument("--batch-sizes", default=None,
+                        help="Comma-separated /predict/batch sizes, e.g. 1,10,100")
+    parser.add_argument("--format", choices=["features", "values"], default="features",
+                        help="values = positional arrays (needs a /fast endpoint)")
+    parser.add_argument("--output", default=None, help="Write all runs to this JSON file")
     args = parser.parse_args()
 
-    try:
-        results = benchmark(args.url, args.n)
-    except urllib.error.URLError:
-        raise SystemExit(f"Could not reach {args.url} — is the server running?")
-
-    print(f"\nLatency over {results['n']} sequential requests (single process):")
-    for key in ["mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]:
-        print(f"  {key:<10} {results[key]:>8.2f} ms")
-    print(f"  {'throughput':<10} {results['throughput_rps']:>8.1f} req/s")
-    print("\nSingle-process, no concurrency — a floor for what one replica does.")
+    batch_sizes = [int(s) for s in args.batch_sizes.split(",")] if args.batch_sizes else [None]
+    runs = []
+    for batch_size in batch_sizes:
+        try:
+            results = benchmark(args.url, args.n, concurrency=args.concurrency,
+                                rate=args.rate, batch_size=batch_size, fmt=args.format)
+        except (urllib.error.URLError, ConnectionError):
+            raise SystemExit(f"Could not reach {args.url} — is the server running?")
+        runs.append(results)
+
+        label = f"batch_size={batch_size}, " if batch_size else ""
+        print(f"\nLatency over {results['n']} requests ({label}{results['mode']}, "
+              f"format={results['format']}, concurrency={results['concurrency']}):")
+        for key in ["mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]:
+            print(f"  {key:<10} {results[key]:>8.2f} ms")
+        print(f"  {'throughput':<10} {results['throughput_rps']:>8.1f} req/s")
+        if batch_size:
+            print(f"  {'rows':<10} {results['rows_per_s']:>8.1f} rows/s")
+        if results["errors"]:
+            print(f"  {'errors':<10} {results['errors']:>8d}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            _json.dump(runs, f, indent=2)
+        print(f"\nWrote {len(runs)} run(s) to {args.output}")
+    elif args.concurrency == 1 and args.rate is None:
+        print("\nSingle-process, no concurrency — a floor for what one replica does.")
 
 
 if __name__ == "__main__":
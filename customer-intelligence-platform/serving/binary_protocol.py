@@ -0,0 +1,224 @@
+"""Length-prefixed binary protocol for service-to-service scoring.
+
+JSON over HTTP spends more time encoding feature dicts than the model spends
+scoring them. This transport sends feature values as raw float64 arrays in the
+model's feature order, so decoding a batch is one np.frombuffer. A connection
+stays open and carries any number of requests back to back (pipelining is
+fine); replies come back in request order.
+
+Every frame is a little-endian u32 body length followed by the body.
+
+Requests (first byte is the message type):
+
+    INFO   u8 1
+    SCORE  u8 2 | u8 version_len, version (empty = live) | u32 n_rows
+           | u16 n_features | n_rows × (u16 id_len, id) | float64[n_rows × n_features]
+
+Replies (first byte is the status):
+
+    ERROR  u8 1 | utf-8 message
+    INFO   u8 0 | utf-8 JSON {"model_version": ..., "feature_names": [...]}
+    SCORE  u8 0 | u8 version_len, version | u32 n_rows | float64[n_rows] scores
+           | u32 n_errors | n_errors × (u32 row, u16 msg_len, msg)
+
+Rows rejected by the feature contract score NaN and are listed in the errors;
+the rest of the batch is still scored. Feature order is that of the version
+that scores the request: fetch it with INFO, or pin the version.
+
+The server side runs inside the scoring API (set BINARY_PORT; see api.py), so
+it shares the loaded bundles, contract validation, caches and hot reload.
+"""
+
+import asyncio
+import json
+import socket
+import struct
+
+import numpy as np
+
+MSG_INFO = 1
+MSG_SCORE = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+_LENGTH = struct.Struct("<I")
+_SCORE_HEADER = struct.Struct("<IH")
+
+
+class ProtocolError(Exception):
+    """A malformed frame, or an ERROR reply from the server."""
+
+
+def _pack_str(s: str, fmt: str) -> bytes:
+    data = s.encode()
+    return struct.pack(fmt, len(data)) + data
+
+
+def _unpack_str(body: memoryview, offset: int, fmt: str) -> tuple:
+    (n,) = struct.unpack_from(fmt, body, offset)
+    offset += struct.calcsize(fmt)
+    return bytes(body[offset:offset + n]).decode(), offset + n
+
+
+def frame(body: bytes) -> bytes:
+    return _LENGTH.pack(len(body)) + body
+
+
+def encode_info_request() -> bytes:
+    return frame(bytes([MSG_INFO]))
+
+
+def encode_score_request(ids: list, X: np.ndarray, version: str = None) -> bytes:
+    X = np.ascontiguousarray(X, dtype="<f8")
+    if X.ndim != 2 or X.shape[0] != len(ids):
+        raise ValueError("X must be 2-D with one row per id")
+    parts = [bytes([MSG_SCORE]), _pack_str(version or "", "<B"), _SCORE_HEADER.pack(*X.shape)]
+    parts.extend(_pack_str(str(i), "<H") for i in ids)
+    parts.append(X.tobytes())
+    return frame(b"".join(parts))
+
+
+def decode_score_request(body: memoryview) -> tuple:
+    """(version or None, ids, X) from a SCORE body (message-type byte included)."""
+    try:
+        version, offset = _unpack_str(body, 1, "<B")
+        n_rows, n_features = _SCORE_HEADER.unpack_from(body, offset)
+        offset += _SCORE_HEADER.size
+        ids = []
+        for _ in range(n_rows):
+            customer_id, offset = _unpack_str(body, offset, "<H")
+            ids.append(customer_id)
+        X = np.frombuffer(body, dtype="<f8", count=n_rows * n_features, offset=offset)
+    except (struct.error, ValueError, UnicodeDecodeError) as exc:
+        raise ProtocolError(f"malformed SCORE request: {exc}") from None
+    if offset + X.nbytes != len(body):
+        raise ProtocolError("malformed SCORE request: trailing bytes")
+    return version or None, ids, X.reshape(n_rows, n_features)
+
+
+def encode_error(message: str) -> bytes:
+    return frame(bytes([STATUS_ERROR]) + message.encode())
+
+
+def encode_info(model_version: str, feature_names: list) -> bytes:
+    doc = {"model_version": model_version, "feature_names": feature_names}
+    return frame(bytes([STATUS_OK]) + json.dumps(doc).encode())
+
+
+def encode_score_response(version: str, scores: np.ndarray, errors: list) -> bytes:
+    """`errors` holds one message or None per row."""
+    scores = np.ascontiguousarray(scores, dtype="<f8")
+    rejected = [(i, e) for i, e in enumerate(errors) if e is not None]
+    parts = [bytes([STATUS_OK]), _pack_str(version, "<B"), _LENGTH.pack(len(scores)),
+             scores.tobytes(), _LENGTH.pack(len(rejected))]
+    for i, message in rejected:
+        parts.append(_LENGTH.pack(i) + _pack_str(message, "<H"))
+    return frame(b"".join(parts))
+
+
+def _check_status(body: memoryview):
+    if body[0] == STATUS_ERROR:
+        raise ProtocolError(bytes(body[1:]).decode())
+
+
+def decode_info(body: memoryview) -> dict:
+    _check_status(body)
+    return json.loads(bytes(body[1:]))
+
+
+def decode_score_response(body: memoryview) -> tuple:
+    """(version, scores, {row: error message}) from a SCORE reply."""
+    _check_status(body)
+    version, offset = _unpack_str(body, 1, "<B")
+    (n_rows,) = _LENGTH.unpack_from(body, offset)
+    offset += _LENGTH.size
+    scores = np.frombuffer(body, dtype="<f8", count=n_rows, offset=offset)
+    offset += scores.nbytes
+    (n_errors,) = _LENGTH.unpack_from(body, offset)
+    offset += _LENGTH.size
+    errors = {}
+    for _ in range(n_errors):
+        (row,) = _LENGTH.unpack_from(body, offset)
+        errors[row], offset = _unpack_str(body, offset + _LENGTH.size, "<H")
+    return version, scores, errors
+
+
+# --- server ---
+
+async def _read_frame(reader: asyncio.StreamReader) -> memoryview:
+    (n,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    if n == 0 or n > MAX_FRAME_BYTES:
+        raise ProtocolError(f"frame of {n} bytes is outside 1..{MAX_FRAME_BYTES}")
+    return memoryview(await reader.readexactly(n))
+
+
+async def start_server(handle_info, handle_score, host: str, port: int) -> asyncio.AbstractServer:
+    """Serve INFO/SCORE frames until the returned server is closed.
+
+    handle_info() -> bytes and handle_score(version, ids, X) -> bytes are async
+    and return complete reply frames; a ValueError from either becomes an ERROR
+    reply and the connection stays usable. reuse_port lets every pre-forked
+    worker listen on the same port.
+    """
+    async def serve_connection(reader, writer):
+        try:
+            while True:
+                try:
+                    body = await _read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break  # client closed the connection
+                try:
+                    if body[0] == MSG_INFO:
+                        reply = await handle_info()
+                    elif body[0] == MSG_SCORE:
+                        reply = await handle_score(*decode_score_request(body))
+                    else:
+                        reply = encode_error(f"unknown message type {body[0]}")
+                except (ProtocolError, ValueError) as exc:
+                    reply = encode_error(str(exc))
+                writer.write(reply)
+                await writer.drain()
+        except (ProtocolError, ConnectionError):
+            pass  # unframeable input or a dropped peer: nothing sensible to reply to
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(serve_connection, host, port, reuse_port=True)
+
+
+# --- client ---
+
+class BinaryClient:
+    """Blocking client for one connection; not thread-safe (use one per thread)."""
+
+    def __init__(self, host: str, port: int, timeout: float = 30.0):
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rb")
+
+    def roundtrip(self, request_frame: bytes) -> memoryview:
+        """Send one encoded frame, return the reply body."""
+        self._sock.sendall(request_frame)
+        header = self._file.read(_LENGTH.size)
+        if len(header) < _LENGTH.size:
+            raise ConnectionError("server closed the connection")
+        (n,) = _LENGTH.unpack(header)
+        return memoryview(self._file.read(n))
+
+    def info(self) -> dict:
+        return decode_info(self.roundtrip(encode_info_request()))
+
+    def score(self, ids: list, X, version: str = None) -> tuple:
+        """(version, scores, {row: error}) for rows of X in the version's feature order."""
+        return decode_score_response(self.roundtrip(encode_score_request(ids, X, version)))
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
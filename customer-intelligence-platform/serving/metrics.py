@@ -0,0 +1,214 @@
+"""Prometheus-style metrics for the scoring API, with per-stage latency.
+
+A p99 regression in /predict could come from request parsing, the feature
+contract check, the model, or response serialization — a single end-to-end
+timer can't say which. Each request carries a StageTimer (via a contextvar
+set by MetricsMiddleware); handlers call lap() at stage boundaries and the
+middleware records every stage, per endpoint and model version, into
+fixed-bucket histograms:
+
+    parse      request received → handler entered (body read + pydantic)
+    validate   feature-contract check
+    score      cache lookup / micro-batch / model call
+    serialize  handler returned → response headers sent
+
+Rendered in the Prometheus text exposition format on GET /metrics. No client
+library needed: recording is a dict lookup, a bisect and two additions.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+ERROR_TYPES_BY_STATUS = {
+    400: "contract_violation",
+    401: "unauthorized",
+    403: "forbidden",
+    404: "not_found",
+    409: "corrupt_artifact",
+    413: "batch_too_large",
+    422: "malformed_request",
+}
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = buckets
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def sum(self, *labels) -> float:
+        series = self._series.get(labels)
+        return series[1] if series else 0.0
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, n) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {total:.9g}")
+            lines.append(f"{self.name}_count{label_str} {n}")
+        return lines
+
+
+REQUESTS = Counter("cip_requests_total", "HTTP requests by endpoint and status",
+                   ("endpoint", "status"))
+ERRORS = Counter("cip_errors_total", "Failed requests by endpoint and error type",
+                 ("endpoint", "type"))
+REJECTED_ITEMS = Counter("cip_batch_items_rejected_total",
+                         "Batch items rejected by the feature contract", ("model_version",))
+REQUEST_LATENCY = Histogram("cip_request_duration_seconds", "End-to-end request latency",
+                            ("endpoint", "model_version"))
+STAGE_LATENCY = Histogram("cip_stage_duration_seconds", "Latency of each request stage",
+                          ("endpoint", "stage", "model_version"))
+ALL_METRICS = [REQUESTS, ERRORS, REJECTED_ITEMS, REQUEST_LATENCY, STAGE_LATENCY]
+
+
+class StageTimer:
+    """Per-request stopwatch: each lap() closes the stage that just ended."""
+
+    __slots__ = ("start", "last", "stages", "model_version", "error_type")
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.stages = []
+        self.model_version = ""
+        self.error_type = None
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+
+_current = ContextVar("cip_stage_timer", default=None)
+
+
+def lap(stage: str):
+    """Close `stage` on the current request's timer (no-op outside a request)."""
+    timer = _current.get()
+    if timer is not None:
+        timer.lap(stage)
+
+
+def set_model_version(version: str):
+    timer = _current.get()
+    if timer is not None:
+        timer.model_version = version
+
+
+def set_error_type(error_type: str):
+    """Name the failure more precisely than the status code would."""
+    timer = _current.get()
+    if timer is not None:
+        timer.error_type = error_type
+
+
+def render() -> str:
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware overhead) that owns each StageTimer."""
+
+    def __init__(self, app, skip_paths: tuple = ("/metrics",)):
+        self.app = app
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        timer = StageTimer()
+        token = _current.set(timer)
+        status = [500]
+        finished = [None]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if timer.stages:  # the handler ran; what's left is serialization
+                    timer.lap("serialize")
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                # The client has the response; background tasks that run after this
+                # (shadow scoring) are not request latency.
+                finished[0] = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._record(scope, timer, status[0], finished[0] or time.perf_counter())
+
+    @staticmethod
+    def _record(scope, timer: StageTimer, status: int, finished: float):
+        route = scope.get("route")
+        endpoint = getattr(route, "path", None) or (
+            scope["path"] if status != 404 else "unmatched")
+        REQUESTS.inc(endpoint, str(status))
+        REQUEST_LATENCY.observe(finished - timer.start, endpoint, timer.model_version)
+        for stage, seconds in timer.stages:
+            STAGE_LATENCY.observe(seconds, endpoint, stage, timer.model_version)
+        if status >= 400:
+            error_type = timer.error_type or ERROR_TYPES_BY_STATUS.get(
+                status, "internal" if status >= 500 else f"http_{status}")
+            ERRORS.inc(endpoint, error_type)
@@ -0,0 +1,117 @@
+"""Server-side micro-batching for single-customer predictions.
+
+Under concurrent load every /predict call otherwise runs its own tiny model
+invocation, and those invocations queue up behind the GIL one by one. The
+MicroBatcher collects single requests for a short window (or until a batch
+is full), scores them as one matrix, and resolves each caller's future — so
+p99 under a burst tracks the window plus one batch, not the burst size.
+
+Opt-in from the API with MICROBATCH_WINDOW_MS (e.g. 2) and MICROBATCH_MAX_SIZE.
+"""
+
+import asyncio
+import time
+from contextlib import suppress
+
+
+class MicroBatcher:
+    """Queue single items; score them in batches of up to max_size.
+
+    score_batch receives a list of items and must return one result per item,
+    in order. It runs in the loop's default executor, so a slow batch (a
+    pipeline without a fast scorer) never blocks other requests; the next
+    batch collects while it runs. stop() fails every item not yet scored.
+    """
+
+    def __init__(self, score_batch, window_ms: float = 2.0, max_size: int = 64):
+        self.score_batch = score_batch
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._queue = None
+        self._task = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self._wait_total = 0.0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+            while not self._queue.empty():
+                self._fail([self._queue.get_nowait()])
+
+    async def submit(self, item):
+        """Enqueue one item and wait for its result."""
+        if self._task is None:
+            raise RuntimeError("MicroBatcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.window
+                while len(batch) < self.max_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                await self._flush(batch)
+                batch = []
+        except asyncio.CancelledError:
+            self._fail(batch)  # collected or being scored when stop() came
+            raise
+
+    @staticmethod
+    def _fail(batch: list, exc: Exception = None):
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(exc or RuntimeError("MicroBatcher stopped"))
+
+    async def _flush(self, batch: list):
+        started = time.perf_counter()
+        items = [item for item, _, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                None, self.score_batch, items)
+        except Exception as exc:
+            self._fail(batch, exc)
+        else:
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():  # caller may have gone away
+                    future.set_result(result)
+
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self._wait_total += sum(started - enqueued for _, _, enqueued in batch)
+
+    def stats(self) -> dict:
+        """Queue depth, batch sizes and queueing delay since startup."""
+        return {
+            "window_ms": self.window * 1000,
+            "max_size": self.max_size,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "mean_wait_ms": round(self._wait_total / self.items * 1000, 3) if self.items else 0.0,
+        }
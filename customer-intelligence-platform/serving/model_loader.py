@@ -5,23 +5,135 @@ Registry layout (one immutable directory per version):
     registry/
     ├── model_v1/
     │   ├── model.pkl              # pickled sklearn pipeline
+    │   ├── model_compact.json     # optional pickle-free artifact (see artifacts.py)
     │   ├── feature_metadata.json  # feature names/order the model was trained on
+    │   ├── drift_reference.json   # optional training distributions (see drift.py)
     │   └── metrics.json           # evaluation metrics at training time
-    └── model_v2/
-        └── ...
+    ├── model_v2/
+    │   └── ...
+    └── registry_index.json        # versions, metrics, artifact checksums (see registry_index.py)
 
 Validating incoming features against feature_metadata.json is what prevents
 train/serve skew: the model only ever sees the features, in the order, it was
-trained on — or the request is rejected loudly.
+trained on — or the request is rejected loudly. The contract is compiled once
+per bundle into a FeatureValidator, so the per-request check is a single pass
+over the expected names plus cheap NaN/inf and sign guards.
+
+At load time the pipeline is also compiled into a pandas-free FastScorer
+(see fast_scorer.py) when it can be, and verified against the pipeline before
+use; bundles that can't be compiled score through the pipeline as before.
+When a version ships a compact artifact, load_model prefers it and never
+unpickles (or imports sklearn) at all.
+
+With a registry index, latest_version reads one tiny file instead of scanning
+the registry, and load_model checks every file it reads against the indexed
+checksums (before unpickling anything).
 """
 
 import json
+import logging
+import math
 import pickle
-import re
 from dataclasses import dataclass
 from pathlib import Path
 
-VERSION_PATTERN = re.compile(r"^model_v(\d+)$")
+import numpy as np
+import pandas as pd
+
+from .artifacts import BOOSTER_FILES, COMPACT_FILE, load_compact
+from .drift import REFERENCE_FILE, load_reference
+from .fast_scorer import build_fast_scorer
+from .registry_index import VERSION_PATTERN, read_index, read_latest, verify_artifacts
+
+logger = logging.getLogger(__name__)
+_unindexed_warned = set()
+
+
+class FeatureValidator:
+    """A bundle's feature contract, compiled once at load time.
+
+    The happy path does one dict lookup, one float() and one finiteness check
+    per expected feature, plus a sign check for features that can't be negative
+    (counts, amounts, durations). The descriptive set-difference message is
+    only built once the contract is known to be broken.
+    """
+
+    def __init__(self, feature_names: list, non_negative: list = (), ranges: dict = None):
+        self.feature_names = tuple(feature_names)
+        self.expected = frozenset(feature_names)
+        self.index = {name: i for i, name in enumerate(feature_names)}
+        self.non_negative = tuple(sorted(self.index[name] for name in non_negative
+                                         if name in self.index))
+        # Training-time [min, max] per feature; enforced by batch validation only
+        self.ranges = {name: tuple(bounds) for name, bounds in (ranges or {}).items()
+                       if name in self.index}
+        self._n = len(self.feature_names)
+
+    def __call__(self, features: dict) -> list:
+        """Ordered float values for `features`, or ValueError naming what's wrong."""
+        try:
+            if len(features) != self._n:
+                raise KeyError
+            row = [float(features[name]) for name in self.feature_names]
+        except KeyError:
+            raise ValueError(self._describe_mismatch(features)) from None
+        except TypeError:
+            raise ValueError("feature values must be numbers") from None
+        return self._check(row)
+
+    def validate_values(self, values: list) -> list:
+        """Positional form: values already in feature_names order, so no keys to check."""
+        if len(values) != self._n:
+            raise ValueError(self._describe_width(len(values)))
+        try:
+            row = [float(v) for v in values]
+        except TypeError:
+            raise ValueError("feature values must be numbers") from None
+        return self._check(row)
+
+    def validate_matrix(self, X: np.ndarray) -> list:
+        """Per-row error (None = valid) for a 2-D float array in feature_names order.
+
+        One isfinite and one sign comparison over the whole array; messages are
+        only built for the rows that fail.
+        """
+        if X.ndim != 2 or X.shape[1] != self._n:
+            raise ValueError(self._describe_width(X.shape[-1]))
+        bad = ~np.isfinite(X).all(axis=1)
+        if self.non_negative:
+            bad |= (X[:, list(self.non_negative)] < 0).any(axis=1)
+        errors = [None] * len(X)
+        for i in np.flatnonzero(bad):
+            try:
+                self._check(X[i].tolist())
+            except ValueError as exc:
+                errors[i] = str(exc)
+        return errors
+
+    def _check(self, row: list) -> list:
+        if not all(map(math.isfinite, row)):
+            bad = [name for name, value in zip(self.feature_names, row) if not math.isfinite(value)]
+            raise ValueError(f"non-finite features: {', '.join(bad)}")
+        for i in self.non_negative:
+            if row[i] < 0:
+                bad = [self.feature_names[j] for j in self.non_negative if row[j] < 0]
+                raise ValueError(f"negative values for non-negative features: {', '.join(bad)}")
+        return row
+
+    def _describe_width(self, n: int) -> str:
+        return (f"expected {self._n} feature values in the order "
+                f"{', '.join(self.feature_names)}; got {n}")
+
+    def _describe_mismatch(self, features: dict) -> str:
+        got = set(features)
+        missing = sorted(self.expected - got)
+        unexpected = sorted(got - self.expected)
+        parts = []
+        if missing:
+            parts.append(f"missing features: {', '.join(missing)}")
+        if unexpected:
+            parts.append(f"unexpected features: {', '.join(unexpected)}")
+        return "; ".join(parts)
 
 
 @dataclass
@@ -30,11 +142,34 @@ class ModelBundle:
     model: object
     feature_names: list
     metrics: dict
+    fast_scorer: object = None  # None → score through the full pipeline
+    validator: FeatureValidator = None  # None → built from feature_names, no sign guards
+    drift_reference: dict = None  # None → version trained without one; no drift monitoring
+
+    def __post_init__(self):
+        if self.validator is None:
+            self.validator = FeatureValidator(self.feature_names)
 
 
 def latest_version(registry_dir: Path) -> str:
-    """Highest-numbered model_vN directory in the registry."""
+    """Latest model_vN: LATEST if the registry is indexed, else the highest-numbered directory.
+
+    Once LATEST exists it is authoritative, so a directory that never went
+    through register_version is not served. That includes a half-written one
+    from a failed training run. Warns (once per version) when the next
+    number's directory exists anyway; one stat, so the watcher's poll stays cheap.
+    """
     registry_dir = Path(registry_dir)
+    latest = read_latest(registry_dir)
+    if latest is not None:
+        newer = registry_dir / f"model_v{int(VERSION_PATTERN.match(latest).group(1)) + 1}"
+        if newer not in _unindexed_warned and newer.is_dir():
+            _unindexed_warned.add(newer)
+            logger.warning(
+                "%s exists in %s but is not indexed; still serving %s. Register it, or run "
+                "python -m serving.registry_index --registry %s --rebuild",
+                newer.name, registry_dir, latest, registry_dir)
+        return latest
     versions = [
         (int(m.group(1)), p.name)
         for p in registry_dir.iterdir()
@@ -45,38 +180,77 @@ def latest_version(registry_dir: Path) -> str:
     return max(versions)[1]
 
 
-def load_model(registry_dir, version: str = None) -> ModelBundle:
-    """Load a specific version, or the latest if none given."""
+def load_model(registry_dir, version: str = None, prefer_compact: bool = True) -> ModelBundle:
+    """Load a specific version, or the latest if none given.
+
+    Uses the compact artifact when present (and prefer_compact), else model.pkl.
+    Raises CorruptArtifactError (a ValueError) if an indexed version's files don't
+    match their checksums.
+    """
     registry_dir = Path(registry_dir)
     version = version or latest_version(registry_dir)
     vdir = registry_dir / version
-    with open(vdir / "model.pkl", "rb") as f:
-        model = pickle.load(f)
+    use_compact = prefer_compact and (vdir / COMPACT_FILE).exists()
+    index = read_index(registry_dir)
+    entry = index["versions"].get(version) if index is not None else None
+    if entry is not None:
+        verify_artifacts(vdir, entry, _files_read(vdir, use_compact))
     metadata = json.loads((vdir / "feature_metadata.json").read_text())
     metrics = json.loads((vdir / "metrics.json").read_text())
+    feature_names = metadata["feature_names"]
+    if use_compact:
+        model = load_compact(vdir, feature_names)
+        fast_scorer = model.scorer
+    else:
+        with open(vdir / "model.pkl", "rb") as f:
+            model = pickle.load(f)
+        fast_scorer = build_fast_scorer(model, feature_names)
     return ModelBundle(
         version=version,
         model=model,
-        feature_names=metadata["feature_names"],
+        feature_names=feature_names,
         metrics=metrics,
+        fast_scorer=fast_scorer,
+        validator=FeatureValidator(feature_names, metadata.get("non_negative_features", []),
+                                   metadata.get("feature_ranges")),
+        drift_reference=load_reference(vdir),
     )
 
 
+def _files_read(vdir: Path, use_compact: bool) -> list:
+    """The artifacts load_model will read for this version."""
+    names = ["feature_metadata.json", "metrics.json"]
+    if use_compact:
+        names.append(COMPACT_FILE)
+        names.extend(name for name in BOOSTER_FILES.values() if (vdir / name).exists())
+    else:
+        names.append("model.pkl")
+    if (vdir / REFERENCE_FILE).exists():
+        names.append(REFERENCE_FILE)
+    return names
+
+
 def validate_features(bundle: ModelBundle, features: dict) -> list:
     """Check a feature dict against the training contract; return ordered values.
 
-    Rejects missing and unexpected features rather than silently imputing or
-    dropping — in serving, silence is how skew creeps in.
+    Rejects missing and unexpected features, NaN/inf values and negative values
+    for non-negative features, rather than silently imputing or dropping — in
+    serving, silence is how skew creeps in.
     """
-    expected = set(bundle.feature_names)
-    got = set(features)
-    missing = sorted(expected - got)
-    unexpected = sorted(got - expected)
-    if missing or unexpected:
-        parts = []
-        if missing:
-            parts.append(f"missing features: {', '.join(missing)}")
-        if unexpected:
-            parts.append(f"unexpected features: {', '.join(unexpected)}")
-        raise ValueError("; ".join(parts))
-    return [float(features[name]) for name in bundle.feature_names]
+    return bundle.validator(features)
+
+
+def score_frame(bundle: ModelBundle, X: pd.DataFrame) -> np.ndarray:
+    """Churn probabilities for a frame whose columns are already in training order."""
+    if bundle.fast_scorer is not None:
+        return bundle.fast_scorer.predict(X.to_numpy(dtype=float))
+    return bundle.model.predict_proba(X)[:, 1]
+
+
+def score_rows(bundle: ModelBundle, rows: list) -> list:
+    """Churn probability for each ordered feature row, in one model call."""
+    if bundle.fast_scorer is not None:
+        return bundle.fast_scorer.predict(np.asarray(rows, dtype=float)).tolist()
+    # DataFrame (not a bare list) so feature names match what the model saw in training
+    X = pd.DataFrame(rows, columns=bundle.feature_names)
+    return [float(p) for p in bundle.model.predict_proba(X)[:, 1]]
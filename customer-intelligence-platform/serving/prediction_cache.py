@@ -0,0 +1,76 @@
+"""In-process cache of churn scores keyed on model version + feature vector.
+
+Campaign tools re-score the same customers many times a day and churn
+features move slowly, so the same (version, features) pair keeps coming back.
+A registry version is immutable, which makes the key exact: the same version
+given the same ordered feature values always produces the same score, so a
+hit can never be stale — the TTL only bounds how long a cold entry holds memory.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Thread-safe LRU + TTL cache of scores, with hit/miss/eviction counters."""
+
+    def __init__(self, max_size: int = 100_000, ttl_seconds: float = 3600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, version: str, row: list):
+        """Cached score for this version and ordered feature row, or None."""
+        key = (version, tuple(row))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            score, expires_at = entry
+            if expires_at < now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, version: str, row: list, score: float):
+        key = (version, tuple(row))
+        with self._lock:
+            self._entries[key] = (score, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, version: str) -> int:
+        """Drop every entry for `version` (e.g. once it stops being live)."""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == version]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
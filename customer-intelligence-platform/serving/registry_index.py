@@ -0,0 +1,195 @@
+"""Registry index: one manifest file instead of a directory scan per lookup.
+
+Without it, finding the latest version lists and regex-matches every entry in
+the registry, and listing versions with their metrics opens every
+metrics.json — on network storage, one round trip per version. Registration
+(make_demo_model.train_and_register, or any trainer calling register_version)
+maintains registry_index.json:
+
+    {
+      "format_version": 1,
+      "latest": "model_v3",
+      "versions": {
+        "model_v3": {
+          "created_at": "...",
+          "metrics": {...},                                   # copy of metrics.json
+          "artifacts": {"model.pkl": {"sha256": "...", "bytes": 1234}, ...}
+        },
+        ...
+      }
+    }
+
+The latest version is also written to LATEST, a few bytes, so latest_version
+(polled by the API's registry watcher) costs one small read however many
+versions the registry holds; the index itself is only parsed to load or list.
+
+A version only enters the index once all its files are written, so readers
+never see a half-written version. Every update is a read-modify-write under
+an exclusive lock, written to a temp file and swapped in with os.replace, so
+readers see the old index or the new one, never a torn one. LATEST is swapped
+in after the index, so it never names a version the index doesn't have.
+
+load_model verifies the checksums of the files it reads for indexed versions.
+Registries without an index keep working through the directory scan. Once an
+index exists, LATEST is authoritative. A version directory added without
+register_version, whether by a tool that doesn't maintain the index or by a
+training run that failed part-way, is never returned as latest, and the
+registry watcher won't switch to it. latest_version logs a warning when the
+next-numbered directory exists without being indexed. Index an existing
+registry, or repair one after manual edits, with:
+
+    python -m serving.registry_index --registry registry --rebuild
+    python -m serving.registry_index --registry registry          # list versions
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+INDEX_FILE = "registry_index.json"
+LATEST_FILE = "LATEST"
+LOCK_FILE = ".registry_index.lock"
+FORMAT_VERSION = 1
+VERSION_PATTERN = re.compile(r"^model_v(\d+)$")
+
+
+class CorruptArtifactError(ValueError):
+    """A registered version's files no longer match what was registered."""
+
+
+def _version_number(version: str) -> int:
+    return int(VERSION_PATTERN.match(version).group(1))
+
+
+def file_digest(path) -> dict:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return {"sha256": sha.hexdigest(), "bytes": Path(path).stat().st_size}
+
+
+def read_index(registry_dir) -> dict:
+    """The parsed index, or None if this registry has none."""
+    try:
+        return json.loads((Path(registry_dir) / INDEX_FILE).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def read_latest(registry_dir) -> str:
+    """The latest indexed version, or None if this registry has no index."""
+    try:
+        return (Path(registry_dir) / LATEST_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _replace(path: Path, text: str):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _write_index(registry_dir: Path, index: dict):
+    _replace(registry_dir / INDEX_FILE, json.dumps(index, separators=(",", ":")))
+    _replace(registry_dir / LATEST_FILE, (index["latest"] or "") + "\n")
+
+
+@contextmanager
+def _locked(registry_dir: Path):
+    """Exclusive lock serialising index updates between registering processes."""
+    with open(registry_dir / LOCK_FILE, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _entry(vdir: Path, created_at: str = None) -> dict:
+    metrics_path = vdir / "metrics.json"
+    return {
+        "created_at": created_at or datetime.fromtimestamp(
+            vdir.stat().st_mtime, timezone.utc).isoformat(),
+        "metrics": json.loads(metrics_path.read_text()) if metrics_path.exists() else {},
+        "artifacts": {p.name: file_digest(p) for p in sorted(vdir.iterdir()) if p.is_file()},
+    }
+
+
+def _with_latest(index: dict) -> dict:
+    index["latest"] = max(index["versions"], key=_version_number, default=None)
+    return index
+
+
+def register_version(registry_dir, version: str, created_at: str = None) -> dict:
+    """Add a fully written version directory to the index; returns its entry."""
+    registry_dir = Path(registry_dir)
+    if not VERSION_PATTERN.match(version):
+        raise ValueError(f"Not a registry version: {version!r}")
+    entry = _entry(registry_dir / version, created_at)  # hash outside the lock
+    with _locked(registry_dir):
+        index = read_index(registry_dir) or {"format_version": FORMAT_VERSION,
+                                             "versions": {}}
+        index["versions"][version] = entry
+        _write_index(registry_dir, _with_latest(index))
+    return entry
+
+
+def rebuild_index(registry_dir) -> dict:
+    """Index every model_vN directory from scratch (one-off scan)."""
+    registry_dir = Path(registry_dir)
+    versions = {p.name: _entry(p) for p in registry_dir.iterdir()
+                if p.is_dir() and VERSION_PATTERN.match(p.name)}
+    with _locked(registry_dir):
+        index = _with_latest({"format_version": FORMAT_VERSION, "versions": versions})
+        _write_index(registry_dir, index)
+    return index
+
+
+def verify_artifacts(vdir, entry: dict, names: list):
+    """Raise CorruptArtifactError unless each named file matches its indexed size and checksum."""
+    vdir = Path(vdir)
+    bad = []
+    for name in names:
+        expected = entry["artifacts"].get(name)
+        if expected is None:
+            bad.append(f"{name} (not in index)")
+            continue
+        path = vdir / name
+        if not path.exists() or path.stat().st_size != expected["bytes"]:
+            bad.append(name)  # size check first: no hashing for the common tampering case
+        elif file_digest(path)["sha256"] != expected["sha256"]:
+            bad.append(name)
+    if bad:
+        raise CorruptArtifactError(f"Checksum mismatch in {vdir}: {', '.join(bad)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or list the registry index")
+    parser.add_argument("--registry",
+                        default=str(Path(__file__).resolve().parents[1] / "registry"))
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Re-index every version directory (checksums recomputed)")
+    args = parser.parse_args()
+
+    index = rebuild_index(args.registry) if args.rebuild else read_index(args.registry)
+    if index is None:
+        raise SystemExit(f"No {INDEX_FILE} in {args.registry}; run with --rebuild")
+    for version in sorted(index["versions"], key=_version_number):
+        entry = index["versions"][version]
+        live = " (latest)" if version == index["latest"] else ""
+        print(f"{version}{live}  created {entry['created_at']}  metrics {entry['metrics']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Columnar-aware readers and writers for the batch scoring job.
+
+CSV is slow to parse, loses dtypes and bloats the scores table, while the rest
+of the platform already writes Parquet. These helpers let batch scoring read
+and write CSV, Parquet and Arrow IPC (Feather v2) through one interface:
+
+    - the format comes from the file suffix unless given explicitly
+    - only the requested columns are read (column projection)
+    - input is streamed in record batches of at most `chunksize` rows
+    - Parquet and Arrow output are zstd-compressed
+"""
+
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+COMPRESSION = "zstd"
+
+
+def detect_format(path, fmt: str = None) -> str:
+    """Explicit format wins; otherwise go by suffix, defaulting to CSV."""
+    if fmt is not None:
+        if fmt not in set(FORMATS.values()):
+            raise ValueError(f"Unknown format {fmt!r}; expected csv, parquet or arrow")
+        return fmt
+    return FORMATS.get(Path(path).suffix.lower(), "csv")
+
+
+def read_columns(path, fmt: str) -> list:
+    """Column names from the header/schema alone — no data is read."""
+    if fmt == "parquet":
+        return pq.read_schema(path).names
+    if fmt == "arrow":
+        with pa.memory_map(str(path)) as source:
+            return ipc.open_file(source).schema.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_table(path, fmt: str, columns: list = None) -> pd.DataFrame:
+    """Read a whole file (projected to `columns` if given)."""
+    if fmt == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    if fmt == "arrow":
+        with pa.memory_map(str(path)) as source:
+            table = ipc.open_file(source).read_all()
+        return (table.select(columns) if columns else table).to_pandas()
+    return pd.read_csv(path, usecols=columns)
+
+
+def read_arrow_table(path, fmt: str) -> pa.Table:
+    """A whole Parquet or Arrow IPC file as an Arrow table (no pandas round trip)."""
+    if fmt == "parquet":
+        return pq.read_table(path)
+    with pa.memory_map(str(path)) as source:
+        return ipc.open_file(source).read_all()
+
+
+def iter_chunks(path, fmt: str, columns: list, chunksize: int, dtype: dict = None):
+    """Yield DataFrames of at most `chunksize` rows holding only `columns`."""
+    if fmt == "parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    elif fmt == "arrow":
+        with pa.memory_map(str(path)) as source:
+            reader = ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i).select(columns)
+                for offset in range(0, batch.num_rows, chunksize):
+                    yield batch.slice(offset, chunksize).to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize, dtype=dtype)
+
+
+def count_row_groups(path, fmt: str) -> int:
+    """Independently readable units: Parquet row groups or Arrow record batches."""
+    if fmt == "parquet":
+        return pq.ParquetFile(path).num_row_groups
+    with pa.memory_map(str(path)) as source:
+        return ipc.open_file(source).num_record_batches
+
+
+def read_row_group(path, fmt: str, index: int, columns: list) -> pd.DataFrame:
+    if fmt == "parquet":
+        return pq.ParquetFile(path).read_row_group(index, columns=columns).to_pandas()
+    with pa.memory_map(str(path)) as source:
+        return ipc.open_file(source).get_batch(index).select(columns).to_pandas()
+
+
+class TableWriter:
+    """Append DataFrames to a CSV, Parquet or Arrow IPC file, one chunk at a time.
+
+    The first chunk fixes the schema; later chunks are cast to it, so a chunk
+    whose ids happen to parse differently can't produce a mixed-type file.
+    """
+
+    def __init__(self, path, fmt: str, header: bool = True):
+        self.path = Path(path)
+        self.fmt = fmt
+        self.header = header
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+    def write(self, df: pd.DataFrame):
+        if self.fmt == "csv":
+            first = self.rows == 0
+            df.to_csv(self.path, mode="w" if first else "a",
+                      header=self.header and first, index=False)
+            self.rows += len(df)
+        else:
+            self.write_table(pa.Table.from_pandas(df, preserve_index=False))
+
+    def write_table(self, table: pa.Table):
+        if self._writer is None:
+            self._schema = table.schema
+            if self.fmt == "parquet":
+                self._writer = pq.ParquetWriter(self.path, self._schema, compression=COMPRESSION)
+            else:
+                options = ipc.IpcWriteOptions(compression=COMPRESSION)
+                self._writer = ipc.new_file(str(self.path), self._schema, options=options)
+        self._writer.write_table(table.cast(self._schema))
+        self.rows += table.num_rows
+
+    def close(self, empty: pd.DataFrame = None):
+        """Finish the file; write `empty` (a zero-row frame) if nothing was written."""
+        if self.rows == 0 and self._writer is None and empty is not None:
+            self.write(empty)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
@@ -10,19 +10,27 @@ Run from the customer-intelligence-platform directory: pytest tests/ -v
 import pathlib
 import sys
 
+import numpy as np
 import pandas as pd
 import pytest
 
 sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
 
+from pipelines import transaction_store
+from pipelines.incremental_features import FeatureState
 from pipelines.build_retail_features import (
     PROPENSITY_TARGET,
     RETAIL_FEATURES,
+    SNAPSHOT_COLUMNS,
     TARGET,
     TARGET_COLUMNS,
+    SnapshotEngine,
     build_multiple_snapshots,
     build_snapshot,
+    compact_transactions,
+    ensure_transaction_cache,
     load_transactions,
+    memory_mb,
 )
 
 SNAPSHOT = "2011-01-01"
@@ -132,6 +140,85 @@ def test_multiple_snapshots_stack(txns):
     assert len(out) > len(build_snapshot(txns, "2011-01-01"))
 
 
+@pytest.fixture
+def random_txns():
+    """A chronological log: repeat invoices and products, returns, same-second rows."""
+    rng = np.random.default_rng(7)
+    n = 4000
+    times = pd.Timestamp("2010-01-01") + pd.to_timedelta(
+        np.sort(rng.integers(0, 500 * 86_400, n)), unit="s")
+    customers = rng.integers(1, 60, n).astype(str)
+    invoices = rng.integers(1000, 1600, n).astype(str)
+    returns = rng.random(n) < 0.1
+    quantity = np.where(returns, -1, 1) * rng.integers(1, 12, n)
+    price = np.round(rng.uniform(0.1, 40, n), 2)
+    return pd.DataFrame({
+        "invoice": np.where(returns, np.char.add("C", invoices), invoices),
+        "stock_code": rng.integers(0, 40, n).astype(str),
+        "quantity": quantity, "invoice_date": times, "unit_price": price,
+        "customer_id": customers, "is_return": returns, "line_revenue": quantity * price,
+    })
+
+
+def write_raw_csv(path, txns):
+    """random_txns in the raw Online Retail II layout."""
+    pd.DataFrame({
+        "Invoice": txns["invoice"], "StockCode": txns["stock_code"],
+        "Description": "item " + txns["stock_code"], "Quantity": txns["quantity"],
+        "InvoiceDate": txns["invoice_date"], "Price": txns["unit_price"],
+        "Customer ID": txns["customer_id"].astype(float), "Country": "United Kingdom",
+    }).to_csv(path, index=False)
+
+
+@pytest.mark.parametrize("dates, horizon", [
+    (pd.date_range("2010-02-01", "2011-05-01", freq="MS"), 180),
+    (pd.date_range("2010-03-20", "2010-05-10", freq="D"), 180),
+    (["2010-09-01", "2010-02-15 12:30:00", "2010-09-01"], 45),
+])
+def test_engine_matches_build_snapshot(random_txns, dates, horizon):
+    """The single-pass engine is a pure speedup: byte-identical per-snapshot output."""
+    frames = SnapshotEngine(random_txns, label_horizon_days=horizon).snapshots(dates)
+    assert len(frames) == len(dates)
+    for date, frame in zip(dates, frames):
+        expected = build_snapshot(random_txns, date, label_horizon_days=horizon)
+        pd.testing.assert_frame_equal(frame, expected)
+        assert frame.to_csv(index=False) == expected.to_csv(index=False)
+
+
+def test_multiple_snapshots_match_per_snapshot_path(txns):
+    dates = ["2010-12-01", "2011-01-01", "2011-03-01"]
+    expected = pd.concat([build_snapshot(txns, d) for d in dates], ignore_index=True)
+    pd.testing.assert_frame_equal(build_multiple_snapshots(txns, dates), expected)
+
+
+def test_parallel_snapshots_match_single_process(random_txns):
+    dates = pd.date_range("2010-02-01", "2011-05-01", freq="W")
+    pd.testing.assert_frame_equal(
+        build_multiple_snapshots(random_txns, dates, workers=3),
+        build_multiple_snapshots(random_txns, dates),
+    )
+
+
+def test_compact_transactions_give_identical_snapshots(random_txns):
+    """Integer-coded customers are an internal detail: output ids stay strings."""
+    compact = compact_transactions(random_txns)
+    assert isinstance(compact["customer_id"].dtype, pd.CategoricalDtype)
+    assert memory_mb(compact) < memory_mb(random_txns.astype({"customer_id": object,
+                                                               "invoice": object,
+                                                               "stock_code": object}))
+    dates = ["2010-06-01", "2011-01-01"]
+    for date in dates:
+        pd.testing.assert_frame_equal(build_snapshot(compact, date),
+                                      build_snapshot(random_txns, date))
+    pd.testing.assert_frame_equal(build_multiple_snapshots(compact, dates),
+                                  build_multiple_snapshots(random_txns, dates))
+
+
+def test_engine_rejects_dates_without_history(txns):
+    with pytest.raises(ValueError, match="No transactions before 2010-01-01"):
+        SnapshotEngine(txns).snapshots(["2011-01-01", "2010-01-01"])
+
+
 def test_schema_is_stable(txns):
     out = build_snapshot(txns, SNAPSHOT)
     assert list(out.columns) == ["customer_id", "snapshot_date"] + RETAIL_FEATURES + TARGET_COLUMNS
@@ -156,4 +243,105 @@ def test_load_transactions_cleans(tmp_path):
     df = load_transactions(path)
     assert len(df) == 2
     assert set(df["customer_id"]) == {"111"}
-    assert df["is_return"].sum() == 1
\ No newline at end of file
+    assert df["is_return"].sum() == 1
+
+
+def test_transaction_cache_matches_csv(tmp_path, random_txns):
+    raw, cache = tmp_path / "raw.csv", tmp_path / "cache"
+    write_raw_csv(raw, random_txns)
+    metadata = ensure_transaction_cache(raw, cache)
+    assert metadata["unit_price_scale"] == 100  # 2-decimal prices stored as int32 cents
+    assert any(p.name.startswith("month=") for p in cache.iterdir())
+
+    from_csv = load_transactions(raw).reset_index(drop=True)
+    cached = transaction_store.read_transactions(cache, SNAPSHOT_COLUMNS)
+    assert list(cached.columns) == SNAPSHOT_COLUMNS
+    assert isinstance(cached["stock_code"].dtype, pd.CategoricalDtype)
+    np.testing.assert_array_equal(cached["line_revenue"], from_csv["line_revenue"])
+    for date in ["2010-06-01", "2011-01-01"]:
+        pd.testing.assert_frame_equal(build_snapshot(cached, date), build_snapshot(from_csv, date))
+
+
+def test_transaction_cache_pushdown_and_invalidation(tmp_path, random_txns):
+    raw, cache = tmp_path / "raw.csv", tmp_path / "cache"
+    write_raw_csv(raw, random_txns)
+    ensure_transaction_cache(raw, cache)
+
+    window = transaction_store.read_transactions(
+        cache, ["customer_id", "invoice_date"], start="2010-03-15", end="2010-05-01")
+    in_window = random_txns["invoice_date"].between("2010-03-15", "2010-05-01", inclusive="left")
+    assert list(window.columns) == ["customer_id", "invoice_date"]
+    assert len(window) == in_window.sum()
+
+    assert ensure_transaction_cache(raw, cache)["row_count"] == len(random_txns)
+    write_raw_csv(raw, random_txns.iloc[:100])  # the raw file changed: rebuilt
+    assert ensure_transaction_cache(raw, cache)["row_count"] == 100
+    assert len(transaction_store.read_transactions(cache)) == 100
+
+
+def test_transaction_cache_never_replaces_foreign_directories(tmp_path, random_txns):
+    raw = tmp_path / "raw.csv"
+    write_raw_csv(raw, random_txns.iloc[:50])
+    (tmp_path / "notes.txt").write_text("keep me")
+    with pytest.raises(ValueError, match="Refusing to replace"):
+        ensure_transaction_cache(raw, tmp_path)
+    assert raw.exists() and (tmp_path / "notes.txt").read_text() == "keep me"
+
+
+def test_transaction_cache_appends_daily_batches(tmp_path, random_txns):
+    cut, end = pd.Timestamp("2010-06-01"), pd.Timestamp("2010-06-03")
+    raw, daily, full = tmp_path / "raw.csv", tmp_path / "daily.csv", tmp_path / "full.csv"
+    write_raw_csv(raw, random_txns[random_txns["invoice_date"] < cut])
+    write_raw_csv(daily, random_txns[random_txns["invoice_date"].between(cut, end, inclusive="left")])
+    write_raw_csv(full, random_txns[random_txns["invoice_date"] < end])
+    ensure_transaction_cache(raw, tmp_path / "cache")
+    ensure_transaction_cache(full, tmp_path / "expected")
+
+    batch, source = load_transactions(daily), transaction_store.fingerprint_file(daily)
+    assert transaction_store.append_transactions(batch, tmp_path / "cache", source) == len(batch) > 0
+    assert transaction_store.append_transactions(batch, tmp_path / "cache", source) == 0  # rerun
+    pd.testing.assert_frame_equal(transaction_store.read_transactions(tmp_path / "cache"),
+                                  transaction_store.read_transactions(tmp_path / "expected"),
+                                  check_categorical=False)  # dictionaries unify per file
+    assert transaction_store.read_store_metadata(tmp_path / "cache")["row_count"] == len(
+        transaction_store.read_transactions(tmp_path / "expected"))
+
+    with pytest.raises(ValueError, match="predate"):
+        transaction_store.append_transactions(load_transactions(raw).tail(5),
+                                              tmp_path / "cache", "late")
+
+
+def test_incremental_state_matches_build_snapshot(tmp_path, random_txns):
+    """Advancing one day at a time reproduces build_snapshot's features every day."""
+    txns = compact_transactions(random_txns)
+    state = FeatureState.from_history(txns, "2010-04-01")
+    day = pd.Timestamp("2010-04-01")
+    while day < pd.Timestamp("2010-05-20"):
+        if day == pd.Timestamp("2010-04-20"):  # persisted between runs
+            state.save(tmp_path / "state")
+            state = FeatureState.load(tmp_path / "state")
+        todays = txns[txns["invoice_date"].between(day, day + pd.Timedelta(days=1),
+                                                   inclusive="left")]
+        day += pd.Timedelta(days=1)
+        snapshot = state.advance(todays, day).snapshot()
+        expected = build_snapshot(random_txns, day)[["customer_id", "snapshot_date"] + RETAIL_FEATURES]
+        pd.testing.assert_frame_equal(snapshot, expected)
+
+
+def test_incremental_state_rejects_late_rows(random_txns):
+    state = FeatureState.from_history(random_txns, "2010-04-01")
+    late = random_txns[random_txns["invoice_date"] < "2010-04-01"].tail(1)
+    with pytest.raises(ValueError, match="late data"):
+        state.advance(late, "2010-04-02")
+
+
+def test_incremental_state_only_replaces_saved_state(tmp_path, random_txns):
+    state = FeatureState.from_history(random_txns, "2010-04-01")
+    state.save(tmp_path / "state")
+    state.save(tmp_path / "state")  # an earlier state is replaced
+    assert FeatureState.load(tmp_path / "state").as_of == state.as_of
+
+    (tmp_path / "notes.txt").write_text("keep me")
+    with pytest.raises(ValueError, match="Refusing to replace"):
+        state.save(tmp_path)
+    assert (tmp_path / "notes.txt").read_text() == "keep me"
@@ -11,7 +11,7 @@ import pytest
 
 sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
 
-from serving.batch_score import score_file
+from serving.batch_score import parallel_score_file, score_file, stream_score_file
 from serving.make_demo_model import FEATURES, make_synthetic_customers, train_and_register
 from serving.model_loader import load_model, validate_features
 
@@ -25,6 +25,9 @@ VALID_FEATURES = {
 }
 
 
+ADMIN_HEADERS = {"X-Admin-Token": "test-admin-token"}
+
+
 @pytest.fixture(scope="module")
 def registry(tmp_path_factory):
     """A registry with one trained demo model."""
@@ -40,6 +43,7 @@ def client(registry, tmp_path_factory):
 
     import os
     os.environ["REGISTRY_DIR"] = str(registry)
+    os.environ["ADMIN_TOKEN"] = ADMIN_HEADERS["X-Admin-Token"]
     from serving.api import app
     with TestClient(app) as c:
         yield c
@@ -76,6 +80,27 @@ def test_validate_features_orders_correctly(registry):
     assert row == [VALID_FEATURES[name] for name in bundle.feature_names]
 
 
+def test_validate_features_rejects_non_finite_and_negative_counts(registry):
+    bundle = load_model(registry)
+    with pytest.raises(ValueError, match="non-finite features: monetary_90d"):
+        validate_features(bundle, {**VALID_FEATURES, "monetary_90d": float("nan")})
+    with pytest.raises(ValueError, match="non-finite features: tenure_days"):
+        validate_features(bundle, {**VALID_FEATURES, "tenure_days": float("inf")})
+    with pytest.raises(ValueError, match="negative values for non-negative features: "
+                                         "frequency_90d, support_tickets_90d"):
+        validate_features(bundle, {**VALID_FEATURES, "support_tickets_90d": -1.0,
+                                   "frequency_90d": -2.0})
+
+
+def test_validator_reports_missing_and_unexpected_together(registry):
+    bundle = load_model(registry)
+    features = {k: v for k, v in VALID_FEATURES.items() if k != "tenure_days"}
+    features["tenure"] = 400.0  # same count as the contract, wrong name
+    with pytest.raises(ValueError) as exc:
+        validate_features(bundle, features)
+    assert str(exc.value) == "missing features: tenure_days; unexpected features: tenure"
+
+
 # --- API ---
 
 def test_health(client):
@@ -135,3 +160,984 @@ def test_batch_score_rejects_missing_columns(registry, tmp_path):
     pd.DataFrame({"customer_id": ["c1"], "recency_days": [10.0]}).to_csv(input_csv, index=False)
     with pytest.raises(ValueError, match="missing required columns"):
         score_file(input_csv, tmp_path / "out.csv", registry_dir=registry)
+
+
+def test_stream_score_file_matches_in_memory(registry, tmp_path):
+    df = make_synthetic_customers(n=250, seed=11)
+    df.insert(0, "customer_id", [f"c{i}" for i in range(len(df))])
+    input_csv = tmp_path / "customers.csv"
+    df.to_csv(input_csv, index=False)
+
+    expected = score_file(input_csv, tmp_path / "full.csv", registry_dir=registry)
+    stats = stream_score_file(input_csv, tmp_path / "streamed.csv", registry_dir=registry,
+                              chunksize=60)
+    streamed = pd.read_csv(tmp_path / "streamed.csv")
+    assert stats["rows"] == 250
+    assert streamed["scored_at"].nunique() == 1
+    pd.testing.assert_series_equal(streamed["customer_id"], expected["customer_id"])
+    pd.testing.assert_series_equal(streamed["churn_score"], expected["churn_score"])
+
+
+def test_parallel_score_file_keeps_order_and_run_metadata(registry, tmp_path):
+    df = make_synthetic_customers(n=500, seed=12)
+    df.insert(0, "customer_id", [f"c{i}" for i in range(len(df))])
+    input_csv = tmp_path / "customers.csv"
+    df.to_csv(input_csv, index=False)
+
+    expected = score_file(input_csv, tmp_path / "full.csv", registry_dir=registry)
+    stats = parallel_score_file(input_csv, tmp_path / "parallel.csv", registry_dir=registry,
+                                chunksize=45, workers=3)
+    parallel = pd.read_csv(tmp_path / "parallel.csv")
+    assert stats["rows"] == 500
+    assert list(parallel.columns) == list(expected.columns)
+    assert parallel["scored_at"].nunique() == 1
+    assert parallel["model_version"].nunique() == 1
+    pd.testing.assert_series_equal(parallel["customer_id"], expected["customer_id"])
+    pd.testing.assert_series_equal(parallel["churn_score"], expected["churn_score"])
+    assert not (tmp_path / ".parallel.csv.parts").exists()
+
+
+@pytest.mark.parametrize("suffix", ["parquet", "arrow"])
+def test_columnar_input_and_output(registry, tmp_path, suffix):
+    df = make_synthetic_customers(n=300, seed=13)
+    df.insert(0, "customer_id", [f"c{i}" for i in range(len(df))])
+    df["unused_wide_column"] = "x" * 50  # must not be read, thanks to column projection
+    df.to_csv(tmp_path / "customers.csv", index=False)
+    columnar = tmp_path / f"customers.{suffix}"
+    if suffix == "parquet":
+        df.to_parquet(columnar, index=False, row_group_size=70)
+    else:
+        df.to_feather(columnar, chunksize=70)
+
+    expected = score_file(tmp_path / "customers.csv", tmp_path / "full.csv", registry_dir=registry)
+    score_file(columnar, tmp_path / f"full.{suffix}", registry_dir=registry)
+    stream_score_file(columnar, tmp_path / f"streamed.{suffix}", registry_dir=registry,
+                      chunksize=40)
+    parallel_score_file(columnar, tmp_path / f"parallel.{suffix}", registry_dir=registry,
+                        workers=2)
+
+    read = pd.read_parquet if suffix == "parquet" else pd.read_feather
+    for name in ["full", "streamed", "parallel"]:
+        out = read(tmp_path / f"{name}.{suffix}")
+        assert list(out.columns) == list(expected.columns)
+        assert out["customer_id"].tolist() == expected["customer_id"].tolist()
+        assert out["churn_score"].tolist() == expected["churn_score"].tolist()
+
+
+def test_batch_modes_quarantine_bad_rows(registry, tmp_path):
+    from serving.batch_score import quarantine_path
+
+    df = make_synthetic_customers(n=200, seed=14)[FEATURES].astype(object)
+    df.insert(0, "customer_id", [f"c{i}" for i in range(len(df))])
+    df.loc[3, "monetary_90d"] = None
+    df.loc[40, "frequency_90d"] = "lots"
+    df.loc[41, "support_tickets_90d"] = -2
+    df.loc[150, "tenure_days"] = 1e9
+    df.loc[151, "web_sessions_30d"] = float("inf")
+    input_csv = tmp_path / "customers.csv"
+    df.to_csv(input_csv, index=False)
+
+    full = score_file(input_csv, tmp_path / "full.csv", registry_dir=registry)
+    stats = stream_score_file(input_csv, tmp_path / "streamed.csv", registry_dir=registry,
+                              chunksize=50)
+    parallel = parallel_score_file(input_csv, tmp_path / "parallel.csv", registry_dir=registry,
+                                   chunksize=30, workers=2)
+
+    assert len(full) == stats["rows"] == parallel["rows"] == 195
+    assert stats["quarantined"] == parallel["quarantined"] == 5
+    assert stats["quarantine_counts"] == parallel["quarantine_counts"] == {
+        "monetary_90d:null": 1, "frequency_90d:non_numeric": 1,
+        "support_tickets_90d:negative": 1, "tenure_days:above_range": 1,
+        "web_sessions_30d:inf": 1,
+    }
+    for name in ["full", "streamed", "parallel"]:
+        quarantined = pd.read_csv(quarantine_path(tmp_path / f"{name}.csv"))
+        assert quarantined["customer_id"].tolist() == ["c3", "c40", "c41", "c150", "c151"]
+        assert quarantined.loc[1, "frequency_90d"] == "lots"  # kept as received
+        assert quarantined.loc[2, "quarantine_reason"] == "support_tickets_90d:negative"
+        scored = pd.read_csv(tmp_path / f"{name}.csv")
+        assert not scored["customer_id"].isin(quarantined["customer_id"]).any()
+
+
+def test_clean_run_leaves_no_quarantine_file(registry, tmp_path):
+    from serving.batch_score import quarantine_path
+
+    df = make_synthetic_customers(n=50, seed=11)
+    df.insert(0, "customer_id", [f"c{i}" for i in range(len(df))])
+    df.to_csv(tmp_path / "customers.csv", index=False)
+    stale = quarantine_path(tmp_path / "scores.csv")
+    stale.write_text("from a previous run")
+    stats = stream_score_file(tmp_path / "customers.csv", tmp_path / "scores.csv",
+                              registry_dir=registry)
+    assert stats["quarantined"] == 0 and stats["quarantine_counts"] == {}
+    assert not stale.exists()
+
+
+def test_incremental_scoring_rescores_only_changed_rows(registry, tmp_path):
+    from serving.batch_score import incremental_score_file
+
+    df = make_synthetic_customers(n=300, seed=15)[FEATURES]
+    df.insert(0, "customer_id", [f"c{i}" for i in range(len(df))])
+    df.to_csv(tmp_path / "day1.csv", index=False)
+    state = tmp_path / "state" / "score_index.parquet"
+
+    first = incremental_score_file(tmp_path / "day1.csv", tmp_path / "day1_scores.csv", state,
+                                   registry_dir=registry, chunksize=70)
+    assert (first["rows"], first["rescored"], first["carried_forward"]) == (300, 300, 0)
+
+    day2 = df.drop(index=[10, 11]).copy()  # two customers churned out of the file
+    day2.loc[[5, 200, 250], "web_sessions_30d"] += 1
+    new = make_synthetic_customers(n=4, seed=16)[FEATURES]
+    new.insert(0, "customer_id", ["n1", "n2", "n3", "n4"])
+    day2 = pd.concat([day2, new], ignore_index=True)
+    day2.to_csv(tmp_path / "day2.csv", index=False)
+
+    second = incremental_score_file(tmp_path / "day2.csv", tmp_path / "day2_scores.csv", state,
+                                    registry_dir=registry, chunksize=70)
+    assert (second["rows"], second["rescored"], second["carried_forward"]) == (302, 7, 295)
+
+    incremental = pd.read_csv(tmp_path / "day2_scores.csv")
+    full = score_file(tmp_path / "day2.csv", tmp_path / "full_scores.csv", registry_dir=registry)
+    assert incremental["customer_id"].tolist() == full["customer_id"].tolist()
+    assert incremental["churn_score"].tolist() == full["churn_score"].tolist()
+    carried = incremental.set_index("customer_id").loc["c0", "scored_at"]
+    assert carried == first["scored_at"]
+    assert incremental.set_index("customer_id").loc["c5", "scored_at"] == second["scored_at"]
+    assert len(pd.read_parquet(state)) == 302
+
+    pd.read_parquet(state).assign(model_version="model_v0").to_parquet(state)
+    other_version = incremental_score_file(tmp_path / "day2.csv", tmp_path / "v0_scores.csv",
+                                           state, registry_dir=registry, chunksize=70)
+    assert other_version["rescored"] == 302  # scores from another version are never reused
+
+    # Exact floats (CSV parsing can be an ulp off) and float64 where the CSV gave int64.
+    day2.astype({name: float for name in FEATURES}).to_parquet(tmp_path / "day2.parquet",
+                                                               index=False)
+    as_parquet = incremental_score_file(tmp_path / "day2.parquet", tmp_path / "pq_scores.csv",
+                                        state, registry_dir=registry, chunksize=70)
+    assert as_parquet["rescored"] == 0
+
+
+def test_incremental_refuses_workers(monkeypatch, capsys):
+    from serving import batch_score
+
+    monkeypatch.setattr(sys, "argv", ["batch_score", "--input", "in.csv", "--output", "out.csv",
+                                      "--incremental", "state.parquet", "--workers", "4"])
+    with pytest.raises(SystemExit) as exc:
+        batch_score.main()
+    assert exc.value.code == 2
+    assert "--incremental" in capsys.readouterr().err
+
+
+def test_drift_monitor_flags_shifted_features_only():
+    import numpy as np
+    from serving.drift import DriftMonitor, build_reference
+
+    train = make_synthetic_customers(n=4000, seed=21)[FEATURES]
+    reference = build_reference(train, train["recency_days"] / 100)
+    live = make_synthetic_customers(n=4000, seed=22)[FEATURES]
+    live["recency_days"] *= 3  # customers coming back much less often
+
+    buffered = DriftMonitor("model_v1", FEATURES, reference)
+    buffered.record(live.to_numpy().tolist()[:100], [0.5] * 100)
+    assert buffered.report()["score"]["status"] == "insufficient_data"
+    buffered.record(live.to_numpy().tolist()[100:], (live["recency_days"] / 100)[100:].tolist())
+    direct = DriftMonitor("model_v1", FEATURES, reference)
+    direct.update(live.to_numpy()[:100], np.full(100, 0.5))
+    direct.update(live.to_numpy()[100:], (live["recency_days"] / 100).to_numpy()[100:])
+
+    report = buffered.report()
+    assert buffered.counts().keys() == direct.counts().keys()
+    assert all((buffered.counts()[k] == direct.counts()[k]).all() for k in direct.counts())
+    assert report["rows"] == 4000
+    assert report["drifted"] == ["recency_days"]
+    assert report["features"]["recency_days"]["status"] == "major"
+    assert report["features"]["tenure_days"]["psi"] < 0.1
+    assert report["score"]["status"] == "major"
+    assert buffered.rotate()["rows"] == 4000 and buffered.report()["rows"] == 0
+
+
+def test_batch_run_writes_drift_report(registry, tmp_path):
+    import json
+
+    from serving.batch_score import drift_report_path
+
+    df = make_synthetic_customers(n=2000, seed=23)
+    df.insert(0, "customer_id", [f"c{i}" for i in range(len(df))])
+    df.to_csv(tmp_path / "same.csv", index=False)
+    df.assign(support_tickets_90d=df["support_tickets_90d"] + 3).to_csv(
+        tmp_path / "shifted.csv", index=False)
+
+    same = stream_score_file(tmp_path / "same.csv", tmp_path / "same_scores.csv",
+                             registry_dir=registry, chunksize=500)
+    shifted = parallel_score_file(tmp_path / "shifted.csv", tmp_path / "shifted_scores.csv",
+                                  registry_dir=registry, chunksize=500, workers=2)
+    assert same["drifted"] == []
+    assert shifted["drifted"] == ["support_tickets_90d"]
+    report = json.loads(drift_report_path(tmp_path / "shifted_scores.csv").read_text())
+    assert report["rows"] == shifted["rows"] and report["score"]["status"] != "stable"
+
+
+def test_stream_score_file_validates_header_first(registry, tmp_path):
+    input_csv = tmp_path / "bad.csv"
+    pd.DataFrame({"customer_id": ["c1"], "recency_days": [10.0]}).to_csv(input_csv, index=False)
+    with pytest.raises(ValueError, match="missing required columns"):
+        stream_score_file(input_csv, tmp_path / "out.csv", registry_dir=registry)
+    assert not (tmp_path / "out.csv").exists()
+
+
+# --- batch endpoint ---
+
+def test_predict_batch_matches_single_predictions(client):
+    items = [
+        {"customer_id": "a", "features": VALID_FEATURES},
+        {"customer_id": "b", "features": {**VALID_FEATURES, "recency_days": 150.0}},
+    ]
+    resp = client.post("/predict/batch", json={"items": items})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["n_scored"] == 2 and body["n_rejected"] == 0
+    for item, result in zip(items, body["results"]):
+        single = client.post("/predict", json=item).json()
+        assert result["customer_id"] == item["customer_id"]
+        assert result["churn_score"] == single["churn_score"]
+        assert result["error"] is None
+
+
+def test_predict_batch_reports_per_item_errors(client):
+    items = [
+        {"customer_id": "good", "features": VALID_FEATURES},
+        {"customer_id": "bad", "features": {"recency_days": 1.0}},
+    ]
+    body = client.post("/predict/batch", json={"items": items}).json()
+    assert body["n_scored"] == 1 and body["n_rejected"] == 1
+    good, bad = body["results"]
+    assert 0.0 <= good["churn_score"] <= 1.0
+    assert bad["churn_score"] is None
+    assert "missing" in bad["error"]
+
+
+def test_predict_batch_enforces_size_cap(client, monkeypatch):
+    import serving.api
+    monkeypatch.setattr(serving.api, "MAX_BATCH_SIZE", 2)
+    items = [{"customer_id": f"c{i}", "features": VALID_FEATURES} for i in range(3)]
+    resp = client.post("/predict/batch", json={"items": items})
+    assert resp.status_code == 413
+    assert resp.json()["detail"] == "batch of 3 exceeds MAX_BATCH_SIZE=2"
+    # Refused on the raw count: items that would fail to parse are never looked at.
+    junk = client.post("/predict/batch", json={"items": [{"customer_id": ""}] * 3})
+    assert junk.status_code == 413
+    assert client.post("/predict/batch", json={"items": []}).status_code == 422
+    assert client.post("/predict/batch", json={"items": [{"customer_id": ""}]}).status_code == 422
+
+
+# --- fast scorer ---
+
+def test_demo_model_compiles_to_fast_scorer(registry):
+    bundle = load_model(registry)
+    assert bundle.fast_scorer is not None
+    assert bundle.fast_scorer.kind == "linear"
+
+
+def test_fast_scorer_matches_pipeline(registry):
+    bundle = load_model(registry)
+    df = make_synthetic_customers(n=200, seed=3)[FEATURES]
+    expected = bundle.model.predict_proba(df)[:, 1]
+    got = bundle.fast_scorer.predict(df.to_numpy(dtype=float))
+    assert got == pytest.approx(expected, abs=1e-12)
+
+
+def test_uncompilable_model_falls_back(registry):
+    from sklearn.ensemble import RandomForestClassifier
+    from serving.fast_scorer import build_fast_scorer
+    from serving.model_loader import ModelBundle, score_rows
+
+    df = make_synthetic_customers(n=200, seed=3)
+    forest = RandomForestClassifier(n_estimators=5, random_state=0)
+    forest.fit(df[FEATURES], df["churn_label_180d"])
+    assert build_fast_scorer(forest, FEATURES) is None
+
+    bundle = ModelBundle("model_vX", forest, FEATURES, {})
+    row = [VALID_FEATURES[f] for f in FEATURES]
+    expected = forest.predict_proba(pd.DataFrame([row], columns=FEATURES))[0, 1]
+    assert score_rows(bundle, [row]) == [pytest.approx(expected)]
+
+
+# --- compact artifact ---
+
+def test_registered_version_prefers_compact_artifact(registry):
+    from serving.artifacts import CompactModel
+
+    compact = load_model(registry, "model_v1")
+    pickled = load_model(registry, "model_v1", prefer_compact=False)
+    assert isinstance(compact.model, CompactModel)
+    assert not isinstance(pickled.model, CompactModel)
+
+    df = make_synthetic_customers(n=200, seed=4)[FEATURES]
+    assert compact.model.predict_proba(df)[:, 1] == pytest.approx(
+        pickled.model.predict_proba(df)[:, 1], abs=1e-12)
+
+
+def test_tampered_compact_artifact_is_refused(registry, tmp_path):
+    import json
+    import shutil
+    from serving.artifacts import COMPACT_FILE
+
+    shutil.copytree(registry / "model_v1", tmp_path / "model_v1")
+    path = tmp_path / "model_v1" / COMPACT_FILE
+    doc = json.loads(path.read_text())
+    doc["estimator"]["intercept"] += 0.5
+    path.write_text(json.dumps(doc))
+    with pytest.raises(ValueError, match="does not reproduce"):
+        load_model(tmp_path, "model_v1")
+
+
+def test_registry_index_tracks_versions_without_scanning(tmp_path, caplog):
+    from serving.model_loader import latest_version
+    from serving.registry_index import read_index
+
+    train_and_register(tmp_path, n=300, seed=1)
+    train_and_register(tmp_path, n=300, seed=2)
+    (tmp_path / "model_v3").mkdir()  # a trainer still writing: not registered yet
+    index = read_index(tmp_path)
+    with caplog.at_level("WARNING", logger="serving.model_loader"):
+        assert index["latest"] == "model_v2" == latest_version(tmp_path)
+        latest_version(tmp_path)
+    assert [r.getMessage().split()[0] for r in caplog.records] == ["model_v3"]  # warned once
+    assert (tmp_path / "LATEST").read_text().strip() == "model_v2"
+    assert load_model(tmp_path).version == "model_v2"
+    entry = index["versions"]["model_v1"]
+    assert entry["metrics"]["auc_test"] > 0.5
+    assert entry["artifacts"]["model.pkl"]["bytes"] == (tmp_path / "model_v1/model.pkl").stat().st_size
+
+
+def test_registry_index_refuses_modified_artifacts(tmp_path):
+    from serving.registry_index import rebuild_index
+
+    train_and_register(tmp_path, n=300, seed=1)
+    metadata = tmp_path / "model_v1" / "feature_metadata.json"
+    metadata.write_text(metadata.read_text().replace("synthetic", "Synthetic"))  # same size
+    with pytest.raises(ValueError, match="Checksum mismatch.*feature_metadata.json"):
+        load_model(tmp_path)
+    rebuild_index(tmp_path)  # an operator accepting the edit re-indexes explicitly
+    assert load_model(tmp_path).version == "model_v1"
+
+    (tmp_path / "model_v1" / "model.pkl").write_bytes(b"not a pickle")
+    with pytest.raises(ValueError, match="Checksum mismatch.*model.pkl"):
+        load_model(tmp_path, prefer_compact=False)  # refused before unpickling
+    assert load_model(tmp_path).version == "model_v1"  # the compact path never reads it
+
+
+def test_lightgbm_compact_artifact_round_trip(tmp_path):
+    lightgbm = pytest.importorskip("lightgbm")
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    from serving.artifacts import load_compact, save_compact
+
+    df = make_synthetic_customers(n=500, seed=5)
+    model = make_pipeline(StandardScaler(),
+                          lightgbm.LGBMClassifier(n_estimators=20, verbose=-1))
+    model.fit(df[FEATURES], df["churn_label_180d"])
+    assert save_compact(model, FEATURES, tmp_path)
+    assert (tmp_path / "model.lgb.txt").exists()
+
+    loaded = load_compact(tmp_path, FEATURES)
+    assert loaded.predict_proba(df[FEATURES])[:, 1] == pytest.approx(
+        model.predict_proba(df[FEATURES])[:, 1], abs=1e-9)
+
+
+def test_save_compact_skips_models_it_cannot_describe(tmp_path):
+    from serving.artifacts import COMPACT_FILE, save_compact
+
+    class Pipeline:  # named like sklearn's, so describe_model unpacks its (empty) steps
+        steps = []
+
+    assert save_compact(Pipeline(), FEATURES, tmp_path) is False
+    assert not (tmp_path / COMPACT_FILE).exists()
+
+
+# --- micro-batching ---
+
+def test_microbatcher_groups_concurrent_requests():
+    import asyncio
+    from serving.microbatch import MicroBatcher
+
+    calls = []
+
+    def score_batch(items):
+        calls.append(len(items))
+        return [x * 10 for x in items]
+
+    async def run():
+        batcher = MicroBatcher(score_batch, window_ms=50, max_size=8)
+        await batcher.start()
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(20)))
+        stats = batcher.stats()
+        await batcher.stop()
+        return results, stats
+
+    results, stats = asyncio.run(run())
+    assert results == [i * 10 for i in range(20)]
+    assert calls == [8, 8, 4]  # full batches flush early; the tail waits out the window
+    assert stats["batches"] == 3 and stats["items"] == 20
+    assert stats["largest_batch"] == 8
+    assert stats["queue_depth"] == 0
+
+
+def test_microbatcher_propagates_scoring_errors():
+    import asyncio
+    from serving.microbatch import MicroBatcher
+
+    def score_batch(items):
+        raise RuntimeError("model exploded")
+
+    async def run():
+        batcher = MicroBatcher(score_batch, window_ms=1)
+        await batcher.start()
+        try:
+            await batcher.submit(1)
+        finally:
+            await batcher.stop()
+
+    with pytest.raises(RuntimeError, match="model exploded"):
+        asyncio.run(run())
+
+
+def test_microbatcher_scores_off_the_loop_and_fails_pending_items_on_stop():
+    import asyncio
+    import threading
+    from serving.microbatch import MicroBatcher
+
+    release = threading.Event()
+
+    def score_batch(items):
+        release.wait(5)  # a slow model: the event loop must keep running meanwhile
+        return items
+
+    async def run():
+        batcher = MicroBatcher(score_batch, window_ms=1, max_size=1)
+        await batcher.start()
+        first = asyncio.ensure_future(batcher.submit(1))
+        queued = asyncio.ensure_future(batcher.submit(2))
+        await asyncio.sleep(0.05)  # returns even though the first batch is still scoring
+        await batcher.stop()
+        release.set()
+        outcomes = await asyncio.gather(first, queued, return_exceptions=True)
+        with pytest.raises(RuntimeError, match="not running"):
+            await batcher.submit(3)
+        return outcomes
+
+    outcomes = asyncio.run(run())
+    assert all(isinstance(o, RuntimeError) and "stopped" in str(o) for o in outcomes)
+
+
+def test_health_reports_microbatch_disabled_by_default(client):
+    assert client.get("/health").json()["microbatch"] is None
+
+
+# --- benchmark ---
+
+def test_latency_histogram_percentiles_within_one_percent():
+    from serving.benchmark import LatencyHistogram
+
+    hist = LatencyHistogram()
+    for ms in range(1, 1001):
+        hist.record(float(ms))
+    assert hist.total == 1000
+    assert hist.percentile(50) == pytest.approx(500, rel=0.01)
+    assert hist.percentile(99) == pytest.approx(990, rel=0.01)
+    assert sum(hist.to_dict()["counts"].values()) == 1000
+
+
+def test_benchmark_counts_dropped_connections_as_errors():
+    import urllib.error
+    from serving.benchmark import _send
+
+    def refused():
+        raise urllib.error.URLError(ConnectionRefusedError())
+
+    def reset():
+        raise ConnectionResetError()
+
+    assert _send(refused)[1] is False
+    assert _send(reset)[1] is False
+    assert _send(lambda: None)[1] is True
+
+
+# --- hot reload ---
+
+def test_admin_reload_switches_to_new_version(client, registry):
+    before = client.get("/health").json()
+    new_version = train_and_register(registry, n=500, seed=21)["version"]
+
+    resp = client.post("/admin/reload", headers=ADMIN_HEADERS)
+    assert resp.status_code == 200
+    assert resp.json() == {"model_version": new_version,
+                           "previous_version": before["model_version"], "reloaded": True}
+    health = client.get("/health").json()
+    assert health["model_version"] == new_version
+    assert health["loaded_at"] != before["loaded_at"]
+    pred = client.post("/predict", json={"customer_id": "c1", "features": VALID_FEATURES})
+    assert pred.json()["model_version"] == new_version
+
+    again = client.post("/admin/reload", headers=ADMIN_HEADERS)
+    assert again.json()["reloaded"] is False  # already live
+
+
+def test_admin_reload_failures_keep_serving_the_live_version(client):
+    live = client.get("/health").json()["model_version"]
+    for version, status in [("model_v99", 404), ("../etc", 400)]:
+        resp = client.post("/admin/reload", headers=ADMIN_HEADERS, params={"version": version})
+        assert resp.status_code == status
+    assert client.get("/health").json()["model_version"] == live
+    resp = client.post("/admin/reload", headers=ADMIN_HEADERS, params={"version": "model_v1"})
+    assert resp.json()["model_version"] == "model_v1"  # explicit rollback
+
+
+def test_admin_endpoints_refuse_callers_without_the_token(client, monkeypatch):
+    import serving.api
+
+    live = client.get("/health").json()["model_version"]
+    for path in ["/admin/reload", "/admin/shadow"]:
+        assert client.post(path, params={"version": "model_v1"}).status_code == 401
+        assert client.post(path, params={"version": "model_v1"},
+                           headers={"X-Admin-Token": "guess"}).status_code == 401
+    monkeypatch.setitem(serving.api.state, "admin_token", None)  # ADMIN_TOKEN unset
+    assert client.post("/admin/reload", headers=ADMIN_HEADERS).status_code == 403
+    assert client.get("/health").json()["model_version"] == live
+    assert client.get("/health").json()["shadow"] is None
+
+
+def test_admin_reload_reports_corrupt_versions_as_conflicts(client, registry):
+    live = client.get("/health").json()["model_version"]
+    version = train_and_register(registry, n=300, seed=41)["version"]
+    metadata = registry / version / "feature_metadata.json"
+    original = metadata.read_text()
+    metadata.write_text(original.replace("synthetic", "Synthetic"))  # same size
+    try:
+        resp = client.post("/admin/reload", headers=ADMIN_HEADERS, params={"version": version})
+    finally:
+        metadata.write_text(original)
+    assert resp.status_code == 409
+    assert "integrity check" in resp.json()["detail"]
+    assert client.get("/health").json()["model_version"] == live
+
+
+# --- version selection & shadow scoring ---
+
+@pytest.fixture(scope="module")
+def candidate_version(client, registry):
+    """A version registered after the client started, so never the live one."""
+    return train_and_register(registry, n=500, seed=31)["version"]
+
+
+def test_header_selects_resident_version(client, candidate_version, monkeypatch):
+    import serving.api
+
+    live = client.get("/health").json()["model_version"]
+    other = candidate_version
+    item = {"customer_id": "c1", "features": VALID_FEATURES}
+
+    loads = serving.api.state["bundles"].loads
+    refused = client.post("/predict", json=item, headers={"X-Model-Version": other})
+    assert refused.status_code == 404  # registered, but not resident or allow-listed
+    assert serving.api.state["bundles"].loads == loads  # ...and never loaded
+
+    monkeypatch.setitem(serving.api.state, "selectable", frozenset({other}))
+    resp = client.post("/predict", json=item, headers={"X-Model-Version": other})
+    assert resp.json()["model_version"] == other
+    batch = client.post("/predict/batch", json={"items": [item]},
+                        headers={"X-Model-Version": other}).json()
+    assert batch["model_version"] == other
+    assert batch["results"][0]["churn_score"] == resp.json()["churn_score"]
+    assert other in client.get("/health").json()["resident_versions"]
+    assert client.post("/predict", json=item).json()["model_version"] == live
+
+    missing = client.post("/predict", json=item, headers={"X-Model-Version": "model_v99"})
+    assert missing.status_code == 404
+
+
+def test_bundle_cache_evicts_least_recently_used(tmp_path):
+    from serving.bundle_cache import BundleCache
+
+    for seed in range(3):
+        train_and_register(tmp_path, n=300, seed=seed)
+    cache = BundleCache(tmp_path, capacity=2)
+    first = cache.get("model_v1")
+    cache.get("model_v2")
+    assert cache.get("model_v1") is first  # hit, and now most recent
+    cache.get("model_v3")
+    assert cache.versions() == ["model_v1", "model_v3"]
+    assert cache.evictions == 1
+
+
+def test_bundle_cache_loads_a_version_once_under_concurrent_misses(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    import serving.bundle_cache
+    from serving.bundle_cache import BundleCache
+
+    train_and_register(tmp_path, n=300, seed=0)
+    real_load = serving.bundle_cache.load_model
+    calls = []
+
+    def slow_load(registry_dir, version):
+        calls.append(version)
+        time.sleep(0.2)  # long enough for every thread to miss
+        return real_load(registry_dir, version)
+
+    monkeypatch.setattr(serving.bundle_cache, "load_model", slow_load)
+    cache = BundleCache(tmp_path, capacity=2)
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(cache.get("model_v1")))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == ["model_v1"]
+    assert cache.loads == 1
+    assert len(got) == 4 and all(b is got[0] for b in got)
+
+    errors = []
+
+    def get_missing():
+        try:
+            cache.get("model_v9")
+        except FileNotFoundError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=get_missing) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(errors) == 3 and calls.count("model_v9") == 1  # waiters get the loader's error
+
+
+def test_shadow_scoring_records_deltas_off_the_response_path(client, candidate_version):
+    live = client.get("/health").json()["model_version"]
+    candidate = candidate_version
+    started = client.post("/admin/shadow", headers=ADMIN_HEADERS, params={"version": candidate})
+    assert started.status_code == 200
+
+    item = {"customer_id": "c1", "features": VALID_FEATURES}
+    resp = client.post("/predict", json=item)
+    assert resp.json()["model_version"] == live  # callers only ever see the live version
+    client.post("/predict/batch", json={"items": [item, item]})
+
+    shadow = client.get("/health").json()["shadow"]
+    assert shadow["version"] == candidate
+    assert shadow["scored"] == 3
+    assert shadow["mean_abs_delta"] > 0  # different training seeds → different scores
+
+    client.post("/admin/shadow", headers=ADMIN_HEADERS)
+    assert client.get("/health").json()["shadow"] is None
+
+
+# --- prediction cache ---
+
+def test_prediction_cache_lru_ttl_and_invalidation(monkeypatch):
+    from serving import prediction_cache
+    from serving.prediction_cache import PredictionCache
+
+    clock = [0.0]
+    monkeypatch.setattr(prediction_cache.time, "monotonic", lambda: clock[0])
+    cache = PredictionCache(max_size=2, ttl_seconds=10)
+    assert cache.get("model_v1", [1.0, 2.0]) is None
+    cache.put("model_v1", [1.0, 2.0], 0.3)
+    assert cache.get("model_v1", [1.0, 2.0]) == 0.3
+    assert cache.get("model_v2", [1.0, 2.0]) is None  # version is part of the key
+
+    cache.put("model_v1", [3.0, 4.0], 0.4)
+    cache.put("model_v1", [5.0, 6.0], 0.5)  # evicts [1, 2], the least recently used
+    assert cache.get("model_v1", [1.0, 2.0]) is None
+    assert cache.stats()["evictions"] == 1
+
+    clock[0] = 11.0
+    assert cache.get("model_v1", [3.0, 4.0]) is None  # expired
+    cache.put("model_v2", [0.0, 0.0], 0.9)
+    assert cache.invalidate("model_v1") == 1
+    assert cache.stats()["size"] == 1
+
+
+def test_api_serves_repeat_requests_from_cache(client, monkeypatch):
+    import serving.api
+    from serving.prediction_cache import PredictionCache
+
+    cache = PredictionCache(max_size=100)
+    monkeypatch.setitem(serving.api.state, "cache", cache)
+    drift_before = serving.api.state["drift"].report()["rows"]
+    item = {"customer_id": "c1", "features": VALID_FEATURES}
+    first = client.post("/predict", json=item).json()
+    second = client.post("/predict", json={**item, "customer_id": "c2"}).json()
+    assert second["churn_score"] == first["churn_score"]
+    batch = client.post("/predict/batch", json={"items": [item, item]}).json()
+    assert [r["churn_score"] for r in batch["results"]] == [first["churn_score"]] * 2
+    stats = client.get("/health").json()["prediction_cache"]
+    assert stats["misses"] == 1 and stats["hits"] == 3
+    assert serving.api.state["drift"].report()["rows"] == drift_before + 4  # hits count too
+
+
+# --- metrics ---
+
+def test_request_latency_stops_when_the_response_is_sent():
+    import time
+
+    from starlette.applications import Starlette
+    from starlette.background import BackgroundTask
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+    from starlette.testclient import TestClient
+
+    from serving import metrics
+
+    def slow_background(request):
+        return JSONResponse({}, background=BackgroundTask(time.sleep, 0.3))
+
+    app = metrics.MetricsMiddleware(Starlette(routes=[Route("/slow-background", slow_background)]))
+    with TestClient(app) as c:
+        assert c.get("/slow-background").status_code == 200
+    labels = next(labels for labels in metrics.REQUEST_LATENCY._series
+                  if labels[0] == "/slow-background")
+    assert metrics.REQUEST_LATENCY.count(*labels) == 1
+    assert metrics.REQUEST_LATENCY.sum(*labels) < 0.3  # the background task is not latency
+
+
+def test_metrics_endpoint_reports_counts_errors_and_stage_latency(client):
+    from serving import metrics
+
+    live = client.get("/health").json()["model_version"]
+    ok_before = metrics.REQUESTS.value("/predict", "200")
+    bad_before = metrics.ERRORS.value("/predict", "contract_violation")
+    parse_before = metrics.STAGE_LATENCY.count("/predict", "parse", live)
+
+    client.post("/predict", json={"customer_id": "c1", "features": VALID_FEATURES})
+    client.post("/predict", json={"customer_id": "c1", "features": {"recency_days": 1.0}})
+    client.post("/predict/batch", json={"items": [
+        {"customer_id": "c1", "features": VALID_FEATURES},
+        {"customer_id": "c2", "features": {"recency_days": 1.0}},
+    ]})
+
+    assert metrics.REQUESTS.value("/predict", "200") == ok_before + 1
+    assert metrics.ERRORS.value("/predict", "contract_violation") == bad_before + 1
+    assert metrics.STAGE_LATENCY.count("/predict", "parse", live) == parse_before + 2
+    for stage in ["parse", "validate", "score", "serialize"]:
+        assert metrics.STAGE_LATENCY.count("/predict/batch", stage, live) >= 1
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    body = resp.text
+    assert "# TYPE cip_stage_duration_seconds histogram" in body
+    assert (f'cip_stage_duration_seconds_count{{endpoint="/predict",stage="score",'
+            f'model_version="{live}"}}') in body
+    assert f'cip_batch_items_rejected_total{{model_version="{live}"}}' in body
+    assert 'le="+Inf"' in body
+
+
+def test_predict_rejects_nan_in_raw_json(client):
+    body = ('{"customer_id": "c1", "features": {"recency_days": NaN, "frequency_90d": 2, '
+            '"monetary_90d": 120, "tenure_days": 400, "support_tickets_90d": 1, '
+            '"web_sessions_30d": 3}}')
+    resp = client.post("/predict", content=body, headers={"content-type": "application/json"})
+    assert resp.status_code == 400
+    assert "non-finite" in resp.json()["detail"]
+
+
+# --- fast JSON path ---
+
+def test_fast_predict_matches_predict_in_both_formats(client):
+    order = client.get("/health").json()["feature_names"]
+    expected = client.post("/predict", json={"customer_id": "c1", "features": VALID_FEATURES})
+
+    by_name = client.post("/predict/fast", json={"customer_id": "c1", "features": VALID_FEATURES})
+    positional = client.post("/predict/fast", json={
+        "customer_id": "c1", "values": [VALID_FEATURES[name] for name in order]})
+    assert by_name.status_code == positional.status_code == 200
+    assert by_name.json() == positional.json() == expected.json()
+
+
+def test_fast_predict_rejects_bad_bodies(client):
+    assert client.post("/predict/fast", content=b"{not json").status_code == 422
+    assert client.post("/predict/fast", json={"values": [1.0] * 6}).status_code == 422
+    short = client.post("/predict/fast", json={"customer_id": "c1", "values": [1.0, 2.0]})
+    assert short.status_code == 400
+    assert "expected 6 feature values" in short.json()["detail"]
+    neither = client.post("/predict/fast", json={"customer_id": "c1"})
+    assert neither.status_code == 400
+
+
+def test_fast_batch_mixes_formats_and_rejects_per_item(client):
+    order = client.get("/health").json()["feature_names"]
+    resp = client.post("/predict/batch/fast", json={"items": [
+        {"customer_id": "a", "features": VALID_FEATURES},
+        {"customer_id": "b", "values": [VALID_FEATURES[name] for name in order]},
+        {"customer_id": "c", "values": [-1.0] * len(order)},
+    ]})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert (body["n_scored"], body["n_rejected"]) == (2, 1)
+    a, b, c = body["results"]
+    assert a["churn_score"] == b["churn_score"] is not None
+    assert c["churn_score"] is None and "negative" in c["error"]
+    assert client.post("/predict/batch/fast", json={"items": []}).status_code == 422
+
+
+# --- pre-fork launcher ---
+
+def test_launcher_serves_from_forked_workers(registry):
+    import json
+    import os
+    import signal
+    import socket
+    import subprocess
+    import time
+    import urllib.request
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    root = pathlib.Path(__file__).resolve().parents[1]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "serving.launcher", "--workers", "2", "--port", str(port),
+         "--report-seconds", "0.5", "--log-level", "warning"],
+        cwd=root, env={**os.environ, "REGISTRY_DIR": str(registry)},
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health") as resp:
+                    health = json.loads(resp.read())
+                break
+            except OSError:
+                assert time.monotonic() < deadline, "launcher never became healthy"
+                time.sleep(0.2)
+        assert health["model_version"] == load_model(registry).version
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.communicate(timeout=30)
+    assert proc.returncode == 0
+
+
+def test_launcher_gives_up_on_workers_that_cannot_start(registry):
+    import os
+    import socket
+    import subprocess
+    import time
+
+    with socket.socket() as taken, socket.socket() as s:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()  # BINARY_PORT already in use: every worker's lifespan fails
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+        s.close()
+        root = pathlib.Path(__file__).resolve().parents[1]
+        start = time.monotonic()
+        proc = subprocess.run(
+            [sys.executable, "-m", "serving.launcher", "--workers", "1", "--port", str(port),
+             "--report-seconds", "0", "--restart-backoff", "0.1", "--max-quick-failures", "3",
+             "--log-level", "warning"],
+            cwd=root, capture_output=True, text=True, timeout=60,
+            env={**os.environ, "REGISTRY_DIR": str(registry),
+                 "BINARY_HOST": "127.0.0.1", "BINARY_PORT": str(taken.getsockname()[1])},
+        )
+    assert proc.returncode == 1
+    assert proc.stderr.count("restarting in") == 2  # backed off 0.1 s, then 0.2 s
+    assert "giving up" in proc.stderr
+    assert time.monotonic() - start >= 0.3
+
+
+def test_memory_report_totals_processes():
+    import os
+    from serving.launcher import memory_report
+
+    report = memory_report(os.getpid(), [os.getpid()])
+    assert set(report["processes"]) == {"parent", "worker_0"}
+    if report["total"]["rss_mb"] is not None:  # Linux /proc available
+        assert report["total"]["rss_mb"] == pytest.approx(
+            2 * report["processes"]["parent"]["rss_mb"], abs=0.2)
+
+
+# --- binary transport ---
+
+def test_binary_protocol_round_trips_a_batch():
+    import numpy as np
+    from serving import binary_protocol as bp
+
+    X = np.arange(12, dtype=float).reshape(3, 4)
+    frame = bp.encode_score_request(["a", "bé", "c"], X, "model_v2")
+    body = memoryview(frame)[4:]
+    assert int.from_bytes(frame[:4], "little") == len(body)
+    version, ids, decoded = bp.decode_score_request(body)
+    assert (version, ids) == ("model_v2", ["a", "bé", "c"])
+    np.testing.assert_array_equal(decoded, X)
+
+    reply = bp.encode_score_response("model_v2", np.array([0.1, np.nan, 0.3]), [None, "bad", None])
+    version, scores, errors = bp.decode_score_response(memoryview(reply)[4:])
+    assert version == "model_v2" and errors == {1: "bad"}
+    assert scores[0] == 0.1 and np.isnan(scores[1])
+
+    with pytest.raises(bp.ProtocolError):
+        bp.decode_score_request(body[:-3])
+
+
+def test_binary_transport_scores_like_http(client):
+    import asyncio
+
+    import numpy as np
+    from serving import api, binary_protocol as bp
+
+    expected = client.post("/predict/batch", json={"items": [
+        {"customer_id": "a", "features": VALID_FEATURES}]}).json()["results"][0]["churn_score"]
+
+    def talk(port):
+        with bp.BinaryClient("127.0.0.1", port) as conn:
+            info = conn.info()
+            row = [VALID_FEATURES[name] for name in info["feature_names"]]
+            bad = [-1.0] * len(row)
+            first = conn.score(["a", "b"], np.array([row, bad]))
+            second = conn.score(["a"], np.array([row]))  # same connection, next frame
+            with pytest.raises(bp.ProtocolError, match="expected 6 feature values"):
+                conn.score(["a"], np.array([row[:2]]))
+            unknown = None
+            try:
+                conn.score(["a"], np.array([row]), version="model_v999")
+            except bp.ProtocolError as exc:
+                unknown = str(exc)
+            return info, first, second, unknown
+
+    async def main():
+        server = await bp.start_server(api._binary_info, api._binary_score, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.to_thread(talk, port)
+        finally:
+            server.close()
+
+    info, first, second, unknown = asyncio.run(main())
+    assert info["model_version"] == client.get("/health").json()["model_version"]
+    version, scores, errors = first
+    assert version == info["model_version"]
+    assert round(scores[0], 4) == expected and np.isnan(scores[1])
+    assert "negative" in errors[1]
+    assert second[1][0] == scores[0]
+    assert "Unknown model version" in unknown
+
+
+def test_drift_endpoint_counts_live_traffic(client):
+    from serving import api
+
+    items = [{"customer_id": f"d{i}", "features": row}
+             for i, row in enumerate(make_synthetic_customers(n=300, seed=24)[FEATURES]
+                                     .to_dict(orient="records"))]
+    before = api.state["drift"].report()["rows"]
+    version = client.post("/predict/batch", json={"items": items}).json()["model_version"]
+    client.post("/predict", json={"customer_id": "x", "features": VALID_FEATURES})
+
+    body = client.get("/drift").json()
+    assert body["current"]["model_version"] == version
+    assert body["current"]["rows"] == before + 301
+    assert set(body["current"]["features"]) == set(FEATURES)